@@ -0,0 +1,564 @@
+"""The recommendation engine behind the API, without the app around it.
+
+``EnhancedFinancialAdvisorAI`` turns a profile and its behavioral analysis
+into an allocation, fund picks, SIP amounts and the report sections. It
+works over the fund data it is given: the FastAPI app in ``server`` builds
+one from its watched fund stores, and the worker processes of the nightly
+refresh job build their own with ``advisor_from_env``. Importing this module
+does not start the app, connect to MongoDB or set up the LLM gateway.
+"""
+
+import logging
+import uuid
+from datetime import datetime
+from typing import Iterable, List, Optional, Set
+
+from allocation_optimizer import default_table
+from database import RECOMMENDATION_DERIVED_FIELDS, RECOMMENDATION_RECORD_INPUTS, RECOMMENDATION_TEXT_FIELDS
+from fund_holdings import FundHoldings, FundHoldingsStore
+from fund_index import FundIndex
+from fund_metrics import FundMetrics, load_or_refresh
+from fund_selection import select_funds, split_percentage
+from fund_universe import FundUniverse, FundUniverseStore, FundView
+from market_assumptions import EXPECTED_RETURNS
+from nav_history import NavHistory, NavHistoryStore
+from projection_tables import annuity_row, sip_value
+from recommendation_cache import DEFAULT_TTL_SECONDS, RecommendationCache, recommendation_fingerprint
+from report_templates import (
+    INVESTMENT_STRATEGY,
+    age_advantage,
+    render_expected_returns,
+    render_rationale,
+    render_risk_mitigation,
+    render_tax_implications,
+)
+from ttl_cache import TTLCache
+
+logger = logging.getLogger("investwise")
+
+# Recommendation ids are derived from the user id, so an id a client holds
+# keeps addressing the user's current recommendation
+RECOMMENDATION_ID_NAMESPACE = uuid.UUID('f3d80bbc-ed20-48c1-8541-e5758944aaec')
+
+# Bounds of the per-advisor fund selection and expected-returns memos
+SECTION_CACHE_SIZE = 4096
+SECTION_CACHE_TTL = DEFAULT_TTL_SECONDS
+
+
+def fund_metrics_for(history: Optional[NavHistory], universe: FundUniverse) -> Optional[FundMetrics]:
+    """Risk metrics for a NAV history (saved, or rolled forward to its last day), or None"""
+    if history is None:
+        return None
+    try:
+        return load_or_refresh(history, universe)
+    except Exception as e:
+        logger.warning("Fund metrics unavailable: %s", e)
+        return None
+
+
+# Enhanced AI System for Financial Analysis
+class EnhancedFinancialAdvisorAI:
+    def __init__(self, universe: FundUniverse, metrics: Optional[FundMetrics] = None,
+                 holdings: Optional[FundHoldings] = None):
+        self.system_message = """You are Dr. Rajesh Khanna, a leading behavioral finance expert and certified financial planner with 20 years of experience in the Indian market. Your expertise includes:
+
+1. Deep understanding of Indian mutual fund industry and market dynamics
+2. Identifying and overcoming behavioral biases in Indian investors
+3. Creating personalized investment strategies based on Indian market conditions
+4. Helping investors navigate market volatility and emotional decision-making
+5. Expertise in Indian tax-saving instruments and regulations
+
+Your approach:
+- Always consider Indian market specifics (monsoon impact, festival seasons, budget cycles)
+- Address cultural and emotional barriers to investing
+- Provide detailed fund analysis with ratings, returns, and risk metrics
+- Focus on long-term wealth building suitable for Indian families
+- Consider inflation, currency factors, and Indian economic cycles
+- Suggest tax-efficient investment strategies under Indian tax laws
+
+Be empathetic, culturally aware, and focus on building confidence in Indian investors."""
+        self.recommendation_cache = RecommendationCache.from_env()
+        # Per-instance memos of fund selections and expected-returns sections, cleared on refresh
+        self._fund_selections = TTLCache(SECTION_CACHE_SIZE, SECTION_CACHE_TTL)
+        self._market_returns_sections = TTLCache(SECTION_CACHE_SIZE, SECTION_CACHE_TTL)
+        # Efficient-frontier allocations for every profile, built once from the market assumptions
+        self.allocation_table = default_table()
+        self.refresh_fund_universe(universe, metrics, holdings)
+    
+    def refresh_fund_universe(self, universe: FundUniverse, metrics: Optional[FundMetrics] = None,
+                              holdings: Optional[FundHoldings] = None):
+        """Re-index the fund universe; cached recommendations from older versions are dropped"""
+        self.fund_index = FundIndex(universe, metrics)
+        self.fund_holdings = holdings
+        self.fund_version = self.fund_index.version
+        if holdings is not None:
+            self.fund_version = f"{self.fund_version}+{holdings.version}"
+        self.recommendation_cache.bind_version(self.fund_version)
+        self._fund_selections.clear()
+        self._market_returns_sections.clear()
+
+    async def analyze_behavioral_profile(self, user_data: dict) -> dict:
+        """Enhanced behavioral analysis for Indian market context"""
+        
+        biases = []
+        confidence_level = "medium"
+        age = user_data.get('age', 30)
+        income = user_data.get('income', 50000)
+        experience = user_data.get('investment_experience', 'beginner')
+        occupation = user_data.get('occupation', '').lower()
+        
+        # Enhanced bias detection
+        if experience == 'beginner':
+            biases.append("overconfidence_bias")
+            biases.append("herding_behavior")
+            confidence_level = "low"
+        
+        if user_data.get('risk_tolerance') == 'low':
+            biases.append("loss_aversion")
+            biases.append("status_quo_bias")
+            
+        if 'tech' in occupation or 'software' in occupation or 'it' in occupation:
+            biases.append("sector_bias")
+            biases.append("recency_bias")
+            
+        if 'doctor' in occupation or 'engineer' in occupation:
+            biases.append("overconfidence_bias")
+            
+        if age < 25:
+            biases.append("overconfidence_bias")
+            biases.append("fomo_bias")
+        elif age > 45:
+            biases.append("loss_aversion")
+            biases.append("home_bias")
+            
+        if income < 500000:
+            biases.append("small_numbers_bias")
+        elif income > 2000000:
+            biases.append("overconfidence_bias")
+            
+        # Calculate enhanced risk score
+        risk_score = 5  # baseline
+        
+        # Age factor
+        if age < 30:
+            risk_score += 2
+        elif age < 40:
+            risk_score += 1
+        elif age > 50:
+            risk_score -= 1
+        elif age > 60:
+            risk_score -= 2
+            
+        # Income factor
+        if income > 1000000:
+            risk_score += 2
+        elif income > 500000:
+            risk_score += 1
+        elif income < 300000:
+            risk_score -= 1
+            
+        # Experience factor
+        if experience == 'experienced':
+            risk_score += 2
+        elif experience == 'intermediate':
+            risk_score += 1
+        elif experience == 'beginner':
+            risk_score -= 1
+            
+        # Occupation factor
+        if any(term in occupation for term in ['entrepreneur', 'business', 'trader']):
+            risk_score += 2
+        elif any(term in occupation for term in ['government', 'teacher', 'clerk']):
+            risk_score -= 1
+            
+        risk_score = max(1, min(10, risk_score))
+        
+        # Determine confidence level
+        if risk_score >= 7 and experience != 'beginner':
+            confidence_level = "high"
+        elif risk_score <= 3 or experience == 'beginner':
+            confidence_level = "low"
+        
+        behavioral_profile = self._get_behavioral_profile(biases, risk_score, age, income)
+        
+        return {
+            'risk_score': risk_score,
+            'behavioral_biases': biases,
+            'behavioral_profile': behavioral_profile,
+            'confidence_level': confidence_level,
+            'market_sentiment': self._assess_market_sentiment(risk_score, biases),
+            'investment_personality': self._determine_investment_personality(user_data, risk_score)
+        }
+    
+    def _get_behavioral_profile(self, biases: List[str], risk_score: int, age: int, income: float) -> str:
+        """Enhanced behavioral profiling"""
+        if risk_score <= 3:
+            return "Conservative Indian Investor"
+        elif risk_score <= 5:
+            return "Moderate Indian Investor"
+        elif risk_score <= 7:
+            return "Balanced Growth Investor"
+        elif risk_score <= 8:
+            return "Aggressive Growth Investor"
+        else:
+            return "High-Risk Wealth Builder"
+    
+    def _assess_market_sentiment(self, risk_score: int, biases: List[str]) -> str:
+        """Assess investor's market sentiment"""
+        if 'loss_aversion' in biases and 'status_quo_bias' in biases:
+            return "Risk-averse and market-fearful"
+        elif 'overconfidence_bias' in biases and 'fomo_bias' in biases:
+            return "Overconfident and trend-following"
+        elif risk_score >= 7:
+            return "Optimistic and growth-oriented"
+        else:
+            return "Cautious and stability-seeking"
+    
+    def _determine_investment_personality(self, user_data: dict, risk_score: int) -> str:
+        """Determine investment personality type"""
+        age = user_data.get('age', 30)
+        goals = user_data.get('financial_goals', [])
+        
+        if 'retirement' in goals and age > 40:
+            return "Retirement Planner"
+        elif 'education' in goals:
+            return "Family Goal Investor"
+        elif 'wealth' in goals and risk_score >= 7:
+            return "Wealth Creator"
+        elif 'tax' in goals:
+            return "Tax-Efficient Investor"
+        else:
+            return "Goal-Based Investor"
+    
+    async def generate_investment_recommendations(self, user_data: dict, behavioral_analysis: dict,
+                                                  sections: Iterable[str] = RECOMMENDATION_TEXT_FIELDS) -> dict:
+        """Generate enhanced investment recommendations with real fund data
+        
+        Only the text ``sections`` asked for are rendered; the others can be
+        rendered later from the recommendation parameters.
+        """
+        
+        risk_score = behavioral_analysis['risk_score']
+        age = user_data.get('age', 30)
+        income = user_data.get('income', 500000)
+        goals = user_data.get('financial_goals', [])
+        
+        # Profile-invariant parts are shared by every user with the same fingerprint
+        cache_key = recommendation_fingerprint(risk_score, age, goals)
+        core = self.recommendation_cache.get(cache_key)
+        if core is None:
+            core = self._build_recommendation_core(user_data, behavioral_analysis)
+            self.recommendation_cache.put(cache_key, core)
+        
+        allocation = dict(core['portfolio_allocation'])
+        parameters = self.recommendation_parameters(user_data, behavioral_analysis)
+        sections = set(sections)
+        
+        recommendations = {
+            'portfolio_allocation': allocation,
+            # Per-user: how many funds and their SIP amounts depend on exact income
+            'mutual_funds': self._assign_fund_sips(
+                self._select_best_funds(allocation, self._monthly_investment(income)), income),
+        }
+        for name in RECOMMENDATION_TEXT_FIELDS:
+            if name in sections:
+                recommendations[name] = self.render_recommendation_section(name, parameters, allocation)
+        recommendations['rebalancing_frequency'] = core['rebalancing_frequency']
+        recommendations['sip_recommendation'] = self._calculate_sip_recommendation(income, allocation)
+        return recommendations
+    
+    def _build_recommendation_core(self, user_data: dict, behavioral_analysis: dict) -> dict:
+        """Parts that depend only on the recommendation fingerprint"""
+        
+        risk_score = behavioral_analysis['risk_score']
+        age = user_data.get('age', 30)
+        income = user_data.get('income', 500000)
+        goals = user_data.get('financial_goals', [])
+        timeline = user_data.get('investment_timeline', '5-10 years')
+        
+        # Enhanced portfolio allocation based on comprehensive analysis
+        allocation = self._calculate_optimal_allocation(risk_score, age, income, goals, timeline)
+        
+        return {
+            'portfolio_allocation': allocation,
+            'rebalancing_frequency': self._suggest_rebalancing_frequency(risk_score)
+        }
+    
+    def recommendation_parameters(self, user_data: dict, behavioral_analysis: dict) -> dict:
+        """Inputs the text sections are rendered from; stored with each recommendation"""
+        return {
+            'name': user_data.get('name', 'You'),
+            'age': user_data.get('age', 30),
+            'income': user_data.get('income', 500000),
+            'financial_goals': user_data.get('financial_goals', []),
+            'investment_timeline': user_data.get('investment_timeline', '5-10 years'),
+            'risk_score': behavioral_analysis['risk_score'],
+            'behavioral_biases': behavioral_analysis.get('behavioral_biases', []),
+            'behavioral_profile': behavioral_analysis['behavioral_profile'],
+            'investment_personality': behavioral_analysis['investment_personality'],
+        }
+    
+    def render_recommendation_section(self, name: str, parameters: dict, allocation: dict) -> str:
+        """Render one text section from recommendation parameters"""
+        if name == 'rationale':
+            return self._generate_comprehensive_rationale(parameters, parameters, allocation)
+        if name == 'risk_mitigation':
+            return self._generate_enhanced_risk_mitigation(parameters, parameters)
+        if name == 'expected_returns':
+            return self._calculate_indian_market_returns(
+                allocation, parameters['risk_score'], parameters['investment_timeline'])
+        if name == 'tax_implications':
+            return self._generate_tax_implications(allocation, parameters['financial_goals'], parameters['income'])
+        if name == 'investment_strategy':
+            return self._generate_investment_strategy(parameters, parameters)
+        raise ValueError(f"Unknown recommendation section: {name}")
+    
+    def stored_section(self, recommendation: dict, name: str) -> str:
+        """A section of a stored recommendation: rendered from its parameters, or as stored by older versions"""
+        if 'parameters' not in recommendation and name in recommendation:
+            return recommendation[name]
+        return self.render_recommendation_section(
+            name, recommendation['parameters'], recommendation['portfolio_allocation'])
+    
+    def recommendation_record(self, user_id: str, recommendations: dict, parameters: dict) -> dict:
+        """Compact stored form of a recommendation; the rest is re-rendered from it on read"""
+        return {
+            'recommendation_id': str(uuid.uuid5(RECOMMENDATION_ID_NAMESPACE, user_id)),
+            'user_id': user_id,
+            'portfolio_allocation': recommendations['portfolio_allocation'],
+            # allocation category -> scheme codes of the funds picked for it, sharing it evenly
+            'fund_codes': self._fund_codes(recommendations['mutual_funds']),
+            'parameters': parameters,
+            'created_at': datetime.now(),
+        }
+    
+    def _fund_codes(self, funds: List[FundView]) -> dict:
+        fund_codes = {}
+        for fund in funds:
+            category = fund.universe.value('allocation_category', fund.row)
+            fund_codes.setdefault(category, []).append(fund['scheme_code'])
+        return fund_codes
+    
+    def expand_recommendation(self, record: dict, requested: Optional[Set[str]] = None) -> dict:
+        """Fill in the derived fields of a stored recommendation record
+        
+        ``requested`` names the fields wanted (every derived field except the
+        text sections when None); record inputs that weren't asked for are
+        dropped. Documents from before compact records have no parameters and
+        are returned as stored; a record's own fields are always re-derived.
+        """
+        if requested is None:
+            names = [name for name in RECOMMENDATION_DERIVED_FIELDS if name not in RECOMMENDATION_TEXT_FIELDS]
+        else:
+            names = [name for name in RECOMMENDATION_DERIVED_FIELDS if name in requested]
+        
+        parameters = record.get('parameters')
+        allocation = record.get('portfolio_allocation', {})
+        for name in names:
+            if parameters is None:
+                continue
+            if name == 'mutual_funds':
+                record[name] = self._record_funds(record.get('fund_codes', {}), allocation, parameters['income'])
+            elif name == 'rebalancing_frequency':
+                record[name] = self._suggest_rebalancing_frequency(parameters['risk_score'])
+            elif name == 'sip_recommendation':
+                record[name] = self._calculate_sip_recommendation(parameters['income'], allocation)
+            else:
+                record[name] = self.render_recommendation_section(name, parameters, allocation)
+        
+        if requested is not None:
+            for name in RECOMMENDATION_RECORD_INPUTS:
+                if name not in requested:
+                    record.pop(name, None)
+        return record
+    
+    def _record_funds(self, fund_codes: dict, allocation: dict, income: float) -> List[dict]:
+        """Fund views for stored scheme codes, with allocation and SIP per fund"""
+        universe = self.fund_index.universe
+        funds = []
+        for category, scheme_codes in fund_codes.items():
+            # Records from before multi-fund selection hold one code per category
+            if isinstance(scheme_codes, str):
+                scheme_codes = [scheme_codes]
+            percentages = split_percentage(allocation.get(category, 0), len(scheme_codes))
+            for scheme_code, percentage in zip(scheme_codes, percentages):
+                fields = {
+                    'allocation_percentage': percentage,
+                    'monthly_sip': self._calculate_fund_sip(income, percentage),
+                }
+                row = universe.row_for(scheme_code)
+                if row is None:
+                    # Dropped from the universe since the recommendation was made
+                    funds.append({'scheme_code': scheme_code, 'available': False, **fields})
+                else:
+                    funds.append(universe.view(row).with_fields(**fields))
+        return funds
+    
+    def _calculate_optimal_allocation(self, risk_score: int, age: int, income: float, goals: List[str], timeline: str) -> dict:
+        """Calculate optimal allocation based on multiple factors
+        
+        Looked up from the efficient frontiers tabulated in ``allocation_table``
+        for the risk score, age band and retirement/tax goals; always sums to 100.
+        """
+        return self.allocation_table.allocation(risk_score, age, goals)
+    
+    def _select_best_funds(self, allocation: dict, monthly_investment: Optional[float] = None) -> List[FundView]:
+        """Select best mutual funds based on allocation
+        
+        One or more funds per category, from the top of the fund index's ranking
+        (Sharpe ratio when NAV history is loaded, else rating and 3-year returns);
+        see ``fund_selection``. The category's percentage is split across them.
+        """
+        if monthly_investment is not None:
+            monthly_investment = round(monthly_investment, -2)
+        key = (tuple(allocation.items()), monthly_investment, self.fund_version)
+        selected_funds = self._fund_selections.get(key)
+        if selected_funds is None:
+            selected_funds = self._fund_selection(allocation, monthly_investment)
+            self._fund_selections.put(key, selected_funds)
+        return list(selected_funds)
+    
+    def _fund_selection(self, allocation: dict, monthly_investment: Optional[float]) -> tuple:
+        """Fund selection for an allocation and SIP amount
+        
+        Memoized by _select_best_funds, so it searches without a time budget:
+        the selection must not depend on how busy the server was.
+        """
+        universe = self.fund_index.universe
+        selected_funds = []
+        for category, rows in select_funds(self.fund_index, allocation, monthly_investment, self.fund_holdings,
+                                           budget=None):
+            for row, percentage in zip(rows, split_percentage(allocation[category], len(rows))):
+                selected_funds.append(universe.view(row).with_fields(allocation_percentage=percentage))
+        return tuple(selected_funds)
+    
+    def _assign_fund_sips(self, funds: List[FundView], income: float) -> List[FundView]:
+        """Views of the selected funds with the user's monthly SIP for each"""
+        return [
+            fund.with_fields(monthly_sip=self._calculate_fund_sip(income, fund['allocation_percentage']))
+            for fund in funds
+        ]
+    
+    def _monthly_investment(self, income: float) -> float:
+        """Monthly amount to invest: assume 20% of income"""
+        return (income * 0.20) / 12
+    
+    def _calculate_fund_sip(self, income: float, allocation_percentage: float) -> int:
+        """Calculate recommended SIP amount for a fund"""
+        fund_sip = (self._monthly_investment(income) * allocation_percentage) / 100
+        return max(500, round(fund_sip, -2))  # Minimum 500, rounded to nearest 100
+    
+    def _generate_comprehensive_rationale(self, user_data: dict, behavioral_analysis: dict, allocation: dict) -> str:
+        """Generate comprehensive investment rationale"""
+        return render_rationale(
+            name=user_data.get('name', 'You'),
+            age=user_data.get('age', 30),
+            income=user_data.get('income', 500000),
+            profile=behavioral_analysis['behavioral_profile'],
+            personality=behavioral_analysis['investment_personality'],
+            biases=behavioral_analysis.get('behavioral_biases', []),
+            allocation=allocation,
+        )
+    
+    def _get_age_advantage(self, age: int) -> str:
+        """Get age-based investment advantage"""
+        return age_advantage(age)
+    
+    def _generate_enhanced_risk_mitigation(self, behavioral_analysis: dict, user_data: dict) -> str:
+        """Generate enhanced risk mitigation strategies"""
+        return render_risk_mitigation(
+            behavioral_analysis.get('behavioral_biases', []),
+            behavioral_analysis.get('risk_score', 5),
+        )
+    
+    def _calculate_indian_market_returns(self, allocation: dict, risk_score: int, timeline: str) -> str:
+        """Calculate expected returns with Indian market context"""
+        key = (tuple(allocation.items()), risk_score, timeline)
+        section = self._market_returns_sections.get(key)
+        if section is None:
+            section = self._market_returns_section(*key)
+            self._market_returns_sections.put(key, section)
+        return section
+    
+    def _market_returns_section(self, allocation_items: tuple, risk_score: int, timeline: str) -> str:
+        """Expected returns section; it depends only on its arguments"""
+        
+        # Expected returns by asset class (post-tax, inflation-adjusted)
+        returns = EXPECTED_RETURNS
+        
+        # Calculate weighted average return
+        weighted_return = 0
+        for category, percentage in allocation_items:
+            if category in returns:
+                weighted_return += (percentage * returns[category]) / 100
+        
+        # Timeline adjustments
+        if '1-3 years' in timeline:
+            weighted_return *= 0.9  # Lower returns for short term
+        elif '10+ years' in timeline:
+            weighted_return *= 1.1  # Higher returns for long term
+        
+        # Risk adjustments
+        if risk_score <= 3:
+            lower_range = weighted_return - 2
+            upper_range = weighted_return + 1
+        elif risk_score >= 8:
+            lower_range = weighted_return - 3
+            upper_range = weighted_return + 4
+        else:
+            lower_range = weighted_return - 2
+            upper_range = weighted_return + 2
+        
+        # Value of a ₹10,000 SIP after 5, 10 and 15 years, from one projection table row
+        annuity = annuity_row(weighted_return)
+        return render_expected_returns(
+            lower_range, upper_range, weighted_return,
+            10000 * annuity[60], 10000 * annuity[120], 10000 * annuity[180],
+        )
+    
+    def _calculate_sip_value(self, monthly_sip: int, annual_return: float, years: int) -> float:
+        """Calculate SIP maturity value, at the return rounded to 0.1%"""
+        return sip_value(monthly_sip, annual_return, years * 12)
+    
+    def _generate_tax_implications(self, allocation: dict, goals: List[str], income: float) -> str:
+        """Generate tax implications for Indian investors"""
+        return render_tax_implications(goals, income)
+    
+    def _generate_investment_strategy(self, user_data: dict, behavioral_analysis: dict) -> str:
+        """Generate comprehensive investment strategy"""
+        return INVESTMENT_STRATEGY
+    
+    def _suggest_rebalancing_frequency(self, risk_score: int) -> str:
+        """Suggest rebalancing frequency based on risk profile"""
+        if risk_score <= 3:
+            return "Semi-annually (every 6 months)"
+        elif risk_score <= 6:
+            return "Annually (once a year)"
+        else:
+            return "Quarterly (every 3 months)"
+    
+    def _calculate_sip_recommendation(self, income: float, allocation: dict) -> dict:
+        """Calculate SIP recommendations"""
+        
+        monthly_investment = self._monthly_investment(income)
+        
+        sip_plan = {
+            'total_monthly_sip': int(monthly_investment),
+            'fund_wise_sip': {}
+        }
+        
+        for category, percentage in allocation.items():
+            if percentage > 0:
+                fund_sip = (monthly_investment * percentage) / 100
+                sip_plan['fund_wise_sip'][category] = max(500, round(fund_sip, -2))
+        
+        return sip_plan
+
+
+def advisor_from_env() -> EnhancedFinancialAdvisorAI:
+    """An advisor over the fund data the environment points at, loaded as the app loads it"""
+    universe = FundUniverseStore.from_env().load()
+    nav_store = NavHistoryStore.from_env()
+    nav_store.reload_if_changed()
+    holdings = FundHoldingsStore.from_env().reload_if_changed()
+    return EnhancedFinancialAdvisorAI(universe, fund_metrics_for(nav_store.history, universe), holdings)
@@ -0,0 +1,248 @@
+"""Mean-variance allocation over the fund categories.
+
+Allocations come from a constrained efficient frontier instead of hand-tuned
+buckets. For given category expected returns and covariance (the estimates
+in ``market_assumptions`` by default), each frontier point solves
+
+    maximize  mu'w - (gamma / 2) w' Sigma w
+    subject to  sum(w) = 1,  lower <= w <= upper
+
+for one risk aversion ``gamma``, from the minimum-variance portfolio up to the
+maximum-return one. The problem is small (one weight per category) and is
+solved exactly with a primal active-set method, warm-started from the
+neighbouring frontier point.
+
+A risk score of 1 to 10 picks a volatility that far along the frontier, from
+its minimum to its maximum; the allocation interpolates between the two
+frontier points around it. The bounds depend on the profile features the
+old rules used (age band, retirement goal, tax goal) and on the risk band
+of the score, so a frontier is built once per combination when the
+estimates are loaded, and every allocation a request can ask for is
+tabulated then. A request is a dictionary lookup.
+
+The risk bands matter because the return estimates alone favour small caps
+at every level of risk: unbounded, even a conservative frontier buys small
+caps before large caps. Lower bands cap small and mid caps and keep a floor
+of large caps, and the caps rise with the band, so small-cap exposure never
+falls as the score rises.
+
+Weights become whole percentages by largest remainder, so an allocation
+always sums to exactly 100.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import product
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from market_assumptions import CATEGORIES, EXPECTED_RETURNS, age_bucket, covariance_matrix
+
+RISK_SCORES = range(1, 11)
+FRONTIER_POINTS = 100
+MAX_ACTIVE_SET_STEPS = 100
+
+# Category weight bounds (fractions) for everyone
+BASE_BOUNDS = {
+    'large_cap': (0.10, 0.50),
+    'mid_cap': (0.0, 0.35),
+    'small_cap': (0.0, 0.25),
+    'debt': (0.10, 0.60),
+    'hybrid': (0.0, 0.25),
+    'international': (0.0, 0.10),
+    # ELSS only for investors saving tax under section 80C
+    'elss': (0.0, 0.0),
+}
+# Overrides by age band (see market_assumptions.age_bucket) and goal
+AGE_BAND_BOUNDS = {
+    0: {'debt': (0.05, 0.60)},
+    1: {},
+    2: {'debt': (0.25, 0.70), 'mid_cap': (0.0, 0.20), 'small_cap': (0.0, 0.05)},
+}
+RETIREMENT_BOUNDS = {'large_cap': (0.20, 0.50)}
+RETIREMENT_MIN_EXTRA_DEBT = 0.10
+TAX_SAVING_BOUNDS = {'elss': (0.15, 0.15)}
+# Bounds by risk band, keyed by the band's highest score (the behavioral
+# profile bands). They narrow the age and goal bounds rather than replace them.
+RISK_BAND_BOUNDS = {
+    3: {'large_cap': (0.30, 0.50), 'mid_cap': (0.0, 0.05), 'small_cap': (0.0, 0.05), 'international': (0.0, 0.05)},
+    5: {'large_cap': (0.25, 0.50), 'mid_cap': (0.0, 0.15), 'small_cap': (0.0, 0.10)},
+    7: {'large_cap': (0.20, 0.50), 'mid_cap': (0.0, 0.25), 'small_cap': (0.0, 0.15)},
+    10: {},
+}
+
+
+def risk_band(risk_score: int) -> int:
+    """The RISK_BAND_BOUNDS key of a risk score"""
+    return min(band for band in RISK_BAND_BOUNDS if risk_score <= band)
+
+
+def bounds_for(age_band: int, retirement: bool, tax_saving: bool,
+               band: int = max(RISK_BAND_BOUNDS)) -> Tuple[np.ndarray, np.ndarray]:
+    """Lower and upper weight bounds in CATEGORIES order for a profile and risk band"""
+    bounds = dict(BASE_BOUNDS)
+    bounds.update(AGE_BAND_BOUNDS[age_band])
+    if retirement:
+        bounds.update(RETIREMENT_BOUNDS)
+        low, high = bounds['debt']
+        bounds['debt'] = (low + RETIREMENT_MIN_EXTRA_DEBT, max(high, low + RETIREMENT_MIN_EXTRA_DEBT))
+    if tax_saving:
+        bounds.update(TAX_SAVING_BOUNDS)
+    for category, (low, high) in RISK_BAND_BOUNDS[band].items():
+        bounds[category] = (max(bounds[category][0], low), min(bounds[category][1], high))
+    lower = np.array([bounds[c][0] for c in CATEGORIES])
+    upper = np.array([bounds[c][1] for c in CATEGORIES])
+    if (lower > upper).any() or lower.sum() > 1 + 1e-9 or upper.sum() < 1 - 1e-9:
+        raise ValueError("Allocation bounds leave no feasible portfolio")
+    return lower, upper
+
+
+def solve(mu: np.ndarray, sigma: np.ndarray, gamma: float, lower: np.ndarray, upper: np.ndarray,
+          start: Optional[np.ndarray] = None) -> np.ndarray:
+    """Weights maximizing mu'w - gamma/2 w'Sigma w within the bounds (primal active-set method)
+
+    ``start`` must be feasible; the previous frontier point is, and makes
+    each solve a step or two.
+    """
+    hessian = gamma * sigma
+    weights = start.copy() if start is not None else max_return(mu, lower, upper)
+    at_lower = weights - lower <= 1e-12
+    at_upper = (upper - weights <= 1e-12) & ~at_lower
+    working = at_lower | at_upper
+    # Keep one weight free; the budget constraint pins it otherwise
+    if working.all():
+        i = int(np.argmax(np.minimum(weights - lower, upper - weights)))
+        working[i] = at_lower[i] = at_upper[i] = False
+    for _ in range(MAX_ACTIVE_SET_STEPS):
+        free = np.flatnonzero(~working)
+        gradient = hessian @ weights - mu
+        # Step within the free weights that keeps the budget: H_ff p + nu = -g_f, sum(p) = 0
+        k = len(free)
+        kkt = np.zeros((k + 1, k + 1))
+        kkt[:k, :k] = hessian[np.ix_(free, free)]
+        kkt[:k, k] = kkt[k, :k] = 1
+        solution = np.linalg.solve(kkt, np.append(-gradient[free], 0.0))
+        step, nu = solution[:k], solution[k]
+        if np.abs(step).max(initial=0.0) < 1e-12:
+            # Multipliers of the bounds held: release one with the wrong sign, or stop
+            multipliers = np.where(at_lower, gradient + nu, -(gradient + nu))
+            multipliers[~working] = np.inf
+            worst = int(np.argmin(multipliers))
+            if multipliers[worst] >= -1e-12:
+                return weights
+            working[worst] = at_lower[worst] = at_upper[worst] = False
+            continue
+        # Longest step up to 1 that stays within the bounds
+        current = weights[free]
+        limits = np.full(k, np.inf)
+        down, up = step < -1e-15, step > 1e-15
+        limits[down] = (lower[free][down] - current[down]) / step[down]
+        limits[up] = (upper[free][up] - current[up]) / step[up]
+        blocking = int(np.argmin(limits))
+        alpha = min(1.0, max(limits[blocking], 0.0))
+        weights[free] = current + alpha * step
+        if alpha < 1.0:
+            i = free[blocking]
+            working[i] = True
+            at_lower[i] = step[blocking] < 0
+            at_upper[i] = not at_lower[i]
+            weights[i] = lower[i] if at_lower[i] else upper[i]
+    raise RuntimeError("Allocation optimizer did not converge")
+
+
+def max_return(mu: np.ndarray, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+    """Highest-return weights within the bounds: fill the best categories first"""
+    weights = lower.copy()
+    remaining = 1 - weights.sum()
+    for i in np.argsort(-mu, kind='stable'):
+        add = min(upper[i] - weights[i], remaining)
+        weights[i] += add
+        remaining -= add
+    return weights
+
+
+@dataclass
+class Frontier:
+    """Efficient portfolios sorted by volatility"""
+    weights: np.ndarray     # points x categories
+    returns: np.ndarray     # expected annual return of each point, fraction
+    volatility: np.ndarray  # annual volatility of each point, fraction
+
+    def at_risk(self, fraction: float) -> np.ndarray:
+        """Weights ``fraction`` of the way from the minimum- to the maximum-volatility point"""
+        target = self.volatility[0] + fraction * (self.volatility[-1] - self.volatility[0])
+        i = int(np.clip(np.searchsorted(self.volatility, target), 1, len(self.volatility) - 1))
+        span = self.volatility[i] - self.volatility[i - 1]
+        t = 0.0 if span <= 0 else float(np.clip((target - self.volatility[i - 1]) / span, 0, 1))
+        return (1 - t) * self.weights[i - 1] + t * self.weights[i]
+
+
+def build_frontier(mu: np.ndarray, sigma: np.ndarray, lower: np.ndarray, upper: np.ndarray,
+                   points: int = FRONTIER_POINTS) -> Frontier:
+    """Efficient frontier from minimum variance to maximum return"""
+    # From "return only" up to "variance only", each solve starting at the previous point
+    weights = max_return(mu, lower, upper)
+    solutions = [weights]
+    for gamma in np.geomspace(1e-2, 1e4, points - 2):
+        weights = solve(mu, sigma, gamma, lower, upper, weights)
+        solutions.append(weights)
+    solutions.append(solve(np.zeros_like(mu), sigma, 1.0, lower, upper, weights))
+    solutions.reverse()
+    weights = np.array(solutions)
+    returns = weights @ mu
+    volatility = np.sqrt(np.einsum('pi,ij,pj->p', weights, sigma, weights))
+    # Keep points that add return for their extra risk (drops solver noise)
+    keep = [0]
+    for i in range(1, len(weights)):
+        if volatility[i] > volatility[keep[-1]] + 1e-9 and returns[i] > returns[keep[-1]] + 1e-12:
+            keep.append(i)
+    return Frontier(weights[keep], returns[keep], volatility[keep])
+
+
+def to_percentages(weights: np.ndarray) -> Dict[str, int]:
+    """Whole percentages summing to exactly 100 (largest remainder), non-zero categories only"""
+    scaled = np.round(np.asarray(weights) / np.sum(weights) * 100, 9)
+    percentages = np.floor(scaled).astype(int)
+    shortfall = 100 - int(percentages.sum())
+    # Ties go to the category listed first
+    order = np.lexsort((np.arange(len(scaled)), -(scaled - percentages)))
+    percentages[order[:shortfall]] += 1
+    return {category: int(p) for category, p in zip(CATEGORIES, percentages) if p > 0}
+
+
+class AllocationTable:
+    """Allocation for every (risk score, age band, retirement goal, tax goal), tabulated up front
+
+    ``frontiers`` is keyed by (age band, retirement goal, tax goal, risk band).
+    """
+
+    def __init__(self, expected_returns: Optional[Dict[str, float]] = None,
+                 covariance: Optional[np.ndarray] = None):
+        expected_returns = expected_returns or EXPECTED_RETURNS
+        self.mu = np.array([expected_returns[c] for c in CATEGORIES]) / 100
+        self.sigma = covariance if covariance is not None else covariance_matrix()
+        self.frontiers: Dict[Tuple[int, bool, bool, int], Frontier] = {}
+        self._allocations: Dict[Tuple[int, int, bool, bool], Dict[str, int]] = {}
+        for profile in product(AGE_BAND_BOUNDS, (False, True), (False, True)):
+            for band in RISK_BAND_BOUNDS:
+                self.frontiers[(*profile, band)] = build_frontier(self.mu, self.sigma, *bounds_for(*profile, band))
+            for score in RISK_SCORES:
+                frontier = self.frontiers[(*profile, risk_band(score))]
+                weights = frontier.at_risk((score - RISK_SCORES[0]) / (RISK_SCORES[-1] - RISK_SCORES[0]))
+                self._allocations[(score, *profile)] = to_percentages(weights)
+
+    def allocation(self, risk_score: int, age: int, goals: Iterable[str]) -> Dict[str, int]:
+        """Percentages per category for a profile; a fresh dict the caller may modify"""
+        score = min(max(int(round(risk_score)), RISK_SCORES[0]), RISK_SCORES[-1])
+        goals = set(goals)
+        return dict(self._allocations[(score, age_bucket(age), 'retirement' in goals, 'tax' in goals)])
+
+    def allocations(self) -> List[Dict[str, int]]:
+        return [dict(allocation) for allocation in self._allocations.values()]
+
+
+@lru_cache(maxsize=1)
+def default_table() -> AllocationTable:
+    """The table for the default market assumptions, built once per process and shared"""
+    return AllocationTable()
@@ -0,0 +1,243 @@
+"""Chat advisor conversations streamed as Server-Sent Events.
+
+The reply is forwarded to the client token by token as the model produces it,
+so the first bytes go out as soon as the model emits its first token rather
+than after the whole reply is generated. Every event is a ``data:`` line with a
+JSON payload:
+
+    data: {"token": "A"}
+    data: {"token": " SIP"}
+    ...
+    event: done
+    data: {"session_id": "...", "seq": 42}
+
+A provider failure mid-stream ends the stream with an ``error`` event.
+
+Session history is bounded. Each message is its own document in
+``chat_messages`` keyed by (session_id, seq); the ``chat_sessions`` document
+holds the message counter and a running summary of everything up to
+``summarized_through``. A model call sees the persona, the investor profile,
+the summary and the newest unsummarized messages, trimmed to a token budget.
+When the unsummarized tail grows past the window, its oldest messages are
+folded into the summary in one batch and messages beyond the storage cap are
+deleted, so the work per turn stays the same however long a session runs.
+"""
+
+import json
+import logging
+import math
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+
+from llm import LLMClient, LocalAdvisorModel
+
+logger = logging.getLogger("investwise")
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+SUMMARY_HEADER = "Summary of the earlier conversation:\n"
+
+
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    """Format one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)"""
+    return math.ceil(len(text) / 4) + 1
+
+
+def trim_to_tokens(text: str, limit: int) -> str:
+    """Keep the newest lines of ``text`` that fit in ``limit`` tokens"""
+    if estimate_tokens(text) <= limit:
+        return text
+    kept, used = [], 0
+    for line in reversed(text.splitlines()):
+        cost = estimate_tokens(line)
+        if used + cost > limit:
+            break
+        kept.append(line)
+        used += cost
+    if not kept:
+        return text[-(limit - 1) * 4:] if limit > 1 else ""
+    return "\n".join(reversed(kept))
+
+
+def profile_context(user_data: Optional[dict]) -> Optional[str]:
+    """One-paragraph summary of the investor's profile for the model"""
+    if not user_data:
+        return None
+    return (
+        f"Investor profile: {user_data.get('name')}, age {user_data.get('age')}, "
+        f"{user_data.get('occupation')}, annual income ₹{user_data.get('income', 0):,.0f}, "
+        f"savings ₹{user_data.get('current_savings', 0):,.0f}, "
+        f"{user_data.get('investment_experience')} investor with {user_data.get('risk_tolerance')} "
+        f"risk tolerance, goals: {', '.join(user_data.get('financial_goals', [])) or 'not stated'}, "
+        f"timeline: {user_data.get('investment_timeline')}."
+    )
+
+
+class ExtractiveSummarizer:
+    """Deterministic summary: one clipped line per investor question"""
+
+    def __init__(self, max_line_chars: int = 160):
+        self.max_line_chars = max_line_chars
+
+    async def __call__(self, summary: str, messages: List[dict]) -> str:
+        lines = summary.splitlines() if summary else []
+        for message in messages:
+            if message["role"] == "user":
+                lines.append(f"- Investor asked: {message['content'][:self.max_line_chars]}")
+        return "\n".join(lines)
+
+
+class LLMSummarizer:
+    """Fold older turns into the running summary with the chat model itself"""
+
+    PROMPT = ("You maintain a running summary of a conversation between an Indian retail investor "
+              "and their financial advisor. Update the summary with the new messages. Keep the "
+              "investor's goals, amounts, time horizons, concerns and any advice already given. "
+              "Reply with the updated summary only, in at most {words} words.")
+
+    def __init__(self, llm: LLMClient, max_words: int = 200):
+        self.llm = llm
+        self.max_words = max_words
+
+    async def __call__(self, summary: str, messages: List[dict]) -> str:
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        return await self.llm.complete([
+            {"role": "system", "content": self.PROMPT.format(words=self.max_words)},
+            {"role": "user", "content": f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"},
+        ])
+
+
+def summarizer_for(llm: LLMClient):
+    if isinstance(getattr(llm, "upstream", llm), LocalAdvisorModel):
+        return ExtractiveSummarizer()
+    return LLMSummarizer(llm)
+
+
+@dataclass(frozen=True)
+class ChatMemorySettings:
+    """Bounds on what a chat session keeps and sends to the model"""
+
+    window_messages: int = 12         # newest messages sent verbatim
+    fold_batch: int = 8               # unsummarized overflow folded into the summary at once
+    token_budget: int = 3000          # prompt tokens per model call
+    summary_tokens: int = 400         # cap on the running summary
+    max_stored_messages: int = 200    # messages kept per session, enforced at each fold
+
+    @classmethod
+    def from_env(cls) -> "ChatMemorySettings":
+        return cls(
+            window_messages=int(os.getenv('CHAT_WINDOW_MESSAGES', cls.window_messages)),
+            fold_batch=int(os.getenv('CHAT_FOLD_BATCH', cls.fold_batch)),
+            token_budget=int(os.getenv('CHAT_TOKEN_BUDGET', cls.token_budget)),
+            summary_tokens=int(os.getenv('CHAT_SUMMARY_TOKENS', cls.summary_tokens)),
+            max_stored_messages=int(os.getenv('CHAT_MAX_STORED_MESSAGES', cls.max_stored_messages)),
+        )
+
+
+class ChatMemory:
+    """Windowed, summarized history for chat sessions"""
+
+    def __init__(self, database, summarizer, settings: ChatMemorySettings = ChatMemorySettings()):
+        self.sessions = database.chat_sessions
+        self.messages = database.chat_messages
+        self.summarizer = summarizer
+        self.settings = settings
+
+    async def prompt(self, session_id: str, system_message: str, user_data: Optional[dict], message: str) -> List[dict]:
+        """Messages for the next model call, within the token budget"""
+        session = await self.sessions.get(session_id) or {}
+        summarized_through = session.get("summarized_through", 0)
+        window = await self.messages.latest(session_id, summarized_through, self.settings.window_messages)
+
+        head = [{"role": "system", "content": system_message}]
+        context = profile_context(user_data)
+        if context:
+            head.append({"role": "system", "content": context})
+        question = {"role": "user", "content": message}
+
+        remaining = self.settings.token_budget - sum(estimate_tokens(m["content"]) for m in head + [question])
+        if remaining < 0:
+            raise ValueError("Message is too long for the chat token budget")
+
+        header_tokens = estimate_tokens(SUMMARY_HEADER)
+        summary = trim_to_tokens(session.get("summary", ""), min(self.settings.summary_tokens, remaining - header_tokens))
+        if summary:
+            remaining -= header_tokens + estimate_tokens(summary)
+            head.append({"role": "system", "content": SUMMARY_HEADER + summary})
+
+        recent = []
+        for past in reversed(window):
+            cost = estimate_tokens(past["content"])
+            if cost > remaining:
+                break
+            recent.append({"role": past["role"], "content": past["content"]})
+            remaining -= cost
+        return head + recent[::-1] + [question]
+
+    async def record(self, session_id: str, user_id: str, message: str, reply: str) -> int:
+        """Store one exchange; returns the reply's seq"""
+        now = datetime.now()
+        last = await self.sessions.reserve_seqs(session_id, user_id, 2, now)
+        await self.messages.add_many([
+            {"session_id": session_id, "seq": last - 1, "role": "user", "content": message, "created_at": now},
+            {"session_id": session_id, "seq": last, "role": "assistant", "content": reply, "created_at": now},
+        ])
+        return last
+
+    async def compact(self, session_id: str) -> bool:
+        """Fold the oldest unsummarized messages into the summary once the tail outgrows the window"""
+        session = await self.sessions.get(session_id)
+        if session is None:
+            return False
+        last = session["message_count"]
+        previous = session.get("summarized_through", 0)
+        if last - previous <= self.settings.window_messages + self.settings.fold_batch:
+            return False
+
+        through = last - self.settings.window_messages
+        folded = await self.messages.between(session_id, previous, through)
+        summary = await self.summarizer(session.get("summary", ""), folded)
+        summary = trim_to_tokens(summary, self.settings.summary_tokens)
+        if not await self.sessions.update_summary(session_id, summary, previous, through):
+            return False  # a concurrent turn already folded this range
+        prune_through = min(through, last - self.settings.max_stored_messages)
+        if prune_through > 0:
+            await self.messages.prune(session_id, prune_through)
+        return True
+
+
+async def stream_reply(
+    llm: LLMClient,
+    messages: List[dict],
+    session_id: str,
+    save: Callable[[str], Awaitable[int]],
+    after: Optional[Callable[[], Awaitable]] = None,
+) -> AsyncIterator[str]:
+    """SSE events for one reply
+
+    ``save`` stores the finished reply and returns its seq; ``after`` runs once
+    the ``done`` event has been sent (history compaction goes there, off the
+    reply's critical path).
+    """
+    tokens = []
+    try:
+        async for token in llm.stream(messages):
+            tokens.append(token)
+            yield sse_event({"token": token})
+    except Exception as e:
+        yield sse_event({"detail": f"Chat model failed: {e}"}, event="error")
+        return
+    seq = await save("".join(tokens))
+    yield sse_event({"session_id": session_id, "seq": seq}, event="done")
+    if after is not None:
+        try:
+            await after()
+        except Exception as e:
+            logger.warning("Chat session %s compaction failed: %s", session_id, e)
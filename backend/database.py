@@ -0,0 +1,512 @@
+"""Async MongoDB data layer for InvestWise AI.
+
+pymongo is a blocking driver, so calling it from an ``async def`` route stalls
+the whole uvicorn worker for the duration of the round-trip. Every collection
+is wrapped in an executor-backed adapter that runs driver calls on a bounded
+thread pool sized to match the client's connection pool, and the route
+handlers talk to small per-collection repositories instead of raw collections.
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from pymongo import ASCENDING, DESCENDING, InsertOne, MongoClient, ReplaceOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+# Server error code for a unique index violation
+DUPLICATE_KEY = 11000
+
+# Indexes created at startup, keyed by collection name. Assessments are
+# append-only, so (user_id, created_at desc) serves both the equality match and
+# the "newest first" sort without a COLLSCAN or in-memory SORT stage.
+# Recommendations hold one record per user, replaced in place; the unique
+# user_id index enforces that, so two concurrent first upserts cannot both insert.
+INDEXES = {
+    "users": [
+        ([("user_id", ASCENDING)], {"name": "user_id_unique", "unique": True}),
+    ],
+    "assessments": [
+        ([("user_id", ASCENDING), ("created_at", DESCENDING)], {"name": "user_id_created_at"}),
+    ],
+    "recommendations": [
+        ([("user_id", ASCENDING)], {"name": "user_id_unique", "unique": True}),
+        # Sparse: documents written before recommendation ids existed don't have one
+        ([("recommendation_id", ASCENDING)], {"name": "recommendation_id_unique", "unique": True, "sparse": True}),
+    ],
+    "chat_sessions": [
+        ([("session_id", ASCENDING)], {"name": "session_id"}),
+    ],
+    # One document per chat message; seq is the message's position in its session
+    "chat_messages": [
+        ([("session_id", ASCENDING), ("seq", ASCENDING)], {"name": "session_id_seq", "unique": True}),
+    ],
+}
+
+# Indexes of earlier layouts that INDEXES replaced; ensure_indexes drops them
+RETIRED_INDEXES = {
+    "recommendations": ["user_id_created_at"],
+}
+
+# Multi-kilobyte markdown sections of a recommendation. They are rendered on
+# demand from the stored record (older documents stored the text itself); the
+# dashboard leaves them out unless named explicitly in ``fields``.
+RECOMMENDATION_TEXT_FIELDS = (
+    "rationale",
+    "risk_mitigation",
+    "expected_returns",
+    "tax_implications",
+    "investment_strategy",
+)
+
+# Recommendations are stored as a compact record: one per user, holding the
+# allocation, the chosen scheme codes and the parameters the rest is derived
+# from. These fields are rebuilt from the record on read.
+RECOMMENDATION_DERIVED_FIELDS = (
+    "mutual_funds",
+    "rebalancing_frequency",
+    "sip_recommendation",
+) + RECOMMENDATION_TEXT_FIELDS
+RECOMMENDATION_RECORD_INPUTS = ("parameters", "portfolio_allocation", "fund_codes")
+
+# Dashboard section -> collection it is looked up from (None for the user itself)
+DASHBOARD_SECTIONS = {
+    "user_profile": None,
+    "risk_assessment": "assessments",
+    "recommendations": "recommendations",
+}
+
+
+def parse_dashboard_fields(fields: Optional[str]) -> Dict[str, Optional[Set[str]]]:
+    """Parse ``fields=section,section.field`` into {section: field set, or None for all}"""
+    if not fields:
+        return {section: None for section in DASHBOARD_SECTIONS}
+
+    sections: Dict[str, Optional[Set[str]]] = {}
+    for item in (part.strip() for part in fields.split(",")):
+        if not item:
+            continue
+        section, _, field = item.partition(".")
+        if section not in DASHBOARD_SECTIONS:
+            raise ValueError(f"Unknown dashboard section: {section}")
+        if not field:
+            sections[section] = None
+        elif section not in sections or sections[section] is not None:
+            sections.setdefault(section, set()).add(field)
+    return sections
+
+
+def parse_recommendation_sections(include: Optional[str]) -> Tuple[str, ...]:
+    """Parse ``include=section,section`` into text section names; all of them when not given"""
+    if include is None:
+        return RECOMMENDATION_TEXT_FIELDS
+    names = {name.strip() for name in include.split(",") if name.strip()}
+    unknown = names.difference(RECOMMENDATION_TEXT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown recommendation section: {', '.join(sorted(unknown))}")
+    return tuple(name for name in RECOMMENDATION_TEXT_FIELDS if name in names)
+
+
+def _dashboard_projection(section: str, requested: Optional[Set[str]]) -> dict:
+    if requested:
+        projection = {field: 1 for field in requested}
+        if section == "recommendations" and requested.intersection(RECOMMENDATION_DERIVED_FIELDS):
+            # Derived fields are rebuilt from these
+            projection.update({field: 1 for field in RECOMMENDATION_RECORD_INPUTS})
+    elif section == "recommendations":
+        projection = {field: 0 for field in RECOMMENDATION_TEXT_FIELDS}
+    else:
+        projection = {}
+    projection["_id"] = 0
+    return projection
+
+
+def build_dashboard_pipeline(user_id: str, sections: Dict[str, Optional[Set[str]]]) -> List[dict]:
+    """Aggregation that assembles the dashboard from the users collection in one round-trip
+
+    Sticks to stages MongoDB 3.6 runs: ``$lookup`` sub-pipelines with ``let``, ``$addFields``
+    and an exclusion ``$project`` (mongomock does not run the lookups).
+    """
+    user_fields = sections["user_profile"] if "user_profile" in sections else {"user_id"}
+    user_projection = _dashboard_projection("user_profile", user_fields)
+    if user_fields:
+        user_projection["user_id"] = 1  # the lookups join on it
+
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$limit": 1},
+        {"$project": user_projection},
+        {"$replaceRoot": {"newRoot": {"user_profile": "$$ROOT"}}},
+    ]
+    for section, collection in DASHBOARD_SECTIONS.items():
+        if collection is None or section not in sections:
+            continue
+        # let + $expr rather than localField with a pipeline, which needs MongoDB 5.0;
+        # the $expr equality still uses the user_id indexes
+        pipeline.append({"$lookup": {
+            "from": collection,
+            "let": {"user_id": "$user_profile.user_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$user_id", "$$user_id"]}}},
+                {"$sort": {"created_at": -1}},
+                {"$limit": 1},
+                {"$project": _dashboard_projection(section, sections[section])},
+            ],
+            "as": section,
+        }})
+        pipeline.append({"$addFields": {section: {"$ifNull": [{"$arrayElemAt": [f"${section}", 0]}, None]}}})
+    if "user_profile" not in sections:
+        pipeline.append({"$project": {"user_profile": 0}})
+    return pipeline
+
+
+@dataclass(frozen=True)
+class MongoSettings:
+    """Connection and pool settings for the Mongo client"""
+
+    url: Optional[str] = None
+    database: str = "investwise_ai"
+    max_pool_size: int = 50
+    min_pool_size: int = 0
+    server_selection_timeout_ms: int = 5000
+    executor_workers: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "MongoSettings":
+        """Build settings from MONGO_* environment variables"""
+        workers = os.getenv('MONGO_EXECUTOR_WORKERS')
+        return cls(
+            url=os.getenv('MONGO_URL'),
+            database=os.getenv('MONGO_DB_NAME', cls.database),
+            max_pool_size=int(os.getenv('MONGO_MAX_POOL_SIZE', cls.max_pool_size)),
+            min_pool_size=int(os.getenv('MONGO_MIN_POOL_SIZE', cls.min_pool_size)),
+            server_selection_timeout_ms=int(
+                os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', cls.server_selection_timeout_ms)
+            ),
+            executor_workers=int(workers) if workers else None,
+        )
+
+    @property
+    def workers(self) -> int:
+        """Thread count for the executor; one per pooled connection by default"""
+        return self.executor_workers or self.max_pool_size
+
+
+def _write_errors(error: BulkWriteError, ignore_codes: Tuple[int, ...] = ()) -> Dict[int, str]:
+    """{position: message} for the failed operations of an unordered bulk write"""
+    return {
+        err['index']: err.get('errmsg', 'write failed')
+        for err in error.details.get('writeErrors', [])
+        if err.get('code') not in ignore_codes
+    }
+
+
+class AsyncCollection:
+    """Awaitable facade over a pymongo collection"""
+
+    def __init__(self, collection, executor: ThreadPoolExecutor):
+        self.collection = collection
+        self._executor = executor
+
+    @property
+    def name(self) -> str:
+        return self.collection.name
+
+    async def run(self, fn, *args, **kwargs) -> Any:
+        """Run a blocking driver call on the executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def find_one(self, *args, **kwargs) -> Optional[dict]:
+        return await self.run(self.collection.find_one, *args, **kwargs)
+
+    async def find(self, *args, sort=None, limit: int = 0, **kwargs) -> List[dict]:
+        def _find():
+            cursor = self.collection.find(*args, **kwargs)
+            if sort:
+                cursor = cursor.sort(sort)
+            if limit:
+                cursor = cursor.limit(limit)
+            return list(cursor)
+        return await self.run(_find)
+
+    async def insert_one(self, document: dict, **kwargs):
+        return await self.run(self.collection.insert_one, document, **kwargs)
+
+    async def insert_many(self, documents: List[dict], **kwargs):
+        return await self.run(self.collection.insert_many, documents, **kwargs)
+
+    async def update_one(self, *args, **kwargs):
+        return await self.run(self.collection.update_one, *args, **kwargs)
+
+    async def replace_one(self, *args, **kwargs):
+        return await self.run(self.collection.replace_one, *args, **kwargs)
+
+    async def find_one_and_update(self, *args, **kwargs) -> Optional[dict]:
+        return await self.run(self.collection.find_one_and_update, *args, **kwargs)
+
+    async def delete_many(self, *args, **kwargs):
+        return await self.run(self.collection.delete_many, *args, **kwargs)
+
+    async def bulk_write(self, requests: list, **kwargs):
+        return await self.run(self.collection.bulk_write, requests, **kwargs)
+
+    async def bulk_write_unordered(self, requests: list, ignore_codes: Tuple[int, ...] = ()) -> Dict[int, str]:
+        """Unordered bulk write; returns {position: error message} for failed operations"""
+        if not requests:
+            return {}
+        try:
+            await self.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            return _write_errors(e, ignore_codes)
+        return {}
+
+    async def count_documents(self, *args, **kwargs) -> int:
+        return await self.run(self.collection.count_documents, *args, **kwargs)
+
+    async def aggregate(self, pipeline: List[dict], **kwargs) -> List[dict]:
+        return await self.run(lambda: list(self.collection.aggregate(pipeline, **kwargs)))
+
+    async def create_index(self, keys, **kwargs) -> str:
+        return await self.run(self.collection.create_index, keys, **kwargs)
+
+    async def index_information(self) -> Dict[str, dict]:
+        return await self.run(self.collection.index_information)
+
+    async def drop_index(self, name: str) -> None:
+        await self.run(self.collection.drop_index, name)
+
+
+class Repository:
+    """Base class for per-collection repositories"""
+
+    def __init__(self, collection: AsyncCollection):
+        self.collection = collection
+
+
+class UserRepository(Repository):
+    async def get(self, user_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"user_id": user_id})
+
+    async def create(self, user_data: dict) -> None:
+        await self.collection.insert_one(user_data)
+
+    async def find_many(self, user_ids: List[str], projection: Optional[dict] = None) -> List[dict]:
+        """Stored users among ``user_ids``, in one ``$in`` query; unknown ids are left out"""
+        return await self.collection.find({"user_id": {"$in": list(user_ids)}}, {"_id": 0, **(projection or {})})
+
+    async def create_many(self, users: List[dict]) -> Dict[int, str]:
+        """Unordered insert of new users; returns {position: error message} for failed ones"""
+        return await self.collection.bulk_write_unordered([InsertOne(user) for user in users])
+
+    async def pages(
+        self, page_size: int, after: Optional[str] = None, projection: Optional[dict] = None
+    ) -> AsyncIterator[List[dict]]:
+        """Users in ``user_id`` order after ``after``, ``page_size`` at a time, from one cursor
+
+        Each page is read on the executor; the cursor is closed when the
+        iteration ends or the generator is closed.
+        """
+        query = {"user_id": {"$gt": after}} if after else {}
+        cursor = self.collection.collection.find(query, projection).sort("user_id", ASCENDING).batch_size(page_size)
+        try:
+            while True:
+                page = await self.collection.run(lambda: list(islice(cursor, page_size)))
+                if not page:
+                    return
+                yield page
+        finally:
+            await self.collection.run(cursor.close)
+
+
+class UserHistoryRepository(Repository):
+    """Append-only per-user documents, read newest first via (user_id, created_at)"""
+
+    LATEST_SORT = [("created_at", DESCENDING)]
+
+    async def latest_for_user(self, user_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"user_id": user_id}, sort=self.LATEST_SORT)
+
+    async def explain_latest(self, user_id: str) -> dict:
+        """Query plan for latest_for_user, used to verify index usage"""
+        def _explain():
+            cursor = self.collection.collection.find({"user_id": user_id})
+            return cursor.sort(self.LATEST_SORT).limit(1).explain()
+        return await self.collection.run(_explain)
+
+    async def add(self, document: dict) -> None:
+        await self.collection.insert_one(document)
+
+
+class AssessmentRepository(UserHistoryRepository):
+    async def add_many(self, documents: List[dict]) -> Dict[int, str]:
+        """Unordered insert; returns {position: error message} for failed documents"""
+        return await self.collection.bulk_write_unordered([InsertOne(doc) for doc in documents])
+
+    async def add_many_once(self, documents: List[dict]) -> Dict[int, str]:
+        """Unordered insert of documents with deterministic ``_id``s; ones already stored are skipped
+
+        Returns {position: error message} for documents that failed otherwise.
+        """
+        return await self.collection.bulk_write_unordered(
+            [InsertOne(doc) for doc in documents], ignore_codes=(DUPLICATE_KEY,)
+        )
+
+
+class RecommendationRepository(Repository):
+    """One record per user, replaced in place on every refresh"""
+
+    async def latest_for_user(self, user_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"user_id": user_id})
+
+    async def explain_latest(self, user_id: str) -> dict:
+        """Query plan for latest_for_user, used to verify index usage"""
+        return await self.collection.run(lambda: self.collection.collection.find({"user_id": user_id}).explain())
+
+    async def upsert_for_user(self, record: dict) -> None:
+        """Replace the user's recommendation record, creating it on first use
+
+        The whole document is replaced: fields of an older layout must not
+        survive next to the new record.
+        """
+        try:
+            await self.collection.replace_one({"user_id": record["user_id"]}, record, upsert=True)
+        except DuplicateKeyError:
+            # A concurrent first upsert inserted the record; the replace now matches it
+            await self.collection.replace_one({"user_id": record["user_id"]}, record, upsert=True)
+
+    async def upsert_many(self, records: List[dict]) -> Dict[int, str]:
+        """``upsert_for_user`` for many records in one unordered bulk write; returns failed positions"""
+        return await self.collection.bulk_write_unordered(
+            [ReplaceOne({"user_id": r["user_id"]}, r, upsert=True) for r in records]
+        )
+
+    async def get(self, recommendation_id: str, projection: Optional[dict] = None) -> Optional[dict]:
+        return await self.collection.find_one(
+            {"recommendation_id": recommendation_id}, {"_id": 0, **(projection or {})}
+        )
+
+
+class ChatSessionRepository(Repository):
+    """One document per session: owner, message counter and the running summary"""
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"session_id": session_id}, {"_id": 0})
+
+    async def add(self, session_data: dict) -> None:
+        await self.collection.insert_one(session_data)
+
+    async def reserve_seqs(self, session_id: str, user_id: str, count: int, now) -> int:
+        """Claim ``count`` message positions; returns the last one claimed"""
+        session = await self.collection.find_one_and_update(
+            {"session_id": session_id},
+            {
+                "$inc": {"message_count": count},
+                "$set": {"updated_at": now},
+                "$setOnInsert": {"user_id": user_id, "summary": "", "summarized_through": 0, "created_at": now},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return session["message_count"]
+
+    async def update_summary(self, session_id: str, summary: str, previous_through: int, summarized_through: int) -> bool:
+        """Store a folded summary unless another writer already moved past ``previous_through``"""
+        result = await self.collection.update_one(
+            {"session_id": session_id, "summarized_through": previous_through},
+            {"$set": {"summary": summary, "summarized_through": summarized_through}},
+        )
+        return result.modified_count == 1
+
+
+class CheckpointRepository(Repository):
+    """Progress of resumable batch jobs, one document per job name"""
+
+    async def get(self, job: str) -> Optional[dict]:
+        return await self.collection.find_one({"_id": job})
+
+    async def save(self, job: str, state: dict) -> None:
+        await self.collection.update_one({"_id": job}, {"$set": state}, upsert=True)
+
+
+class ChatMessageRepository(Repository):
+    """Per-message documents addressed by (session_id, seq)"""
+
+    async def add_many(self, messages: List[dict]) -> None:
+        await self.collection.insert_many(messages)
+
+    async def latest(self, session_id: str, after_seq: int, limit: int) -> List[dict]:
+        """Up to ``limit`` newest messages with seq > after_seq, oldest first"""
+        messages = await self.collection.find(
+            {"session_id": session_id, "seq": {"$gt": after_seq}}, {"_id": 0},
+            sort=[("seq", DESCENDING)], limit=limit,
+        )
+        return messages[::-1]
+
+    async def between(self, session_id: str, after_seq: int, through_seq: int) -> List[dict]:
+        """Messages with after_seq < seq <= through_seq, oldest first"""
+        return await self.collection.find(
+            {"session_id": session_id, "seq": {"$gt": after_seq, "$lte": through_seq}}, {"_id": 0},
+            sort=[("seq", ASCENDING)],
+        )
+
+    async def prune(self, session_id: str, through_seq: int) -> int:
+        """Delete messages with seq <= through_seq"""
+        result = await self.collection.delete_many({"session_id": session_id, "seq": {"$lte": through_seq}})
+        return result.deleted_count
+
+
+class Database:
+    """Pooled client, executor and the repositories built on top of them"""
+
+    def __init__(self, client, database_name: str, executor_workers: int):
+        self.client = client
+        self.db = client[database_name]
+        self.executor = ThreadPoolExecutor(
+            max_workers=executor_workers, thread_name_prefix="mongo"
+        )
+        self.users = UserRepository(self._collection("users"))
+        self.assessments = AssessmentRepository(self._collection("assessments"))
+        self.recommendations = RecommendationRepository(self._collection("recommendations"))
+        self.chat_sessions = ChatSessionRepository(self._collection("chat_sessions"))
+        self.chat_messages = ChatMessageRepository(self._collection("chat_messages"))
+        self.job_checkpoints = CheckpointRepository(self._collection("job_checkpoints"))
+
+    @classmethod
+    def from_settings(cls, settings: MongoSettings) -> "Database":
+        client = MongoClient(
+            settings.url,
+            maxPoolSize=settings.max_pool_size,
+            minPoolSize=settings.min_pool_size,
+            serverSelectionTimeoutMS=settings.server_selection_timeout_ms,
+        )
+        return cls(client, settings.database, settings.workers)
+
+    def _collection(self, name: str) -> AsyncCollection:
+        return AsyncCollection(self.db[name], self.executor)
+
+    async def dashboard(self, user_id: str, sections: Dict[str, Optional[Set[str]]]) -> Optional[dict]:
+        """User profile plus latest assessment and recommendation, or None if the user is unknown"""
+        users = self._collection("users")
+        results = await users.aggregate(build_dashboard_pipeline(user_id, sections))
+        return results[0] if results else None
+
+    async def ensure_indexes(self) -> None:
+        """Create the indexes in INDEXES and drop RETIRED_INDEXES; a no-op once both are done"""
+        for name, retired in RETIRED_INDEXES.items():
+            collection = self._collection(name)
+            existing = await collection.index_information()
+            for index_name in set(retired).intersection(existing):
+                await collection.drop_index(index_name)
+        for name, indexes in INDEXES.items():
+            collection = self._collection(name)
+            for keys, options in indexes:
+                await collection.create_index(keys, **options)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+        self.client.close()
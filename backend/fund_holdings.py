@@ -0,0 +1,208 @@
+"""Portfolio holdings of each scheme, for overlap and concentration analysis.
+
+A holdings file (CSV with ``scheme_code,isin,stock,sector,weight`` rows,
+weight in percent of the scheme's assets) is loaded into a scheme x stock
+matrix in compressed sparse row form: ``indptr`` delimits each scheme's
+entries, ``indices`` are stock numbers and ``weights`` fractions. A scheme
+holds a few dozen of the market's thousands of stocks, so a 10,000-scheme
+universe is well under a million entries. Stock ISINs, names and sectors
+are kept once per stock.
+
+For a set of funds:
+
+- stock exposure for given fund weights is the sparse product ``x'W``,
+  and sector exposure sums it by sector;
+- common holdings between every pair are the product ``B B'`` of the
+  funds' indicator rows;
+- pairwise overlap is ``sum(min(w_a, w_b))`` over stocks: the share of one
+  fund's portfolio also held by the other. It is the same product with
+  ``min`` in place of multiplication, taken over the pairs of funds holding
+  each stock.
+
+``fund_selection`` uses the pairwise overlaps when choosing funds.
+"""
+
+import csv
+import hashlib
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from fund_universe import CategoricalStrings, PackedStrings
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'fund_holdings.csv')
+
+
+class FundHoldings:
+    """Scheme x stock weight matrix in CSR form"""
+
+    def __init__(self, schemes: Sequence[str], indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray,
+                 isins: Sequence[str], names: Sequence[str], sectors: Sequence[str], source: Optional[str] = None):
+        self.schemes = tuple(schemes)
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.isins = PackedStrings(isins)
+        self.names = PackedStrings(names)
+        self.sectors = CategoricalStrings(sectors)
+        self.source = source
+        self._row_by_code = {code: row for row, code in enumerate(self.schemes)}
+        digest = hashlib.sha256("\x1f".join(self.schemes).encode())
+        for array in (indptr, indices, weights):
+            digest.update(array.tobytes())
+        digest.update(self.isins.buffer)
+        self.version = digest.hexdigest()[:16]
+
+    @property
+    def stocks(self) -> int:
+        return len(self.isins)
+
+    @property
+    def nbytes(self) -> int:
+        return (self.indptr.nbytes + self.indices.nbytes + self.weights.nbytes
+                + self.isins.nbytes + self.names.nbytes + self.sectors.nbytes)
+
+    def __contains__(self, scheme_code: str) -> bool:
+        return scheme_code in self._row_by_code
+
+    def stats(self) -> dict:
+        return {"schemes": len(self.schemes), "stocks": self.stocks, "holdings": int(len(self.indices)),
+                "bytes": self.nbytes, "version": self.version}
+
+    def row_for(self, scheme_code: str) -> Optional[int]:
+        return self._row_by_code.get(scheme_code)
+
+    def _entries(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions in ``indices``/``weights`` of the given rows' entries, and which row each belongs to"""
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        lengths = ends - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return offsets + np.arange(lengths.sum()), np.repeat(np.arange(len(rows)), lengths)
+
+    def exposure(self, rows: np.ndarray, fund_weights: np.ndarray) -> np.ndarray:
+        """Weight of every stock in a portfolio of the given rows (``x'W``)"""
+        positions, owner = self._entries(rows)
+        return np.bincount(self.indices[positions], weights=self.weights[positions] * fund_weights[owner],
+                           minlength=self.stocks)
+
+    def overlap(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Pairwise overlap (sum of minimum weights) and common-holdings counts of the given rows"""
+        positions, owner = self._entries(rows)
+        order = np.argsort(self.indices[positions], kind='stable')
+        stocks, owner, weights = self.indices[positions][order], owner[order], self.weights[positions][order]
+        # Pair every entry with every entry of the same stock: B B' with min() in place of the product
+        first = np.flatnonzero(np.r_[True, stocks[1:] != stocks[:-1]])
+        holders = np.diff(np.r_[first, len(stocks)])
+        group_start = np.repeat(first, holders)
+        group_size = np.repeat(holders, holders)
+        left = np.repeat(np.arange(len(stocks)), group_size)
+        within = np.arange(len(left)) - np.repeat(np.cumsum(group_size) - group_size, group_size)
+        right = np.repeat(group_start, group_size) + within
+        cells = owner[left] * len(rows) + owner[right]
+        size = len(rows) * len(rows)
+        overlap = np.bincount(cells, weights=np.minimum(weights[left], weights[right]), minlength=size)
+        common = np.bincount(cells, minlength=size)
+        return overlap.reshape(len(rows), len(rows)), common.reshape(len(rows), len(rows))
+
+    def analyze(self, scheme_codes: Sequence[str], fund_weights: Optional[Sequence[float]] = None,
+                top: int = 10) -> dict:
+        """Overlap between a set of funds and their combined stock and sector exposure"""
+        if not scheme_codes:
+            raise ValueError("At least one scheme is required")
+        missing = [code for code in scheme_codes if code not in self]
+        if missing:
+            raise ValueError(f"No holdings for: {', '.join(missing)}")
+        if fund_weights is None:
+            fund_weights = np.full(len(scheme_codes), 1.0)
+        fund_weights = np.asarray(fund_weights, dtype=float)
+        if fund_weights.shape != (len(scheme_codes),) or (fund_weights < 0).any() or fund_weights.sum() <= 0:
+            raise ValueError("weights must be one non-negative number per scheme, not all zero")
+        fund_weights = fund_weights / fund_weights.sum()
+        rows = np.array([self.row_for(code) for code in scheme_codes])
+
+        overlap, common = self.overlap(rows)
+        pairs = [
+            {"scheme_codes": [scheme_codes[a], scheme_codes[b]],
+             "overlap_percent": round(float(overlap[a, b]) * 100, 2), "common_stocks": int(common[a, b])}
+            for a in range(len(rows)) for b in range(a + 1, len(rows))
+        ]
+        stocks = self.exposure(rows, fund_weights)
+        sectors = np.bincount(self.sectors.codes, weights=stocks, minlength=len(self.sectors.table))
+        largest = np.argsort(-stocks, kind='stable')[:top]
+        return {
+            "pairwise_overlap": sorted(pairs, key=lambda pair: -pair["overlap_percent"]),
+            "top_stocks": [
+                {"isin": self.isins[s], "stock": self.names[s], "sector": self.sectors[s],
+                 "weight_percent": round(float(stocks[s]) * 100, 2)}
+                for s in largest if stocks[s] > 0
+            ],
+            "sector_exposure": {
+                self.sectors.table[code]: round(float(sectors[code]) * 100, 2)
+                for code in np.argsort(-sectors, kind='stable') if sectors[code] > 0
+            },
+            "distinct_stocks": int((stocks > 0).sum()),
+        }
+
+    @classmethod
+    def from_rows(cls, rows, source: Optional[str] = None) -> "FundHoldings":
+        """Build from ``{scheme_code, isin, stock, sector, weight}`` records; repeated stocks add up"""
+        scheme_ids: Dict[str, int] = {}
+        stock_ids: Dict[str, int] = {}
+        names: List[str] = []
+        sectors: List[str] = []
+        scheme_of, stock_of, weight_of = [], [], []
+        for row in rows:
+            scheme = scheme_ids.setdefault(row['scheme_code'], len(scheme_ids))
+            stock = stock_ids.get(row['isin'])
+            if stock is None:
+                stock = stock_ids[row['isin']] = len(stock_ids)
+                names.append(row['stock'])
+                sectors.append(row['sector'])
+            scheme_of.append(scheme)
+            stock_of.append(stock)
+            weight_of.append(float(row['weight']) / 100)
+
+        scheme_of = np.array(scheme_of, dtype=np.int64)
+        stock_of = np.array(stock_of, dtype=np.int64)
+        cells, inverse = np.unique(scheme_of * max(len(stock_ids), 1) + stock_of, return_inverse=True)
+        weights = np.bincount(inverse.ravel(), weights=weight_of, minlength=len(cells)).astype(np.float32)
+        schemes_per_cell = cells // max(len(stock_ids), 1)
+        indptr = np.zeros(len(scheme_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(schemes_per_cell, minlength=len(scheme_ids)), out=indptr[1:])
+        indices = (cells % max(len(stock_ids), 1)).astype(np.int32)
+        return cls(list(scheme_ids), indptr, indices, weights, list(stock_ids), names, sectors, source=source)
+
+    @classmethod
+    def load(cls, path: str) -> "FundHoldings":
+        with open(path, newline='', encoding='utf-8') as fh:
+            return cls.from_rows(csv.DictReader(fh), source=path)
+
+
+class FundHoldingsStore:
+    """Holds the current holdings matrix and reloads it when the file changes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self.holdings: Optional[FundHoldings] = None
+
+    @classmethod
+    def from_env(cls) -> "FundHoldingsStore":
+        return cls(os.getenv('FUND_HOLDINGS_PATH', DEFAULT_PATH))
+
+    def reload_if_changed(self) -> Optional[FundHoldings]:
+        """Load the file if it appeared or changed since the last load; returns the new holdings or None"""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return None
+            signature = stat.st_mtime_ns, stat.st_size
+            if signature == self._signature:
+                return None
+            self.holdings = FundHoldings.load(self.path)
+            self._signature = signature
+            return self.holdings
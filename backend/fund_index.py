@@ -0,0 +1,118 @@
+"""Pre-ranked index over the mutual fund universe.
+
+Each category is sorted once per ranking key when the index is built. The
+common filters (``min_investment <= X`` and ``exit_load == 0``) are folded in
+ahead of time too: for every distinct ``min_investment`` value in a category
+the index keeps the ranked row numbers of funds at or below it, with and
+without exit-load funds, so a filtered top-k query is a bisect plus a slice
+returning ``k`` zero-copy ``FundView`` objects.
+
+When risk metrics computed from the NAV history are supplied, the index also
+ranks by them (``RISK_RANKINGS``) and ranks by Sharpe ratio unless asked
+otherwise. Funds without enough history sort after the others, by rating.
+"""
+
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from fund_universe import FundUniverse, FundView
+
+# Ranking name -> sort keys, most significant first, as (field, descending)
+RANKINGS = {
+    'rating': (('rating', True), ('returns_3y', True)),
+    'returns_5y': (('returns_5y', True),),
+    'returns_10y': (('returns_10y', True),),
+    'expense_ratio': (('expense_ratio', False),),
+    'aum': (('aum', True),),
+}
+# Rankings over fund_metrics columns (max_drawdown is negative: descending is shallowest first)
+RISK_RANKINGS = {
+    'sharpe': (('sharpe', True), ('rating', True), ('returns_3y', True)),
+    'sortino': (('sortino', True), ('rating', True), ('returns_3y', True)),
+    'max_drawdown': (('max_drawdown', True), ('rating', True), ('returns_3y', True)),
+    'volatility': (('volatility', False), ('rating', True), ('returns_3y', True)),
+    'downside_capture': (('downside_capture', False), ('rating', True), ('returns_3y', True)),
+}
+DEFAULT_RANKING = 'rating'
+DEFAULT_RISK_RANKING = 'sharpe'
+
+
+def rank_rows(universe: FundUniverse, rows: np.ndarray, rank_by: str,
+              metrics: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+    """Rows sorted by a ranking; ties keep file order and NaN metrics sort last"""
+    keys = []
+    for field, descending in reversed({**RANKINGS, **RISK_RANKINGS}[rank_by]):
+        values = metrics[field][rows] if metrics and field in metrics else universe.column(field)[rows]
+        keys.append(-values if descending else values)
+    return rows[np.lexsort(keys)]
+
+
+class CategoryIndex:
+    """Ranked views of one category's rows"""
+
+    def __init__(self, universe: FundUniverse, rows: np.ndarray,
+                 metrics: Optional[Dict[str, np.ndarray]] = None):
+        min_investment = universe.column('min_investment')
+        zero_exit_load = universe.column('exit_load') == 0
+        self.thresholds = sorted(np.unique(min_investment[rows]).tolist())
+        self._ranked: Dict[Tuple[str, int, bool], np.ndarray] = {}
+        self.rankings = tuple(RANKINGS) + (tuple(RISK_RANKINGS) if metrics else ())
+        for name in self.rankings:
+            ranked = rank_rows(universe, rows, name, metrics)
+            for i, threshold in enumerate(self.thresholds):
+                eligible = ranked[min_investment[ranked] <= threshold]
+                self._ranked[(name, i, False)] = eligible
+                self._ranked[(name, i, True)] = eligible[zero_exit_load[eligible]]
+
+    def top(self, k: int, rank_by: str, max_min_investment: Optional[float], zero_exit_load: bool) -> np.ndarray:
+        if rank_by not in self.rankings:
+            raise ValueError(f"Unknown ranking: {rank_by}")
+        if max_min_investment is None:
+            level = len(self.thresholds) - 1
+        else:
+            level = bisect.bisect_right(self.thresholds, max_min_investment) - 1
+            if level < 0:
+                return np.empty(0, dtype=np.intp)
+        return self._ranked[(rank_by, level, zero_exit_load)][:k]
+
+
+class FundIndex:
+    """Per-category ranked fund rows, built once per fund universe (and risk metrics table)"""
+
+    def __init__(self, universe: FundUniverse, metrics=None):
+        self.universe = universe
+        self.metrics = metrics
+        columns = metrics.columns_for(universe) if metrics is not None else None
+        self.version = universe.version if metrics is None else f"{universe.version}+{metrics.version}"
+        self.rankings = tuple(RANKINGS) + (tuple(RISK_RANKINGS) if metrics is not None else ())
+        self.default_ranking = DEFAULT_RISK_RANKING if metrics is not None else DEFAULT_RANKING
+        self.categories = {
+            category: CategoryIndex(universe, universe.rows(category), columns)
+            for category in universe.categories
+        }
+
+    def __contains__(self, category: str) -> bool:
+        return category in self.categories
+
+    def top_rows(
+        self,
+        category: str,
+        k: int = 1,
+        rank_by: Optional[str] = None,
+        max_min_investment: Optional[float] = None,
+        zero_exit_load: bool = False,
+    ) -> np.ndarray:
+        """Row numbers of the best ``k`` funds in a category under a ranking and optional filters"""
+        index = self.categories.get(category)
+        if index is None:
+            return np.empty(0, dtype=np.intp)
+        return index.top(k, rank_by or self.default_ranking, max_min_investment, zero_exit_load)
+
+    def top(self, category: str, k: int = 1, **filters) -> List[FundView]:
+        return self.universe.views(self.top_rows(category, k, **filters))
+
+    def best(self, category: str, **filters) -> Optional[FundView]:
+        funds = self.top(category, 1, **filters)
+        return funds[0] if funds else None
@@ -0,0 +1,281 @@
+"""Risk metrics for every scheme in the NAV history.
+
+For each scheme, as of the last trading day in the store:
+
+- ``volatility``: annualized standard deviation of daily returns;
+- ``sharpe`` and ``sortino``: annualized mean daily excess return over
+  ``RISK_FREE_RATE``, per unit of volatility and of downside deviation;
+- ``downside_capture``: the scheme's average return on days its peer group
+  (the equal-weighted schemes of the same allocation category) fell, as a
+  percentage of the peer group's average return on those days;
+- ``max_drawdown``: the deepest fall from a previous peak since launch, as a
+  negative fraction;
+- ``cagr_1y``, ``cagr_3y``, ``cagr_5y``: annualized trailing returns.
+
+Volatility, Sharpe, Sortino and downside capture use the last
+``WINDOW_DAYS`` daily returns. A day without a NAV carries the previous NAV
+forward; returns before a scheme's first NAV don't count, and a scheme with
+fewer than ``MIN_OBSERVATIONS`` returns in the window gets NaN.
+
+The whole history is processed in one pass over blocks of rows. Besides the
+metrics, the table keeps what is needed to roll forward: each scheme's last
+NAV, its running peak and drawdown, and its NAV (carried forward) at the
+start of each trailing window. When new trading days are appended only
+those days are read for the running values, and the window statistics are
+recomputed from the last ``WINDOW_DAYS`` columns, which gives exactly what a
+full pass would. Corrections to past NAVs need a full pass (``compute``).
+
+Tables are saved as ``metrics.npz`` next to the NAV store so a worker
+restart loads them instead of recomputing.
+"""
+
+import os
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from market_assumptions import CATEGORIES
+from nav_history import NavHistory
+
+TRADING_DAYS = 252
+WINDOW_DAYS = 3 * TRADING_DAYS
+MIN_OBSERVATIONS = TRADING_DAYS // 2
+CAGR_YEARS = (1, 3, 5)
+RISK_FREE_RATE = 0.065
+# Rows per block in a full pass
+BLOCK_ROWS = 1024
+METRICS_FILE = 'metrics.npz'
+
+METRIC_FIELDS = (
+    'volatility', 'sharpe', 'sortino', 'downside_capture', 'max_drawdown',
+) + tuple(f'cagr_{years}y' for years in CAGR_YEARS)
+
+# Trading days back from the last day to the start of each trailing window
+_ANCHOR_OFFSETS = tuple(years * TRADING_DAYS for years in CAGR_YEARS)
+_WINDOW_ANCHOR = _ANCHOR_OFFSETS.index(WINDOW_DAYS)
+_DAILY_RISK_FREE = (1 + RISK_FREE_RATE) ** (1 / TRADING_DAYS) - 1
+_STATE_FIELDS = ('last_nav', 'peak', 'max_drawdown', 'anchors')
+
+
+def scheme_groups(history: NavHistory, universe) -> np.ndarray:
+    """Peer group of each scheme in the history: its index in CATEGORIES, or -1 if not in the universe"""
+    codes = {category: code for code, category in enumerate(CATEGORIES)}
+    groups = np.full(len(history), -1, dtype=np.int16)
+    for row, scheme_code in enumerate(history.schemes):
+        universe_row = universe.row_for(scheme_code)
+        if universe_row is not None:
+            groups[row] = codes.get(universe.value('allocation_category', universe_row), -1)
+    return groups
+
+
+def _fill_forward(navs: np.ndarray, seed: Optional[np.ndarray] = None) -> np.ndarray:
+    """Carry each row's last NAV over missing days, starting from ``seed`` (the NAV before the block)"""
+    if seed is not None:
+        navs = np.concatenate([seed[:, None], navs], axis=1)
+    valid = ~np.isnan(navs)
+    source = np.where(valid, np.arange(navs.shape[1]), 0)
+    np.maximum.accumulate(source, axis=1, out=source)
+    filled = np.take_along_axis(navs, source, axis=1)
+    return filled[:, 1:] if seed is not None else filled
+
+
+class FundMetrics:
+    """Per-scheme metric columns, in NAV history row order, plus roll-forward state"""
+
+    def __init__(self, schemes: Sequence[str], groups: np.ndarray, days: int, last_day,
+                 generation: int, columns: Dict[str, np.ndarray], state: Dict[str, np.ndarray]):
+        self.schemes = tuple(schemes)
+        self.groups = groups
+        self.days = days
+        self.last_day = last_day
+        self.generation = generation
+        self.columns = columns
+        self.state = state
+        self._row_by_code = {code: row for row, code in enumerate(self.schemes)}
+
+    @property
+    def version(self) -> str:
+        return f"{self.generation}.{self.days}"
+
+    def for_scheme(self, scheme_code: str) -> Optional[dict]:
+        row = self._row_by_code.get(scheme_code)
+        if row is None:
+            return None
+        return {
+            field: None if np.isnan(self.columns[field][row]) else round(float(self.columns[field][row]), 4)
+            for field in METRIC_FIELDS
+        }
+
+    def columns_for(self, universe) -> Dict[str, np.ndarray]:
+        """Metric columns aligned to a fund universe's rows, NaN for schemes without history"""
+        rows = np.full(universe.size, -1, dtype=np.intp)
+        for row, scheme_code in enumerate(self.schemes):
+            universe_row = universe.row_for(scheme_code)
+            if universe_row is not None:
+                rows[universe_row] = row
+        known = rows >= 0
+        aligned = {}
+        for field in METRIC_FIELDS:
+            column = np.full(universe.size, np.nan)
+            column[known] = self.columns[field][rows[known]]
+            aligned[field] = column
+        return aligned
+
+    def save(self, path: str) -> None:
+        target = os.path.join(path, METRICS_FILE)
+        temporary = os.path.join(path, 'metrics.tmp.npz')
+        np.savez(
+            temporary,
+            schemes=np.array(self.schemes), groups=self.groups, days=self.days,
+            last_day=np.datetime64(self.last_day, 'D'), generation=self.generation,
+            **{f'metric_{k}': v for k, v in self.columns.items()},
+            **{f'state_{k}': v for k, v in self.state.items()},
+        )
+        os.replace(temporary, target)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["FundMetrics"]:
+        try:
+            stored = np.load(os.path.join(path, METRICS_FILE))
+        except FileNotFoundError:
+            return None
+        with stored:
+            return cls(
+                stored['schemes'].tolist(), stored['groups'], int(stored['days']), stored['last_day'],
+                int(stored['generation']),
+                {field: stored[f'metric_{field}'] for field in METRIC_FIELDS},
+                {field: stored[f'state_{field}'] for field in _STATE_FIELDS},
+            )
+
+
+def _window_metrics(history: NavHistory, groups: np.ndarray, state: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Metrics from the trailing windows ending on the last trading day"""
+    end = history.days
+    start = max(0, end - WINDOW_DAYS)
+    seed = state['anchors'][:, _WINDOW_ANCHOR] if start > 0 else np.full(len(history), np.nan)
+    window = _fill_forward(np.asarray(history.navs[:, start:end], dtype=np.float64), seed)
+    previous = np.concatenate([seed[:, None], window[:, :-1]], axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = window / previous - 1
+        valid = ~np.isnan(returns)
+        count = valid.sum(axis=1)
+        r = np.where(valid, returns, 0.0)
+        mean = r.sum(axis=1) / count
+        variance = (np.where(valid, r - mean[:, None], 0.0) ** 2).sum(axis=1) / (count - 1)
+        volatility = np.sqrt(variance)
+        downside = np.sqrt((np.minimum(r - _DAILY_RISK_FREE, 0.0) ** 2 * valid).sum(axis=1) / count)
+        annualize = np.sqrt(TRADING_DAYS)
+        sharpe = (mean - _DAILY_RISK_FREE) / volatility * annualize
+        sortino = (mean - _DAILY_RISK_FREE) / downside * annualize
+
+        # Peer-group (category) average return for each day
+        downside_capture = np.full(len(history), np.nan)
+        for group in np.unique(groups[groups >= 0]):
+            members = groups == group
+            peers = valid[members].sum(axis=0)
+            benchmark = np.where(peers > 0, r[members].sum(axis=0) / peers, 0.0)
+            down = benchmark < 0
+            fund_down = valid[members] & down
+            fund_mean = (r[members] * fund_down).sum(axis=1) / fund_down.sum(axis=1)
+            benchmark_mean = (benchmark[None, :] * fund_down).sum(axis=1) / fund_down.sum(axis=1)
+            downside_capture[members] = fund_mean / benchmark_mean * 100
+
+        metrics = {
+            'volatility': volatility * annualize,
+            'sharpe': sharpe,
+            'sortino': sortino,
+            'downside_capture': downside_capture,
+            'max_drawdown': state['max_drawdown'].copy(),
+        }
+        for i, years in enumerate(CAGR_YEARS):
+            metrics[f'cagr_{years}y'] = (state['last_nav'] / state['anchors'][:, i]) ** (1 / years) - 1
+
+    too_short = count < MIN_OBSERVATIONS
+    for field in ('volatility', 'sharpe', 'sortino', 'downside_capture'):
+        metrics[field][too_short] = np.nan
+    for field, values in metrics.items():
+        values[~np.isfinite(values)] = np.nan
+    return metrics
+
+
+def _finish(history: NavHistory, groups: np.ndarray, state: Dict[str, np.ndarray]) -> FundMetrics:
+    return FundMetrics(history.schemes, groups, history.days, history.calendar[-1], history.generation,
+                       _window_metrics(history, groups, state), state)
+
+
+def compute(history: NavHistory, groups: np.ndarray) -> FundMetrics:
+    """Full pass over the NAV history"""
+    schemes, end = len(history), history.days
+    if not end:
+        raise ValueError("NAV history has no trading days")
+    state = {
+        'last_nav': np.full(schemes, np.nan),
+        'peak': np.full(schemes, np.nan),
+        'max_drawdown': np.full(schemes, np.nan),
+        'anchors': np.full((schemes, len(_ANCHOR_OFFSETS)), np.nan),
+    }
+    positions = [end - 1 - offset for offset in _ANCHOR_OFFSETS]
+    for first in range(0, schemes, BLOCK_ROWS):
+        rows = slice(first, min(first + BLOCK_ROWS, schemes))
+        navs = _fill_forward(np.asarray(history.navs[rows], dtype=np.float64))
+        peak = np.fmax.accumulate(navs, axis=1)
+        state['max_drawdown'][rows] = np.fmin.reduce(navs / peak - 1, axis=1)
+        state['peak'][rows] = peak[:, -1]
+        state['last_nav'][rows] = navs[:, -1]
+        for i, position in enumerate(positions):
+            if position >= 0:
+                state['anchors'][rows, i] = navs[:, position]
+    return _finish(history, groups, state)
+
+
+def roll_forward(previous: FundMetrics, history: NavHistory) -> FundMetrics:
+    """Metrics after trading days were appended to the history ``previous`` was computed from"""
+    old_end, end = previous.days, history.days
+    state = {field: values.copy() for field, values in previous.state.items()}
+    last_nav, peak, drawdown = state['last_nav'], state['peak'], state['max_drawdown']
+    for day in range(old_end, end):
+        navs = np.asarray(history.navs[:, day], dtype=np.float64)
+        last_nav[:] = np.where(np.isnan(navs), last_nav, navs)
+        np.fmax(peak, last_nav, out=peak)
+        np.fmin(drawdown, last_nav / peak - 1, out=drawdown)
+
+    # Move each window start forward over the days it passed
+    for i, offset in enumerate(_ANCHOR_OFFSETS):
+        old_position, position = old_end - 1 - offset, end - 1 - offset
+        if position < 0:
+            continue
+        first = max(old_position + 1, 0)
+        seed = state['anchors'][:, i]
+        passed = _fill_forward(np.asarray(history.navs[:, first:position + 1], dtype=np.float64), seed)
+        state['anchors'][:, i] = passed[:, -1]
+    return _finish(history, previous.groups, state)
+
+
+def _extends(previous: FundMetrics, history: NavHistory, groups: np.ndarray) -> bool:
+    """Whether ``history`` only appended trading days to the one ``previous`` was computed from"""
+    return (
+        previous.schemes == history.schemes
+        and np.array_equal(previous.groups, groups)
+        and 0 < previous.days <= history.days
+        and history.calendar[previous.days - 1] == previous.last_day
+    )
+
+
+def refresh(history: NavHistory, groups: np.ndarray, previous: Optional[FundMetrics] = None) -> FundMetrics:
+    """Metrics for ``history``, rolled forward from ``previous`` when it allows"""
+    if previous is not None and _extends(previous, history, groups):
+        if previous.days < history.days:
+            return roll_forward(previous, history)
+        if previous.generation == history.generation:
+            return previous
+    return compute(history, groups)
+
+
+def load_or_refresh(history: NavHistory, universe) -> FundMetrics:
+    """Saved metrics for the history's store, brought up to date and saved again if they changed"""
+    groups = scheme_groups(history, universe)
+    previous = FundMetrics.load(history.path) if history.path else None
+    metrics = refresh(history, groups, previous)
+    if history.path and metrics is not previous:
+        metrics.save(history.path)
+    return metrics
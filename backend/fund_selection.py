@@ -0,0 +1,155 @@
+"""Choosing the funds for each category of an allocation.
+
+A category gets one fund per ``SIP_PER_FUND`` of its monthly SIP, at least
+one and at most ``MAX_FUNDS_PER_CATEGORY``, and fewer when not enough of its
+candidates accept the resulting per-fund SIP (``min_investment``). The
+category's percentage is split evenly across its funds. Without a SIP
+amount every category gets its single best fund.
+
+Candidates are a category's ``CANDIDATES_PER_CATEGORY`` best funds in the
+fund index's ranking. A selection costs, for each fund, its share of the
+portfolio times a penalty for its place in the ranking and for its expense
+ratio, plus, for every pair of funds, their holdings overlap (see
+``fund_holdings``) times the smaller of their shares. Fund sets in which two
+funds overlap by more than ``REDUNDANT_OVERLAP`` are pruned: the second fund
+buys nothing the first doesn't already hold. Without holdings data overlap
+plays no part.
+
+The search is a beam over the categories, largest allocation first. Each
+state is extended by every fund set of the next category, with the
+overlap cost of all extensions coming from one matrix product, and the
+``BEAM_WIDTH`` cheapest states survive. Once the time budget is spent the
+beam narrows to one state, so the remaining categories are filled in
+greedily. Candidate lists are bounded, so the work per request does not
+grow with the size of the universe.
+
+With a time budget the result can depend on load: a slow request may have
+filled some categories greedily. ``budget=None`` always searches the full
+beam, so the same inputs give the same selection; callers that memoize
+selections use that.
+"""
+
+import time
+from itertools import combinations
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from fund_holdings import FundHoldings
+from fund_index import FundIndex
+
+MAX_FUNDS_PER_CATEGORY = 3
+# Monthly SIP (rupees) a category needs for each fund it is spread across
+SIP_PER_FUND = 5000
+CANDIDATES_PER_CATEGORY = 8
+BEAM_WIDTH = 16
+# Cost per unit of portfolio share of each place below the category's best fund,
+# and of each percentage point of expense ratio
+RANK_PENALTY = 0.05
+EXPENSE_PENALTY = 0.05
+REDUNDANT_OVERLAP = 0.6
+TIME_BUDGET_SECONDS = 0.02
+
+
+def split_percentage(percentage: int, funds: int) -> List[int]:
+    """Whole percentages of ``funds`` funds sharing a category; earlier funds take the remainder"""
+    base, extra = divmod(int(percentage), funds)
+    return [base + (i < extra) for i in range(funds)]
+
+
+def fund_count(percentage: int, monthly_investment: Optional[float]) -> int:
+    """Funds a category is spread across for its share of the monthly SIP"""
+    if monthly_investment is None:
+        return 1
+    count = int(monthly_investment * percentage / 100 // SIP_PER_FUND)
+    return max(1, min(count, MAX_FUNDS_PER_CATEGORY, int(percentage)))
+
+
+def pairwise_overlap(holdings: Optional[FundHoldings], codes: List[str]) -> np.ndarray:
+    """Holdings overlap of every pair of schemes; pairs without data count as the average of those with it"""
+    overlap = np.full((len(codes), len(codes)), np.nan)
+    if holdings is None:
+        return np.zeros_like(overlap)
+    known = np.array([code in holdings for code in codes], dtype=bool)
+    if known.any():
+        rows = np.array([holdings.row_for(code) for code, k in zip(codes, known) if k])
+        overlap[np.ix_(known, known)] = holdings.overlap(rows)[0]
+    measured = overlap[~np.eye(len(codes), dtype=bool) & ~np.isnan(overlap)]
+    return np.where(np.isnan(overlap), measured.mean() if measured.size else 0.0, overlap)
+
+
+def select_funds(index: FundIndex, allocation: dict, monthly_investment: Optional[float] = None,
+                 holdings: Optional[FundHoldings] = None,
+                 budget: Optional[float] = TIME_BUDGET_SECONDS) -> List[Tuple[str, np.ndarray]]:
+    """Chosen fund rows of each category of ``allocation``, best-ranked first, in allocation order
+
+    ``budget`` is in seconds; None means no deadline.
+    """
+    deadline = None if budget is None else time.perf_counter() + budget
+    universe = index.universe
+    min_investment = universe.column('min_investment')
+    expense_ratio = universe.column('expense_ratio')
+
+    # Candidate pool: each category's best funds that accept a SIP of its whole share
+    categories, pools = [], []
+    for category, percentage in allocation.items():
+        rows = index.top_rows(category, CANDIDATES_PER_CATEGORY) if percentage > 0 else []
+        if not len(rows):
+            continue
+        if monthly_investment is not None:
+            affordable = rows[min_investment[rows] <= monthly_investment * percentage / 100]
+            # Nothing affordable: fall back to the best fund, as a SIP of its minimum
+            rows = affordable if len(affordable) else rows[:1]
+        categories.append(category)
+        pools.append(rows)
+    if not categories:
+        return []
+    flat = np.concatenate(pools)
+    starts = np.cumsum([0] + [len(rows) for rows in pools])
+    overlap = pairwise_overlap(holdings, [universe.value('scheme_code', row) for row in flat])
+
+    # Fund sets of each category, as indicator rows over ``flat``, and their own cost
+    share = np.zeros(len(flat))
+    options = []
+    for c, category in enumerate(categories):
+        percentage = allocation[category]
+        positions = np.arange(starts[c], starts[c + 1])
+        for count in range(min(fund_count(percentage, monthly_investment), len(positions)), 0, -1):
+            members = positions
+            if monthly_investment is not None and count > 1:
+                per_fund = monthly_investment * percentage / 100 / count
+                members = positions[min_investment[flat[positions]] <= per_fund]
+            sets = [s for s in combinations(members, count)
+                    if all(overlap[a, b] <= REDUNDANT_OVERLAP for a, b in combinations(s, 2))]
+            if sets:
+                break
+        sets = np.array(sets)
+        share[positions] = percentage / 100 / count
+        rank = positions - starts[c]
+        fund_cost = share[positions] * (RANK_PENALTY * rank + EXPENSE_PENALTY * expense_ratio[flat[positions]] / 100)
+        indicator = np.zeros((len(sets), len(flat)))
+        indicator[np.repeat(np.arange(len(sets)), count), sets.ravel()] = 1
+        own = indicator[:, positions] @ fund_cost
+        for a, b in combinations(range(count), 2):
+            own += overlap[sets[:, a], sets[:, b]] * share[sets[:, a]]
+        options.append((indicator, own))
+
+    # Overlap cost of a fund given what is already chosen, per unit of the chosen fund's share
+    weighted = overlap * np.minimum(share[:, None], share[None, :])
+    np.fill_diagonal(weighted, 0.0)
+
+    order = sorted(range(len(categories)), key=lambda c: -allocation[categories[c]])
+    chosen = np.zeros((1, len(flat)))
+    cost = np.zeros(1)
+    width = BEAM_WIDTH
+    for c in order:
+        indicator, own = options[c]
+        total = cost[:, None] + own[None, :] + (chosen @ weighted) @ indicator.T
+        best = np.argsort(total, axis=None, kind='stable')[:width]
+        state, pick = np.unravel_index(best, total.shape)
+        chosen = chosen[state] + indicator[pick]
+        cost = total[state, pick]
+        if deadline is not None and time.perf_counter() > deadline:
+            width = 1
+    selection = chosen[0].astype(bool)
+    return [(category, pools[c][selection[starts[c]:starts[c + 1]]]) for c, category in enumerate(categories)]
@@ -0,0 +1,370 @@
+"""Fund universe loaded from an external scheme file.
+
+The scheme universe (the shipped ``data/mutual_funds.csv`` or a full
+AMFI-sized export pointed to by ``FUND_UNIVERSE_PATH``) is held column-wise
+in typed arrays instead of one dict per fund:
+
+- decimal fields (ratings, returns, expense ratio, exit load, AUM) are stored
+  as fixed-point integers in hundredths, so 15.8 is kept as 1580 and read
+  back exactly; a field the source file gives as whole numbers (AUM in the
+  shipped file) is read back as ``int``, the others as ``float``;
+- low-cardinality strings (category, allocation category, fund manager) are
+  small integer codes into an interned string table;
+- names and scheme codes are packed into one UTF-8 buffer with offsets.
+
+Rows are grouped by ``allocation_category`` (the keys used in
+``portfolio_allocation``). Responses get ``FundView`` objects, read-only
+mappings over a row that decode fields on access, so building a
+recommendation never copies fund records.
+
+``FundUniverseStore`` owns the current universe. A reload builds the new
+universe completely and then replaces the reference in one assignment, so
+readers see either the old or the new universe, never a mix.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'mutual_funds.csv')
+
+PACKED_FIELDS = ('scheme_code', 'name')
+CATEGORICAL_FIELDS = ('allocation_category', 'category', 'fund_manager')
+STRING_FIELDS = PACKED_FIELDS + CATEGORICAL_FIELDS
+# Decimal fields stored as integer hundredths, with their storage dtype
+FIXED_POINT_FIELDS = {
+    'rating': np.int16,
+    'returns_3y': np.int32,
+    'returns_5y': np.int32,
+    'returns_10y': np.int32,
+    'aum': np.int64,
+    'expense_ratio': np.int16,
+    'exit_load': np.int16,
+}
+INT_FIELDS = {
+    'stocks_count': np.int32,
+    'min_investment': np.int32,
+}
+FIXED_POINT_SCALE = 100
+FIELDS = STRING_FIELDS + tuple(FIXED_POINT_FIELDS) + tuple(INT_FIELDS)
+
+# Fields returned for a fund, in the order the API has always used
+RECORD_FIELDS = (
+    'scheme_code', 'name', 'category', 'rating', 'returns_3y', 'returns_5y', 'returns_10y',
+    'aum', 'stocks_count', 'expense_ratio', 'exit_load', 'min_investment', 'fund_manager',
+)
+
+
+def _to_int_array(values, dtype, scale: int = 1) -> np.ndarray:
+    floats = np.asarray(values, dtype=np.float64) * scale
+    info = np.iinfo(dtype)
+    if len(floats) and (floats.min() < info.min or floats.max() > info.max):
+        raise ValueError(f"Values out of range for {np.dtype(dtype).name} storage")
+    return np.rint(floats).astype(dtype)
+
+
+def _is_integral(values) -> bool:
+    """Whether a source column holds integers (``25420``) rather than decimals (``1.0``)"""
+    kind = np.asarray(values).dtype.kind
+    if kind in 'iu':
+        return True
+    if kind != 'U':
+        return False
+    return all(value.strip().lstrip('+-').isdigit() for value in values)
+
+
+class PackedStrings(Sequence):
+    """Strings packed into one UTF-8 buffer plus an offsets array"""
+
+    def __init__(self, values: Iterable[str]):
+        encoded = [str(v).encode('utf-8') for v in values]
+        self.offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+        np.cumsum([len(e) for e in encoded], out=self.offsets[1:])
+        self.buffer = b''.join(encoded)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]].decode('utf-8')
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buffer) + self.offsets.nbytes
+
+
+class CategoricalStrings(Sequence):
+    """Strings stored as integer codes into a table of distinct, interned values"""
+
+    def __init__(self, values: Iterable[str]):
+        table, codes = np.unique(np.asarray([str(v) for v in values], dtype=object).astype(str),
+                                 return_inverse=True)
+        self.table = tuple(sys.intern(str(v)) for v in table)
+        dtype = np.uint8 if len(self.table) <= 0xFF else np.uint16 if len(self.table) <= 0xFFFF else np.uint32
+        self.codes = codes.ravel().astype(dtype)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, i: int) -> str:
+        return self.table[self.codes[i]]
+
+    def code(self, value: str) -> Optional[int]:
+        try:
+            return self.table.index(value)
+        except ValueError:
+            return None
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + sum(sys.getsizeof(v) for v in self.table)
+
+
+class FundView(Mapping):
+    """Read-only mapping over one fund row, plus optional per-response fields"""
+
+    __slots__ = ('_universe', '_row', '_extra')
+
+    def __init__(self, universe: "FundUniverse", row: int, extra: Optional[dict] = None):
+        self._universe = universe
+        self._row = row
+        self._extra = extra or {}
+
+    @property
+    def row(self) -> int:
+        return self._row
+
+    @property
+    def universe(self) -> "FundUniverse":
+        return self._universe
+
+    def __getitem__(self, key: str):
+        if key in self._extra:
+            return self._extra[key]
+        if key not in RECORD_FIELDS:
+            raise KeyError(key)
+        return self._universe.value(key, self._row)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from RECORD_FIELDS
+        yield from (key for key in self._extra if key not in RECORD_FIELDS)
+
+    def __len__(self) -> int:
+        return len(RECORD_FIELDS) + sum(1 for key in self._extra if key not in RECORD_FIELDS)
+
+    def with_fields(self, **fields) -> "FundView":
+        """A view of the same row with extra fields layered on top"""
+        return FundView(self._universe, self._row, {**self._extra, **fields})
+
+    def __repr__(self) -> str:
+        return f"FundView({dict(self)!r})"
+
+
+class FundUniverse:
+    """Column-oriented, read-only fund universe"""
+
+    def __init__(self, columns: Dict[str, Sequence], source: Optional[str] = None):
+        missing = [field for field in FIELDS if field not in columns]
+        if missing:
+            raise ValueError(f"Fund universe is missing columns: {', '.join(missing)}")
+        self.columns = {}
+        for field in PACKED_FIELDS:
+            self.columns[field] = PackedStrings(columns[field])
+        for field in CATEGORICAL_FIELDS:
+            self.columns[field] = CategoricalStrings(columns[field])
+        for field, dtype in FIXED_POINT_FIELDS.items():
+            self.columns[field] = _to_int_array(columns[field], dtype, FIXED_POINT_SCALE)
+        # Fixed-point fields decoded back to int because the source gave whole numbers
+        self.integral_fields = frozenset(field for field in FIXED_POINT_FIELDS if _is_integral(columns[field]))
+        for field, dtype in INT_FIELDS.items():
+            self.columns[field] = _to_int_array(columns[field], dtype)
+        for field in FIXED_POINT_FIELDS.keys() | INT_FIELDS.keys():
+            self.columns[field].flags.writeable = False
+        self.source = source
+        self.loaded_at = time.time()
+        self.size = len(self.columns['name'])
+
+        buckets = self.columns['allocation_category']
+        self._rows_by_category = {
+            category: np.flatnonzero(buckets.codes == code)
+            for code, category in enumerate(buckets.table)
+        }
+        self.version = self._content_hash()
+        self._row_by_code = None
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def categories(self) -> List[str]:
+        return list(self._rows_by_category)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the column storage"""
+        return sum(column.nbytes for column in self.columns.values())
+
+    def rows(self, category: str) -> np.ndarray:
+        """Row numbers of a category's funds, in file order"""
+        return self._rows_by_category.get(category, np.empty(0, dtype=np.intp))
+
+    def row_for(self, scheme_code: str) -> Optional[int]:
+        """Row number of a scheme code, or None if it isn't in the universe"""
+        if self._row_by_code is None:
+            codes = self.columns['scheme_code']
+            self._row_by_code = {codes[row]: row for row in range(self.size)}
+        return self._row_by_code.get(scheme_code)
+
+    def column(self, field: str):
+        """Stored column: integer array (fixed-point fields in hundredths) or string sequence"""
+        return self.columns[field]
+
+    def values(self, field: str) -> np.ndarray:
+        """Numeric column decoded to real values"""
+        if field in FIXED_POINT_FIELDS:
+            return self.columns[field] / FIXED_POINT_SCALE
+        return self.columns[field]
+
+    def value(self, field: str, row: int):
+        """One decoded field of one fund"""
+        stored = self.columns[field][row]
+        if field in self.integral_fields:
+            return int(stored) // FIXED_POINT_SCALE
+        if field in FIXED_POINT_FIELDS:
+            return int(stored) / FIXED_POINT_SCALE
+        if field in INT_FIELDS:
+            return int(stored)
+        return stored
+
+    def view(self, row: int) -> FundView:
+        return FundView(self, int(row))
+
+    def views(self, rows: Iterable[int]) -> List[FundView]:
+        return [FundView(self, int(row)) for row in rows]
+
+    def record(self, row: int) -> dict:
+        """One fund as a plain dict"""
+        return {field: self.value(field, row) for field in RECORD_FIELDS}
+
+    def records(self, rows: Iterable[int]) -> List[dict]:
+        return [self.record(row) for row in rows]
+
+    def _content_hash(self) -> str:
+        digest = hashlib.sha256()
+        for field in FIELDS:
+            column = self.columns[field]
+            if isinstance(column, PackedStrings):
+                digest.update(column.buffer)
+                digest.update(column.offsets.tobytes())
+            elif isinstance(column, CategoricalStrings):
+                digest.update("\x1f".join(column.table).encode())
+                digest.update(column.codes.tobytes())
+            else:
+                digest.update(column.tobytes())
+        return digest.hexdigest()[:16]
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict], source: Optional[str] = None) -> "FundUniverse":
+        records = list(records)
+        return cls({field: [r[field] for r in records] for field in FIELDS}, source=source)
+
+    @classmethod
+    def from_categories(cls, universe: Dict[str, List[dict]]) -> "FundUniverse":
+        """Build from the legacy {allocation_category: [fund dict]} layout"""
+        records = []
+        for category, funds in universe.items():
+            for fund in funds:
+                record = dict(fund, allocation_category=category)
+                record.setdefault('scheme_code', fund['name'])
+                records.append(record)
+        return cls.from_records(records)
+
+    @classmethod
+    def load(cls, path: str) -> "FundUniverse":
+        """Load a CSV, JSON-lines or Parquet scheme file"""
+        suffix = os.path.splitext(path)[1].lower()
+        if suffix == '.csv':
+            columns = _read_csv(path)
+        elif suffix in ('.jsonl', '.ndjson'):
+            columns = _read_jsonl(path)
+        elif suffix == '.parquet':
+            columns = _read_parquet(path)
+        else:
+            raise ValueError(f"Unsupported fund universe format: {suffix}")
+        return cls(columns, source=path)
+
+
+def _empty_columns() -> Dict[str, list]:
+    return {field: [] for field in FIELDS}
+
+
+def _read_csv(path: str) -> Dict[str, list]:
+    columns = _empty_columns()
+    with open(path, newline='', encoding='utf-8') as fh:
+        for row in csv.DictReader(fh):
+            for field in FIELDS:
+                columns[field].append(row[field])
+    return columns
+
+
+def _read_jsonl(path: str) -> Dict[str, list]:
+    columns = _empty_columns()
+    with open(path, encoding='utf-8') as fh:
+        for line in fh:
+            if line.strip():
+                row = json.loads(line)
+                for field in FIELDS:
+                    columns[field].append(row[field])
+    return columns
+
+
+def _read_parquet(path: str) -> Dict[str, list]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ValueError("pyarrow is required to load Parquet fund universes") from e
+    table = pq.read_table(path, columns=list(FIELDS))
+    return {field: table.column(field).to_numpy(zero_copy_only=False) for field in FIELDS}
+
+
+class FundUniverseStore:
+    """Holds the current fund universe and swaps it when the source file changes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self.universe = None
+        self.reloads = 0
+
+    @classmethod
+    def from_env(cls) -> "FundUniverseStore":
+        return cls(os.getenv('FUND_UNIVERSE_PATH', DEFAULT_PATH))
+
+    def _file_signature(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self) -> FundUniverse:
+        """Load the file unconditionally and make it current"""
+        with self._lock:
+            signature = self._file_signature()
+            universe = FundUniverse.load(self.path)
+            self.universe = universe
+            self._signature = signature
+            self.reloads += 1
+            return universe
+
+    def reload_if_changed(self) -> Optional[FundUniverse]:
+        """Load the file if it changed since the last load; returns the new universe or None"""
+        if self._file_signature() == self._signature:
+            return None
+        return self.load()
@@ -0,0 +1,225 @@
+"""Goal-based SIP planning.
+
+Given target corpora and horizons, works out the monthly SIP each goal needs.
+Contributions follow ``_calculate_sip_value``: made at the end of each month
+and compounding at ``r = annual_return / 12 / 100`` per month. With an annual
+step-up ``g`` the SIP grows by ``g`` after every 12 instalments, so for a
+horizon of ``n = 12Y + m`` months the value of ₹1 a month is
+
+    A_k = ((1 + r)^k - 1) / r                       k-month annuity factor
+    F   = A_12 * (1 + r)^(n - 12) * sum_{y<Y} q^y  +  (1 + g)^Y * A_m
+    q   = (1 + g) / (1 + r)^12
+
+and the sum is geometric. The corpus is linear in the SIP, so the required
+SIP is a closed form, ``(target - savings * (1 + r)^n) / F``, evaluated for
+every goal at once with NumPy. Like every projection, it works at the return
+rounded to 0.1% and takes its powers of ``1 + r`` from ``projection_tables``.
+
+Solving the other way, for the return a given SIP needs, has no closed form;
+``required_return`` bisects all goals together on the annual return, which
+the corpus increases with monotonically. The search needs a continuous
+return, so it evaluates the formula exactly instead of using the tables.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from market_assumptions import CATEGORIES, EXPECTED_RETURNS, allocation_weights
+from projection_tables import annuity_factors, growth_factors, quantize_return
+
+MAX_YEARS = 50
+MAX_GOALS = 100000
+# Annual return bracket (percent) searched by required_return
+RETURN_SEARCH_RANGE = (-50.0, 100.0)
+BISECTION_STEPS = 60
+
+
+def portfolio_return(allocation: dict) -> float:
+    """Expected annual return of an allocation, in percent"""
+    weights = allocation_weights(allocation)
+    return float(weights @ np.array([EXPECTED_RETURNS[c] for c in CATEGORIES]))
+
+
+def _exact_growth(annual_return, months) -> np.ndarray:
+    return (1 + np.asarray(annual_return, dtype=float) / 12 / 100) ** np.asarray(months)
+
+
+def _annuity(growth: np.ndarray, rate: np.ndarray, months: np.ndarray) -> np.ndarray:
+    """End-of-month annuity factor; ``growth`` is ``(1 + rate) ** months``"""
+    safe_rate = np.where(rate == 0, 1.0, rate)
+    return np.where(rate == 0, months, (growth - 1) / safe_rate)
+
+
+def sip_growth_factor(annual_return, months, step_up=0.0, exact: bool = False) -> np.ndarray:
+    """Corpus from ₹1 a month after ``months``, stepped up ``step_up``% every year
+
+    Uses the projection tables at the return rounded to 0.1% unless ``exact``.
+    """
+    annual_return, months, step_up = np.broadcast_arrays(
+        np.asarray(annual_return, dtype=float), np.asarray(months, dtype=np.int64), np.asarray(step_up, dtype=float),
+    )
+    if exact:
+        growth = _exact_growth
+    else:
+        annual_return = quantize_return(annual_return)
+        growth = growth_factors
+    rate = annual_return / 12 / 100
+    step = step_up / 100
+    years, remainder = np.divmod(months, 12)
+    yearly = growth(annual_return, np.full_like(months, 12))
+    annuity_year = _annuity(yearly, rate, np.full_like(months, 12))
+    annuity_tail = _annuity(growth(annual_return, remainder), rate, remainder)
+
+    ratio = (1 + step) / yearly
+    same = np.isclose(ratio, 1.0)
+    safe_ratio = np.where(same, 0.0, ratio)
+    series = np.where(same, years, (1 - safe_ratio ** years) / (1 - safe_ratio))
+    full_years = annuity_year * growth(annual_return, np.maximum(months - 12, 0)) * series
+    stepped = np.where(years > 0, full_years, 0.0) + (1 + step) ** years * annuity_tail
+    if exact:
+        return stepped
+    # A flat SIP is a single table lookup
+    return np.where(step == 0, annuity_factors(annual_return, months), stepped)
+
+
+def corpus(monthly_sip, annual_return, months, step_up=0.0, current_savings=0.0, exact: bool = False) -> np.ndarray:
+    """Corpus after ``months`` from an SIP plus savings already invested"""
+    savings_growth = _exact_growth(annual_return, months) if exact else growth_factors(annual_return, months)
+    return (np.asarray(monthly_sip, dtype=float) * sip_growth_factor(annual_return, months, step_up, exact)
+            + np.asarray(current_savings, dtype=float) * savings_growth)
+
+
+def required_sip(targets, annual_return, months, step_up=0.0, current_savings=0.0) -> np.ndarray:
+    """Starting monthly SIP that reaches each target; 0 where savings already suffice"""
+    shortfall = np.asarray(targets, dtype=float) - np.asarray(current_savings, dtype=float) * growth_factors(
+        annual_return, months)
+    return np.maximum(shortfall, 0.0) / sip_growth_factor(annual_return, months, step_up)
+
+
+def required_return(targets, monthly_sip, months, step_up=0.0, current_savings=0.0) -> np.ndarray:
+    """Annual return (percent) each SIP needs to reach its target; NaN if out of range"""
+    targets, monthly_sip, months, step_up, current_savings = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (targets, monthly_sip, months, step_up, current_savings))
+    )
+    months = months.astype(np.int64)
+    low = np.full(targets.shape, RETURN_SEARCH_RANGE[0])
+    high = np.full(targets.shape, RETURN_SEARCH_RANGE[1])
+    reachable = (
+        (corpus(monthly_sip, high, months, step_up, current_savings, exact=True) >= targets)
+        & (corpus(monthly_sip, low, months, step_up, current_savings, exact=True) <= targets)
+    )
+    for _ in range(BISECTION_STEPS):
+        middle = (low + high) / 2
+        short = corpus(monthly_sip, middle, months, step_up, current_savings, exact=True) < targets
+        low = np.where(short, middle, low)
+        high = np.where(short, high, middle)
+    return np.where(reachable, (low + high) / 2, np.nan)
+
+
+@dataclass
+class Goal:
+    name: str
+    target_corpus: float              # in today's rupees when inflation is set
+    years: float
+    step_up: float = 0.0              # percent increase of the SIP every year
+    current_savings: float = 0.0      # already invested towards this goal
+    inflation: float = 0.0            # percent a year, applied to target_corpus
+    allocation: Optional[dict] = None  # overrides the plan's allocation
+
+
+@dataclass
+class GoalPlan:
+    goals: List[dict]
+    total_monthly_sip: float
+    monthly_budget: Optional[float]
+    fund_wise_sip: Dict[str, float] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            "goals": self.goals,
+            "total_monthly_sip": self.total_monthly_sip,
+            "monthly_budget": self.monthly_budget,
+            "fund_wise_sip": self.fund_wise_sip,
+        }
+
+
+def _validate(goal: Goal) -> None:
+    if goal.target_corpus <= 0:
+        raise ValueError(f"{goal.name}: target_corpus must be positive")
+    if not 1 / 12 <= goal.years <= MAX_YEARS:
+        raise ValueError(f"{goal.name}: years must be between one month and {MAX_YEARS}")
+    if not 0 <= goal.step_up <= 100:
+        raise ValueError(f"{goal.name}: step_up must be between 0 and 100")
+    if goal.current_savings < 0 or goal.inflation < 0:
+        raise ValueError(f"{goal.name}: current_savings and inflation must not be negative")
+
+
+def plan_goals(goals: Sequence[Goal], allocation: dict, monthly_budget: Optional[float] = None) -> GoalPlan:
+    """Monthly SIP for every goal, solved together
+
+    With ``monthly_budget`` the budget is also split across goals in
+    proportion to their required SIPs, and each goal reports the annual return
+    its share would need.
+    """
+    if not 1 <= len(goals) <= MAX_GOALS:
+        raise ValueError(f"Between 1 and {MAX_GOALS} goals can be planned at once")
+    if monthly_budget is not None and monthly_budget <= 0:
+        raise ValueError("monthly_budget must be positive")
+    for goal in goals:
+        _validate(goal)
+
+    returns_by_allocation: Dict[tuple, float] = {}
+
+    def expected_return(goal_allocation: dict) -> float:
+        key = tuple(sorted(goal_allocation.items()))
+        if key not in returns_by_allocation:
+            returns_by_allocation[key] = portfolio_return(goal_allocation)
+        return returns_by_allocation[key]
+
+    allocations = [goal.allocation or allocation for goal in goals]
+    # The projection works at the return rounded to 0.1%; report that rate, not the unrounded one
+    annual_return = quantize_return(np.array([expected_return(a) for a in allocations]))
+    months = np.array([round(goal.years * 12) for goal in goals])
+    step_up = np.array([goal.step_up for goal in goals])
+    savings = np.array([goal.current_savings for goal in goals])
+    targets = np.array([goal.target_corpus * (1 + goal.inflation / 100) ** goal.years for goal in goals])
+
+    sips = required_sip(targets, annual_return, months, step_up, savings)
+    total = float(sips.sum())
+
+    needed_returns = None
+    if monthly_budget is not None:
+        shares = sips / total * monthly_budget if total > 0 else np.zeros_like(sips)
+        needed_returns = required_return(targets, shares, months, step_up, savings)
+
+    fund_wise: Dict[str, float] = {}
+    results = []
+    for i, goal in enumerate(goals):
+        monthly_sip = float(np.ceil(sips[i]))
+        result = {
+            "name": goal.name,
+            "target_corpus": round(float(targets[i]), 2),
+            "months": int(months[i]),
+            "expected_annual_return": round(float(annual_return[i]), 2),
+            "monthly_sip": monthly_sip,
+            "total_invested": round(float(monthly_sip * sip_growth_factor(0.0, months[i], step_up[i])), 2),
+        }
+        if needed_returns is not None:
+            needed = needed_returns[i]
+            result["budget_share"] = round(float(shares[i]), 2)
+            result["required_annual_return"] = None if np.isnan(needed) else round(float(needed), 2)
+        results.append(result)
+
+        weights = allocation_weights(allocations[i])
+        for category, weight in zip(CATEGORIES, weights):
+            if weight > 0:
+                fund_wise[category] = fund_wise.get(category, 0.0) + monthly_sip * weight
+
+    return GoalPlan(
+        goals=results,
+        total_monthly_sip=float(sum(r["monthly_sip"] for r in results)),
+        monthly_budget=monthly_budget,
+        fund_wise_sip={category: round(amount, 2) for category, amount in fund_wise.items()},
+    )
@@ -0,0 +1,131 @@
+"""Pluggable LLM clients for the chat advisor.
+
+Every client streams a reply for a list of OpenAI-style ``{"role", "content"}``
+messages as an async iterator of text tokens. ``OpenAIChatClient`` talks to the
+chat completions API with ``stream=true``; ``LocalAdvisorModel`` is a
+deterministic stand-in used in tests and when no API key is configured.
+"""
+
+import abc
+import asyncio
+import json
+import os
+from typing import AsyncIterator, List, Optional
+
+import httpx
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+DEFAULT_OPENAI_MODEL = "gpt-4o-mini"
+
+
+class LLMError(Exception):
+    """The model provider failed to produce a reply"""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class LLMClient(abc.ABC):
+    """Interface: stream reply tokens for a conversation"""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def stream(self, messages: List[dict]) -> AsyncIterator[str]:
+        """Reply tokens for ``messages``, as they arrive"""
+
+    async def complete(self, messages: List[dict]) -> str:
+        return "".join([token async for token in self.stream(messages)])
+
+    async def aclose(self) -> None:
+        """Release connections held by the client; nothing to release by default"""
+
+
+class OpenAIChatClient(LLMClient):
+    """Chat completions over one pooled HTTP client, kept until ``aclose``"""
+
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str = DEFAULT_OPENAI_MODEL, base_url: str = OPENAI_BASE_URL,
+                 timeout: float = 60.0, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._client = httpx.AsyncClient(timeout=timeout, transport=transport)
+
+    async def stream(self, messages: List[dict]) -> AsyncIterator[str]:
+        payload = {"model": self.model, "messages": messages, "stream": True}
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        async with self._client.stream("POST", f"{self.base_url}/chat/completions",
+                                       json=payload, headers=headers) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                raise LLMError(
+                    f"Provider returned {response.status_code}: {body[:200]!r}",
+                    retryable=response.status_code == 429 or response.status_code >= 500,
+                )
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                token = (choices[0].get("delta") or {}).get("content")
+                if token:
+                    yield token
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class LocalAdvisorModel(LLMClient):
+    """Deterministic offline model: same conversation, same tokens"""
+
+    name = "local"
+
+    TOPIC_REPLIES = (
+        (("sip", "monthly"), "A SIP averages your purchase cost across market cycles, so keep it "
+                             "running through corrections and step it up with every salary hike."),
+        (("tax", "80c", "elss"), "ELSS funds give you a Section 80C deduction of up to 1.5 lakh with "
+                                 "the shortest lock-in of any 80C option, just three years."),
+        (("risk", "volatile", "crash", "fall"), "Market falls feel personal, but a diversified "
+                                                "portfolio held for five years or more has historically "
+                                                "recovered; stay with your allocation."),
+        (("retire", "pension"), "For retirement, start equity-heavy and shift gradually towards debt "
+                                "in the last five to seven years before you stop working."),
+    )
+    DEFAULT_REPLY = ("Start from your goals and timeline, keep an emergency fund of six months, "
+                     "and invest the rest through a diversified mix of equity and debt funds.")
+
+    def __init__(self, token_delay: float = 0.0):
+        self.token_delay = token_delay
+
+    def reply_for(self, messages: List[dict]) -> str:
+        question = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        lowered = question.lower()
+        for keywords, reply in self.TOPIC_REPLIES:
+            if any(keyword in lowered for keyword in keywords):
+                return reply
+        return self.DEFAULT_REPLY
+
+    async def stream(self, messages: List[dict]) -> AsyncIterator[str]:
+        words = self.reply_for(messages).split(" ")
+        for i, word in enumerate(words):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield word if i == 0 else " " + word
+
+
+def client_from_env(api_key: Optional[str] = None) -> LLMClient:
+    """OpenAI when a key is configured and LLM_PROVIDER isn't 'local', otherwise the local model"""
+    provider = os.getenv('LLM_PROVIDER', 'openai' if api_key else 'local')
+    if provider == 'local' or not api_key:
+        return LocalAdvisorModel()
+    return OpenAIChatClient(
+        api_key,
+        model=os.getenv('OPENAI_MODEL', DEFAULT_OPENAI_MODEL),
+        base_url=os.getenv('OPENAI_BASE_URL', OPENAI_BASE_URL),
+    )
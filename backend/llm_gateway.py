@@ -0,0 +1,242 @@
+"""Gateway in front of the chat model provider.
+
+All model traffic from a worker process goes through one ``LLMGateway``:
+
+- a semaphore caps concurrent upstream calls; callers beyond the cap queue,
+  and the queue depth and time spent waiting are tracked;
+- identical prompts already in flight share one upstream call. Late joiners
+  replay the tokens received so far and then follow the live stream;
+- completed replies are cached under a normalized form of the prompt
+  (whitespace collapsed, case folded, trailing punctuation dropped), so common
+  questions asked the same way are answered without a provider call;
+- each attempt has an idle timeout (no token for ``timeout`` seconds), and
+  failed attempts are retried with exponential backoff and full jitter as long
+  as no token has reached callers yet.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional
+
+from llm import LLMClient, LLMError
+from ttl_cache import TTLCache
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_TIMEOUT_SECONDS = 30.0
+DEFAULT_RETRIES = 2
+DEFAULT_CACHE_SIZE = 1000
+DEFAULT_CACHE_TTL = 3600
+WAIT_SAMPLES = 1000
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip().casefold().rstrip("?!. ")
+
+
+def prompt_key(model: str, messages: List[dict]) -> str:
+    """Cache and coalescing key for a conversation"""
+    normalized = [[m["role"], normalize_prompt_text(m["content"])] for m in messages]
+    payload = json.dumps([model, normalized], separators=(",", ":")).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+class _Flight:
+    """One upstream call, fanned out to every caller waiting on the same prompt"""
+
+    def __init__(self):
+        self.tokens: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def push(self, token: str) -> None:
+        self.tokens.append(token)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done = True
+        self.error = error
+        self._notify()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        sent = 0
+        while True:
+            changed = self._changed
+            while sent < len(self.tokens):
+                yield self.tokens[sent]
+                sent += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class LLMGateway(LLMClient):
+    """Concurrency-limited, coalescing, caching wrapper around an LLMClient"""
+
+    name = "gateway"
+
+    def __init__(
+        self,
+        upstream: LLMClient,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        retries: int = DEFAULT_RETRIES,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        cache: Optional[TTLCache] = None,
+    ):
+        self.upstream = upstream
+        self.model = getattr(upstream, "model", upstream.name)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cache = cache if cache is not None else TTLCache(DEFAULT_CACHE_SIZE, DEFAULT_CACHE_TTL)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._flights: Dict[str, _Flight] = {}
+        self._tasks = set()
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    @classmethod
+    def from_env(cls, upstream: LLMClient) -> "LLMGateway":
+        return cls(
+            upstream,
+            max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY)),
+            timeout=float(os.getenv('LLM_TIMEOUT_SECONDS', DEFAULT_TIMEOUT_SECONDS)),
+            retries=int(os.getenv('LLM_RETRIES', DEFAULT_RETRIES)),
+            cache=TTLCache(
+                max_entries=int(os.getenv('LLM_CACHE_SIZE', DEFAULT_CACHE_SIZE)),
+                ttl_seconds=float(os.getenv('LLM_CACHE_TTL', DEFAULT_CACHE_TTL)),
+            ),
+        )
+
+    async def aclose(self) -> None:
+        await self.upstream.aclose()
+
+    async def stream(self, messages: List[dict]) -> AsyncIterator[str]:
+        self.requests += 1
+        key = prompt_key(self.model, messages)
+        cached = self.cache.get(key)
+        if cached is not None:
+            for token in cached:
+                yield token
+            return
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            task = asyncio.create_task(self._fly(key, messages, flight))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            self.coalesced += 1
+        async for token in flight.subscribe():
+            yield token
+
+    async def _fly(self, key: str, messages: List[dict], flight: _Flight) -> None:
+        queued_at = time.perf_counter()
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            await self._semaphore.acquire()
+        except asyncio.CancelledError:
+            self.queue_depth -= 1
+            self._flights.pop(key, None)
+            flight.finish(LLMError("Model call was cancelled", retryable=False))
+            raise
+        self.queue_depth -= 1
+        self._waits.append(time.perf_counter() - queued_at)
+        self.in_flight += 1
+        try:
+            await self._call_upstream(messages, flight)
+            self.cache.put(key, list(flight.tokens))
+            flight.finish()
+        except asyncio.CancelledError:
+            flight.finish(LLMError("Model call was cancelled", retryable=False))
+            raise
+        except Exception as e:
+            self.failures += 1
+            flight.finish(e)
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            self._flights.pop(key, None)
+
+    async def _call_upstream(self, messages: List[dict], flight: _Flight) -> None:
+        for attempt in range(self.retries + 1):
+            self.upstream_calls += 1
+            try:
+                await self._attempt(messages, flight)
+                return
+            except Exception as e:
+                # Once callers have seen tokens a retry would repeat them
+                if flight.tokens or attempt == self.retries or not getattr(e, "retryable", True):
+                    raise
+                self.retried += 1
+            await asyncio.sleep(self.backoff(attempt))
+
+    async def _attempt(self, messages: List[dict], flight: _Flight) -> None:
+        tokens = self.upstream.stream(messages).__aiter__()
+        try:
+            while True:
+                try:
+                    token = await asyncio.wait_for(tokens.__anext__(), self.timeout)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    raise LLMError(f"No response from the model within {self.timeout}s")
+                flight.push(token)
+        finally:
+            aclose = getattr(tokens, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry ``attempt + 1``"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "retries": self.retried,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "wait_ms": {
+                "p50": round(waits[len(waits) // 2] * 1000, 3) if waits else 0.0,
+                "p95": round(waits[int(len(waits) * 0.95)] * 1000, 3) if waits else 0.0,
+                "max": round(waits[-1] * 1000, 3) if waits else 0.0,
+            },
+            "cache": self.cache.stats(),
+        }
@@ -0,0 +1,70 @@
+"""Capital market assumptions per allocation category.
+
+Annual expected returns are the figures the advisor has always used for its
+projections; volatilities and correlations are long-run estimates for Indian
+mutual fund categories (rupee terms) used by the simulation engine.
+"""
+
+import numpy as np
+
+CATEGORIES = ('large_cap', 'mid_cap', 'small_cap', 'debt', 'hybrid', 'international', 'elss')
+
+# Expected annual returns in percent (post-tax, inflation-adjusted)
+EXPECTED_RETURNS = {
+    'large_cap': 12.0,
+    'mid_cap': 15.0,
+    'small_cap': 18.0,
+    'debt': 7.5,
+    'hybrid': 10.0,
+    'international': 11.0,
+    'elss': 13.0
+}
+
+# Annualized volatility in percent
+VOLATILITIES = {
+    'large_cap': 16.0,
+    'mid_cap': 21.0,
+    'small_cap': 26.0,
+    'debt': 3.5,
+    'hybrid': 10.0,
+    'international': 18.0,
+    'elss': 17.0
+}
+
+# Correlation matrix, rows and columns in CATEGORIES order
+CORRELATIONS = np.array([
+    # large  mid    small  debt   hybrid intl   elss
+    [1.00,  0.85,  0.75,  0.05,  0.90,  0.50,  0.92],
+    [0.85,  1.00,  0.90,  0.00,  0.80,  0.45,  0.88],
+    [0.75,  0.90,  1.00, -0.02,  0.70,  0.40,  0.80],
+    [0.05,  0.00, -0.02,  1.00,  0.30,  0.05,  0.03],
+    [0.90,  0.80,  0.70,  0.30,  1.00,  0.45,  0.85],
+    [0.50,  0.45,  0.40,  0.05,  0.45,  1.00,  0.48],
+    [0.92,  0.88,  0.80,  0.03,  0.85,  0.48,  1.00],
+])
+
+
+def age_bucket(age: int) -> int:
+    """Age band the allocation bounds are set by (<30, 30-50, >50)"""
+    if age < 30:
+        return 0
+    if age > 50:
+        return 2
+    return 1
+
+
+def covariance_matrix() -> np.ndarray:
+    """Annual covariance of category returns (fractions, not percent)"""
+    vol = np.array([VOLATILITIES[c] for c in CATEGORIES]) / 100
+    return CORRELATIONS * np.outer(vol, vol)
+
+
+def allocation_weights(allocation: dict) -> np.ndarray:
+    """Weights in CATEGORIES order, normalized to sum to 1"""
+    unknown = set(allocation) - set(CATEGORIES)
+    if unknown:
+        raise ValueError(f"Unknown allocation categories: {', '.join(sorted(unknown))}")
+    weights = np.array([float(allocation.get(c, 0)) for c in CATEGORIES])
+    if (weights < 0).any() or weights.sum() <= 0:
+        raise ValueError("Allocation percentages must be non-negative and not all zero")
+    return weights / weights.sum()
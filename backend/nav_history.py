@@ -0,0 +1,263 @@
+"""Historical NAV store: daily NAVs of every scheme in memory-mapped arrays.
+
+Daily NAV files (CSV with ``scheme_code,date,nav`` rows, dates as
+``YYYY-MM-DD`` or AMFI's ``18-Oct-2024``) are ingested into a directory
+holding:
+
+- ``calendar-<generation>.npy``: the trading days, ``datetime64[D]``, sorted;
+- ``navs-<generation>.npy``: a float32 matrix with one row per scheme and one
+  column per trading day, NaN where a scheme has no NAV (before launch, or a
+  day it didn't publish);
+- ``manifest.json``: the current generation and the scheme codes in row order.
+
+Readers open the arrays with ``np.load(mmap_mode='r')``. Opening costs a few
+file reads whatever the size, every API worker shares the same page cache,
+and a scheme's series over any date range is a slice of its row: no copy and
+no parsing. Ten years of daily NAVs for 10,000 schemes is about 100 MB.
+
+Ingesting writes a new generation next to the old one and then replaces the
+manifest, so a reader sees either the old store or the new one. Scheme rows
+keep their position across generations and new schemes are added at the end.
+"""
+
+import csv
+import json
+import os
+import threading
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'nav_history')
+MANIFEST = 'manifest.json'
+NAV_DTYPE = np.float32
+DATE_FORMATS = ('%Y-%m-%d', '%d-%b-%Y')
+
+DateLike = Union[str, date, np.datetime64]
+
+
+def to_day(value: DateLike) -> np.datetime64:
+    """A date in any accepted form as ``datetime64[D]``"""
+    if isinstance(value, str):
+        for fmt in DATE_FORMATS:
+            try:
+                return np.datetime64(datetime.strptime(value.strip(), fmt).date(), 'D')
+            except ValueError:
+                continue
+        raise ValueError(f"Unrecognized date: {value!r}")
+    return np.datetime64(value, 'D')
+
+
+class NavHistory:
+    """Read-only NAV matrix over a trading-day calendar"""
+
+    def __init__(self, calendar: np.ndarray, navs: np.ndarray, schemes: Sequence[str],
+                 path: Optional[str] = None, generation: int = 0):
+        if navs.shape != (len(schemes), len(calendar)):
+            raise ValueError("NAV matrix must have one row per scheme and one column per trading day")
+        self.calendar = calendar
+        self.navs = navs
+        self.schemes = tuple(schemes)
+        self.path = path
+        self.generation = generation
+        self._row_by_code = {code: row for row, code in enumerate(self.schemes)}
+
+    @classmethod
+    def open(cls, path: str) -> "NavHistory":
+        """Memory-map the current generation of a store directory"""
+        with open(os.path.join(path, MANIFEST), encoding='utf-8') as fh:
+            manifest = json.load(fh)
+        generation = manifest['generation']
+        calendar = np.load(os.path.join(path, f'calendar-{generation}.npy'), mmap_mode='r')
+        navs = np.load(os.path.join(path, f'navs-{generation}.npy'), mmap_mode='r')
+        return cls(calendar, navs, manifest['schemes'], path=path, generation=generation)
+
+    def __len__(self) -> int:
+        return len(self.schemes)
+
+    def __contains__(self, scheme_code: str) -> bool:
+        return scheme_code in self._row_by_code
+
+    @property
+    def days(self) -> int:
+        return len(self.calendar)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the mapped arrays (resident only once read)"""
+        return self.navs.nbytes + self.calendar.nbytes
+
+    def row_for(self, scheme_code: str) -> Optional[int]:
+        return self._row_by_code.get(scheme_code)
+
+    def span(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> slice:
+        """Columns of the trading days from ``start`` to ``end``, both inclusive"""
+        first = 0 if start is None else int(np.searchsorted(self.calendar, to_day(start), side='left'))
+        last = len(self.calendar) if end is None else int(np.searchsorted(self.calendar, to_day(end), side='right'))
+        return slice(first, max(first, last))
+
+    def dates(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> np.ndarray:
+        return self.calendar[self.span(start, end)]
+
+    def series(self, scheme_code: str, start: Optional[DateLike] = None,
+               end: Optional[DateLike] = None) -> np.ndarray:
+        """One scheme's NAVs over a date range, as a view of the mapped file"""
+        row = self.row_for(scheme_code)
+        if row is None:
+            raise KeyError(scheme_code)
+        return self.navs[row, self.span(start, end)]
+
+    def published(self, scheme_code: str, start: Optional[DateLike] = None,
+                  end: Optional[DateLike] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Days a scheme published a NAV in a date range, and those NAVs"""
+        span = self.span(start, end)
+        navs = self.series(scheme_code)[span]
+        known = ~np.isnan(navs)
+        return self.calendar[span][known], navs[known]
+
+    def window(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> np.ndarray:
+        """Every scheme over a date range, as a view of the mapped file"""
+        return self.navs[:, self.span(start, end)]
+
+    def matrix(self, scheme_codes: Iterable[str], start: Optional[DateLike] = None,
+               end: Optional[DateLike] = None) -> np.ndarray:
+        """Selected schemes over a date range; only the rows asked for are read"""
+        rows = []
+        for code in scheme_codes:
+            row = self.row_for(code)
+            if row is None:
+                raise KeyError(code)
+            rows.append(row)
+        return self.navs[rows, self.span(start, end)]
+
+    def stats(self) -> dict:
+        return {
+            "schemes": len(self),
+            "trading_days": self.days,
+            "first_day": str(self.calendar[0]) if self.days else None,
+            "last_day": str(self.calendar[-1]) if self.days else None,
+            "generation": self.generation,
+            "bytes": self.nbytes,
+        }
+
+
+def read_nav_files(paths: Iterable[str]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Scheme codes, days and NAVs of every row in the given daily NAV files"""
+    codes: List[str] = []
+    days: List[np.datetime64] = []
+    navs: List[float] = []
+    parsed: Dict[str, np.datetime64] = {}
+    for path in paths:
+        with open(path, newline='', encoding='utf-8') as fh:
+            for row in csv.DictReader(fh):
+                nav = row['nav'].strip()
+                # Schemes publish "N.A." on days they have no NAV
+                if not nav or not nav[0].isdigit():
+                    continue
+                day = row['date']
+                if day not in parsed:
+                    parsed[day] = to_day(day)
+                codes.append(row['scheme_code'].strip())
+                days.append(parsed[day])
+                navs.append(float(nav))
+    return codes, np.array(days, dtype='datetime64[D]'), np.array(navs, dtype=NAV_DTYPE)
+
+
+def ingest(path: str, files: Iterable[str]) -> NavHistory:
+    """Add daily NAV files to the store at ``path`` (created if missing) and open the new generation
+
+    A NAV for a (scheme, day) already in the store is replaced.
+    """
+    codes, days, values = read_nav_files(files)
+    existing = NavHistory.open(path) if os.path.exists(os.path.join(path, MANIFEST)) else None
+
+    schemes = list(existing.schemes) if existing else []
+    row_by_code = {code: row for row, code in enumerate(schemes)}
+    for code in codes:
+        if code not in row_by_code:
+            row_by_code[code] = len(schemes)
+            schemes.append(code)
+    old_calendar = existing.calendar if existing else np.empty(0, dtype='datetime64[D]')
+    calendar = np.union1d(old_calendar, days)
+
+    navs = np.full((len(schemes), len(calendar)), np.nan, dtype=NAV_DTYPE)
+    if existing:
+        navs[:len(existing), np.searchsorted(calendar, old_calendar)] = existing.navs
+    rows = np.fromiter((row_by_code[code] for code in codes), dtype=np.intp, count=len(codes))
+    navs[rows, np.searchsorted(calendar, days)] = values
+
+    return write_generation(path, calendar, navs, schemes)
+
+
+def _current_generation(path: str) -> int:
+    try:
+        with open(os.path.join(path, MANIFEST), encoding='utf-8') as fh:
+            return json.load(fh)['generation']
+    except FileNotFoundError:
+        return 0
+
+
+def write_generation(path: str, calendar: np.ndarray, navs: np.ndarray, schemes: Sequence[str]) -> NavHistory:
+    """Write a complete NAV matrix as the store's next generation, make it current and open it"""
+    calendar = np.asarray(calendar, dtype='datetime64[D]')
+    navs = np.asarray(navs, dtype=NAV_DTYPE)
+    if navs.shape != (len(schemes), len(calendar)):
+        raise ValueError("NAV matrix must have one row per scheme and one column per trading day")
+    generation = _current_generation(path) + 1
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, f'calendar-{generation}.npy'), calendar)
+    np.save(os.path.join(path, f'navs-{generation}.npy'), navs)
+    manifest = os.path.join(path, MANIFEST)
+    with open(manifest + '.tmp', 'w', encoding='utf-8') as fh:
+        json.dump({"generation": generation, "schemes": list(schemes)}, fh)
+    os.replace(manifest + '.tmp', manifest)
+
+    # The previous generation stays for readers that read the old manifest but
+    # haven't opened its arrays yet; readers already mapping older files keep
+    # them (unlinked) until they close
+    keep = {f'{generation}.npy', f'{generation - 1}.npy'}
+    for name in os.listdir(path):
+        stem, _, suffix = name.rpartition('-')
+        if stem in ('calendar', 'navs') and suffix not in keep:
+            os.remove(os.path.join(path, name))
+    return NavHistory.open(path)
+
+
+class NavHistoryStore:
+    """Holds the current NAV history and re-opens it when a new generation is ingested"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self.history: Optional[NavHistory] = None
+
+    @classmethod
+    def from_env(cls) -> "NavHistoryStore":
+        return cls(os.getenv('NAV_HISTORY_PATH', DEFAULT_PATH))
+
+    def _manifest_signature(self):
+        try:
+            stat = os.stat(os.path.join(self.path, MANIFEST))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload_if_changed(self) -> Optional[NavHistory]:
+        """Open the store if its manifest changed since the last open; returns the new history or None"""
+        with self._lock:
+            signature = self._manifest_signature()
+            if signature is None or signature == self._signature:
+                return None
+            self.history = NavHistory.open(self.path)
+            self._signature = signature
+            return self.history
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 3:
+        sys.exit("usage: python nav_history.py STORE_DIR NAV_FILE [NAV_FILE ...]")
+    print(json.dumps(ingest(sys.argv[1], sys.argv[2:]).stats()))
@@ -0,0 +1,131 @@
+"""Memoized SIP projection tables.
+
+Every deterministic projection works at an annual return rounded to 0.1% and
+a whole number of months. For each return on that grid two rows are built
+the first time the return is used, and kept:
+
+- ``growth``: ``(1 + r)^k``, the growth of a lump sum over ``k`` months;
+- ``annuity``: ``((1 + r)^k - 1) / r``, the corpus from ₹1 a month after ``k``
+  end-of-month instalments (``k`` when ``r`` is 0).
+
+Both cover ``k = 0 .. MAX_MONTHS`` and are computed with the same Python
+expressions as ``_calculate_sip_value``, so a lookup returns exactly what that
+formula gives at the rounded return. The advisor's weighted returns come from
+a small set of allocations, so only a few dozen rows are ever built; a
+projection after that is an index into a table.
+
+Rows live in one array per table covering the whole return grid, so a batch
+of projections is a single fancy-indexing operation. The arrays are allocated
+up front but only the pages of rows actually built are ever touched.
+"""
+
+import threading
+from typing import Dict, Tuple
+
+import numpy as np
+
+MAX_MONTHS = 600
+# Returns are keyed in tenths of a percent
+RETURN_STEPS_PER_PERCENT = 10
+# Annual returns (percent) the tables cover
+RETURN_RANGE = (-50.0, 100.0)
+
+_MIN_KEY = round(RETURN_RANGE[0] * RETURN_STEPS_PER_PERCENT)
+_MAX_KEY = round(RETURN_RANGE[1] * RETURN_STEPS_PER_PERCENT)
+_ROWS = _MAX_KEY - _MIN_KEY + 1
+
+_growth = np.empty((_ROWS, MAX_MONTHS + 1))
+_annuity = np.empty((_ROWS, MAX_MONTHS + 1))
+_built = np.zeros(_ROWS, dtype=bool)
+_build_lock = threading.Lock()
+# Annuity rows as tuples for scalar lookups, which indexing a NumPy array
+# (boxing a numpy.float64) would make slower than the formula
+_annuity_tuples: Dict[int, Tuple[float, ...]] = {}
+
+
+def return_key(annual_return: float) -> int:
+    """Grid key of an annual return in percent: 12.34 -> 123"""
+    return round(annual_return * RETURN_STEPS_PER_PERCENT)
+
+
+def quantize_return(annual_return):
+    """Annual return rounded to the table grid; works on scalars and arrays"""
+    if np.ndim(annual_return):
+        return np.rint(np.asarray(annual_return, dtype=float) * RETURN_STEPS_PER_PERCENT) / RETURN_STEPS_PER_PERCENT
+    return return_key(annual_return) / RETURN_STEPS_PER_PERCENT
+
+
+def _build(key: int) -> None:
+    monthly_return = key / RETURN_STEPS_PER_PERCENT / 12 / 100
+    growth = [(1 + monthly_return) ** months for months in range(MAX_MONTHS + 1)]
+    if monthly_return == 0:
+        annuity = [float(months) for months in range(MAX_MONTHS + 1)]
+    else:
+        annuity = [(g - 1) / monthly_return for g in growth]
+    row = key - _MIN_KEY
+    _growth[row] = growth
+    _annuity[row] = annuity
+    _annuity_tuples[key] = tuple(annuity)
+    _built[row] = True
+
+
+def _rows(keys: np.ndarray) -> np.ndarray:
+    """Table rows for grid keys, building any that are missing"""
+    if keys.size and (keys.min() < _MIN_KEY or keys.max() > _MAX_KEY):
+        raise ValueError(f"Annual returns must be between {RETURN_RANGE[0]}% and {RETURN_RANGE[1]}%")
+    rows = keys - _MIN_KEY
+    if not _built[rows].all():
+        with _build_lock:
+            for row in np.unique(rows[~_built[rows]]):
+                if not _built[row]:
+                    _build(int(row) + _MIN_KEY)
+    return rows
+
+
+def _check_months(months) -> None:
+    if np.size(months) and (np.min(months) < 0 or np.max(months) > MAX_MONTHS):
+        raise ValueError(f"months must be between 0 and {MAX_MONTHS}")
+
+
+def annuity_row(annual_return: float) -> Tuple[float, ...]:
+    """Corpus from ₹1 a month after 0 .. MAX_MONTHS months, for projecting several horizons at once"""
+    key = return_key(annual_return)
+    annuity = _annuity_tuples.get(key)
+    if annuity is None:
+        _rows(np.array([key]))
+        annuity = _annuity_tuples[key]
+    return annuity
+
+
+def sip_value(monthly_sip: float, annual_return: float, months: int) -> float:
+    """Corpus from a flat monthly SIP after ``months``"""
+    annuity = annuity_row(annual_return)
+    if not 0 <= months <= MAX_MONTHS:
+        raise ValueError(f"months must be between 0 and {MAX_MONTHS}")
+    return monthly_sip * annuity[months]
+
+
+def _lookup(table: np.ndarray, annual_return, months) -> np.ndarray:
+    annual_return, months = np.broadcast_arrays(np.asarray(annual_return, dtype=float), np.asarray(months))
+    _check_months(months)
+    keys = np.rint(annual_return * RETURN_STEPS_PER_PERCENT).astype(np.int64)
+    return table[_rows(keys), months.astype(np.int64)]
+
+
+def growth_factors(annual_return, months) -> np.ndarray:
+    """``(1 + r)^months`` for arrays of returns (percent) and months"""
+    return _lookup(_growth, annual_return, months)
+
+
+def annuity_factors(annual_return, months) -> np.ndarray:
+    """Corpus from ₹1 a month for arrays of returns (percent) and months"""
+    return _lookup(_annuity, annual_return, months)
+
+
+def table_stats() -> dict:
+    built = int(_built.sum())
+    return {
+        "returns_tabulated": built,
+        # Two float64 rows per return, plus the tuple (pointer and float object per entry)
+        "bytes": built * (2 * 8 + 32) * (MAX_MONTHS + 1),
+    }
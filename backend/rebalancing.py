@@ -0,0 +1,297 @@
+"""Rebalancing existing holdings back to a target allocation.
+
+Holdings of any number of portfolios are handled as one book of flat per-lot
+arrays (portfolio number, category code, units, NAV, cost, days held, exit
+load), so the nightly run over every portfolio is a handful of NumPy passes:
+
+1. Category values per portfolio come from one ``bincount`` into a
+   portfolio x category matrix, and drift is current minus target weight.
+2. A portfolio is only traded when some category has drifted more than
+   ``tolerance`` percentage points. Inflows expected from SIPs over the next
+   ``redirect_months`` count towards underweight categories first, so
+   overweight categories are only sold down to what those inflows can't fix.
+3. Each overweight category is sold from its cheapest lots first. The cost of
+   selling a rupee of a lot is its exit load, if still within the load
+   period, plus the tax on the gain part of that rupee. Lots are sorted by
+   (portfolio, category, cost) and a segmented cumulative sum decides how much
+   each lot gives. ELSS lots still in their lock-in can't be sold.
+4. Proceeds, net of exit loads, buy the underweight categories in proportion
+   to their gaps, and the monthly SIP is redirected to whatever gap remains.
+   Portfolios within tolerance keep their SIP on the target split.
+
+Tax follows current Indian rules for mutual funds: equity-oriented funds pay
+20% on short-term gains and 12.5% on long-term gains above ₹1.25 lakh a year;
+debt and international funds are taxed at the investor's slab rate. The rates,
+holding periods and the default exit-load window are ``TaxRules`` fields, so a
+caller can pass the investor's slab and a lot its fund's own load window.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from market_assumptions import CATEGORIES, allocation_weights
+
+DEFAULT_TOLERANCE = 5.0         # percentage points of drift before trading
+MIN_TRADE = 500                 # smallest sale worth placing, in rupees
+SLAB_TAXED_CATEGORIES = ('debt', 'international')
+
+_CATEGORY_CODES = {category: code for code, category in enumerate(CATEGORIES)}
+_SLAB_TAXED = np.array([category in SLAB_TAXED_CATEGORIES for category in CATEGORIES])
+_ELSS = _CATEGORY_CODES['elss']
+
+
+def category_code(category: str) -> int:
+    if category not in _CATEGORY_CODES:
+        raise ValueError(f"Unknown allocation category: {category}")
+    return _CATEGORY_CODES[category]
+
+
+@dataclass(frozen=True)
+class TaxRules:
+    """Tax rates and holding periods applied to sales"""
+    slab_rate: float = 0.30             # investor's income tax slab, for debt and international funds
+    equity_stcg_rate: float = 0.20
+    equity_ltcg_rate: float = 0.125
+    ltcg_exemption: float = 125000      # long-term equity gains exempt per year, in rupees
+    long_term_days: int = 365
+    exit_load_days: int = 365           # load window of lots that don't carry their own
+    elss_lock_in_days: int = 3 * 365
+
+    def __post_init__(self):
+        rates = (self.slab_rate, self.equity_stcg_rate, self.equity_ltcg_rate)
+        if not all(0 <= rate <= 1 for rate in rates):
+            raise ValueError("Tax rates must be fractions between 0 and 1")
+
+
+DEFAULT_TAX_RULES = TaxRules()
+
+
+@dataclass
+class Book:
+    """Lots of many portfolios as parallel arrays; ``portfolio`` numbers run from 0"""
+    portfolio: np.ndarray   # int
+    category: np.ndarray    # int code into CATEGORIES
+    units: np.ndarray
+    nav: np.ndarray
+    cost: np.ndarray        # purchase NAV per unit
+    held_days: np.ndarray   # int
+    exit_load: np.ndarray   # percent, charged when sold within the load window
+    exit_load_days: Optional[np.ndarray] = None   # int load window; TaxRules.exit_load_days if None
+
+    @property
+    def size(self) -> int:
+        return len(self.portfolio)
+
+
+@dataclass
+class BookRebalance:
+    drift: np.ndarray           # portfolios x categories, percentage points
+    rebalanced: np.ndarray      # portfolios; True where trades were placed
+    sell_value: np.ndarray      # lots; gross rupees sold
+    sell_units: np.ndarray      # lots
+    exit_load_cost: np.ndarray  # lots
+    buy_value: np.ndarray       # portfolios x categories
+    sip_split: np.ndarray       # portfolios x categories, monthly rupees; the target split unless rebalanced
+    tax: np.ndarray             # portfolios; estimated tax on realized gains
+
+
+def _segment_starts(keys: np.ndarray) -> np.ndarray:
+    """Index of the first element of each run of equal keys, for every element"""
+    starts = np.ones(len(keys), dtype=bool)
+    starts[1:] = keys[1:] != keys[:-1]
+    return np.maximum.accumulate(np.where(starts, np.arange(len(keys)), 0))
+
+
+def rebalance_book(
+    book: Book,
+    targets: np.ndarray,
+    monthly_sip: Optional[np.ndarray] = None,
+    tolerance: float = DEFAULT_TOLERANCE,
+    redirect_months: int = 0,
+    min_trade: float = MIN_TRADE,
+    rules: TaxRules = DEFAULT_TAX_RULES,
+) -> BookRebalance:
+    """Trades that bring every portfolio of the book back to its target
+
+    ``targets`` is a portfolios x categories matrix of weights (rows summing to
+    1) in CATEGORIES order and ``monthly_sip`` the SIP each portfolio invests.
+    """
+    portfolios, categories = targets.shape
+    if monthly_sip is None:
+        monthly_sip = np.zeros(portfolios)
+    value = book.units * book.nav
+    cell = book.portfolio * categories + book.category
+    current = np.bincount(cell, weights=value, minlength=portfolios * categories).reshape(portfolios, categories)
+    total = current.sum(axis=1)
+    safe_total = np.where(total > 0, total, 1.0)
+    drift = (current / safe_total[:, None] - targets) * 100
+
+    rebalanced = (np.abs(drift) > tolerance).any(axis=1) & (total > 0)
+    future_total = total + monthly_sip * redirect_months
+    excess = current - targets * future_total[:, None]
+    sell_needed = np.where(rebalanced[:, None] & (excess >= min_trade), excess, 0.0)
+
+    # Cost of selling one rupee of each lot
+    short_term = book.held_days < rules.long_term_days
+    load_days = rules.exit_load_days if book.exit_load_days is None else book.exit_load_days
+    load_rate = np.where(book.held_days < load_days, book.exit_load / 100, 0.0)
+    gain_fraction = np.clip(1 - book.cost / book.nav, 0.0, None)
+    slab = _SLAB_TAXED[book.category]
+    tax_rate = np.where(slab, rules.slab_rate, np.where(short_term, rules.equity_stcg_rate, rules.equity_ltcg_rate))
+    locked = (book.category == _ELSS) & (book.held_days < rules.elss_lock_in_days)
+    sellable = np.where(locked, 0.0, value)
+    rate = load_rate + tax_rate * gain_fraction
+
+    order = np.lexsort((rate, cell))
+    sorted_cell = cell[order]
+    sorted_value = sellable[order]
+    cumulative = np.cumsum(sorted_value)
+    before = cumulative - sorted_value
+    before -= before[_segment_starts(sorted_cell)]
+    need = sell_needed.ravel()[sorted_cell]
+    sold = np.empty(book.size)
+    sold[order] = np.clip(need - before, 0.0, sorted_value)
+
+    sell_units = sold / book.nav
+    load_cost = sold * load_rate
+    sold_by_cell = np.bincount(cell, weights=sold, minlength=portfolios * categories).reshape(portfolios, categories)
+    proceeds = np.bincount(book.portfolio, weights=sold - load_cost, minlength=portfolios)
+
+    # Proceeds fill the gaps that expected inflows won't
+    after_sales = current - sold_by_cell
+    gap = np.clip(targets * future_total[:, None] - after_sales, 0.0, None)
+    gap_total = gap.sum(axis=1)
+    share = np.where(gap_total[:, None] > 0, gap / np.where(gap_total > 0, gap_total, 1.0)[:, None], targets)
+    buy = share * proceeds[:, None]
+
+    remaining = np.clip(gap - buy, 0.0, None)
+    remaining_total = remaining.sum(axis=1)
+    sip_share = np.where(
+        remaining_total[:, None] > 0, remaining / np.where(remaining_total > 0, remaining_total, 1.0)[:, None], targets
+    )
+    sip_split = np.where(rebalanced[:, None], sip_share, targets) * monthly_sip[:, None]
+
+    gains = sold * gain_fraction
+    slab_gains = np.bincount(book.portfolio, weights=np.where(slab, gains, 0.0), minlength=portfolios)
+    stcg = np.bincount(book.portfolio, weights=np.where(~slab & short_term, gains, 0.0), minlength=portfolios)
+    ltcg = np.bincount(book.portfolio, weights=np.where(~slab & ~short_term, gains, 0.0), minlength=portfolios)
+    tax = (slab_gains * rules.slab_rate + stcg * rules.equity_stcg_rate
+           + np.clip(ltcg - rules.ltcg_exemption, 0.0, None) * rules.equity_ltcg_rate)
+
+    return BookRebalance(
+        drift=drift,
+        rebalanced=rebalanced,
+        sell_value=sold,
+        sell_units=sell_units,
+        exit_load_cost=load_cost,
+        buy_value=buy,
+        sip_split=sip_split,
+        tax=tax,
+    )
+
+
+def rebalance_portfolio(
+    holdings: List[dict],
+    allocation: dict,
+    fund_index,
+    monthly_sip: float = 0.0,
+    tolerance: float = DEFAULT_TOLERANCE,
+    redirect_months: int = 0,
+    rules: TaxRules = DEFAULT_TAX_RULES,
+) -> dict:
+    """Drift and trades for one portfolio; no trades unless some category is out of tolerance
+
+    Each holding has ``scheme_code``, ``units`` and ``nav``, and optionally
+    ``cost_per_unit`` (defaults to the NAV, i.e. no gain), ``held_days``
+    (defaults to a long-term holding), ``exit_load_days`` (defaults to
+    ``rules.exit_load_days``) and ``allocation_category`` for schemes outside
+    the fund universe.
+    """
+    if not holdings:
+        raise ValueError("At least one holding is required")
+    universe = fund_index.universe
+    rows, categories, loads = [], [], []
+    for holding in holdings:
+        if holding['units'] < 0 or holding['nav'] <= 0:
+            raise ValueError(f"{holding['scheme_code']}: units must not be negative and nav must be positive")
+        row = universe.row_for(holding['scheme_code'])
+        category = holding.get('allocation_category')
+        if category is None:
+            if row is None:
+                raise ValueError(f"Unknown scheme {holding['scheme_code']}; pass its allocation_category")
+            category = universe.value('allocation_category', row)
+        rows.append(row)
+        categories.append(category_code(category))
+        loads.append(universe.value('exit_load', row) if row is not None else 0.0)
+
+    nav = np.array([h['nav'] for h in holdings], dtype=float)
+    cost = np.array([h.get('cost_per_unit') or h['nav'] for h in holdings], dtype=float)
+    book = Book(
+        portfolio=np.zeros(len(holdings), dtype=np.int64),
+        category=np.array(categories, dtype=np.int64),
+        units=np.array([h['units'] for h in holdings], dtype=float),
+        nav=nav,
+        cost=cost,
+        held_days=np.array([h.get('held_days', rules.long_term_days) for h in holdings], dtype=np.int64),
+        exit_load=np.array(loads, dtype=float),
+        exit_load_days=np.array(
+            [rules.exit_load_days if h.get('exit_load_days') is None else h['exit_load_days'] for h in holdings],
+            dtype=np.int64,
+        ),
+    )
+    targets = allocation_weights(allocation)[None, :]
+    result = rebalance_book(
+        book, targets, np.array([monthly_sip], dtype=float), tolerance, redirect_months, rules=rules
+    )
+
+    current = np.bincount(book.category, weights=book.units * book.nav, minlength=len(CATEGORIES))
+    total = float(current.sum())
+    involved = (current > 0) | (targets[0] > 0)
+    trades: List[dict] = []
+    for i, holding in enumerate(holdings):
+        if result.sell_value[i] > 0:
+            trades.append({
+                "action": "sell",
+                "scheme_code": holding['scheme_code'],
+                "category": CATEGORIES[book.category[i]],
+                "units": round(float(result.sell_units[i]), 3),
+                "amount": round(float(result.sell_value[i]), 2),
+                "exit_load": round(float(result.exit_load_cost[i]), 2),
+            })
+
+    def fund_for(code: int) -> Optional[str]:
+        """Largest existing holding in the category, else the top-ranked fund"""
+        held = [i for i in range(len(holdings)) if book.category[i] == code and book.units[i] > 0]
+        if held:
+            return holdings[max(held, key=lambda i: book.units[i] * book.nav[i])]['scheme_code']
+        best = fund_index.best(CATEGORIES[code])
+        return best['scheme_code'] if best is not None else None
+
+    for code, amount in enumerate(result.buy_value[0]):
+        if amount >= 1:
+            trades.append({"action": "buy", "scheme_code": fund_for(code), "category": CATEGORIES[code],
+                           "amount": round(float(amount), 2)})
+    for code, amount in enumerate(result.sip_split[0] if result.rebalanced[0] else ()):
+        if amount >= 1:
+            trades.append({"action": "sip_redirect", "scheme_code": fund_for(code), "category": CATEGORIES[code],
+                           "monthly_amount": round(float(amount), 2)})
+
+    return {
+        "total_value": round(total, 2),
+        "current_allocation": {
+            category: round(float(current[c] / total * 100), 2) if total else 0.0
+            for c, category in enumerate(CATEGORIES) if involved[c]
+        },
+        "drift": {category: round(float(result.drift[0, c]), 2) for c, category in enumerate(CATEGORIES) if involved[c]},
+        "rebalance_needed": bool(result.rebalanced[0]),
+        "trades": trades,
+        "estimated_exit_load": round(float(result.exit_load_cost.sum()), 2),
+        "estimated_tax": round(float(result.tax[0]), 2),
+    }
+
+
+def book_targets(allocations: List[Dict[str, float]]) -> np.ndarray:
+    """Portfolios x categories weight matrix from allocation dicts"""
+    return np.stack([allocation_weights(allocation) for allocation in allocations])
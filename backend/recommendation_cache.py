@@ -0,0 +1,63 @@
+"""LRU/TTL cache for the profile-invariant part of investment recommendations.
+
+The allocation and rebalancing frequency depend only on the risk score, the
+age band and whether retirement or tax saving is a goal, so they are cached
+under a fingerprint of exactly those. Everything else (fund selection and
+SIP amounts, report sections) is derived per request from the cached
+allocation and the user's own figures.
+"""
+
+import hashlib
+import json
+import os
+from typing import Iterable
+
+from market_assumptions import age_bucket
+from ttl_cache import TTLCache
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 3600
+
+
+def recommendation_fingerprint(risk_score: int, age: int, goals: Iterable[str]) -> str:
+    """Canonical hash of the inputs the cached recommendation core depends on"""
+    goals = set(goals)
+    key = {
+        "risk_score": int(risk_score),
+        "age_bucket": age_bucket(age),
+        "retirement": "retirement" in goals,
+        "tax": "tax" in goals,
+    }
+    payload = json.dumps(key, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+class RecommendationCache(TTLCache):
+    """TTL/LRU cache of recommendation cores, tied to a fund universe version
+
+    Binding a new version drops everything cached against the old one.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        super().__init__(max_entries, ttl_seconds)
+        self._version = None
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "RecommendationCache":
+        return cls(
+            max_entries=int(os.getenv('RECOMMENDATION_CACHE_SIZE', DEFAULT_MAX_ENTRIES)),
+            ttl_seconds=float(os.getenv('RECOMMENDATION_CACHE_TTL', DEFAULT_TTL_SECONDS)),
+        )
+
+    def bind_version(self, version: str) -> None:
+        """Invalidate the cache if the fund universe version changed"""
+        with self._lock:
+            if version != self._version:
+                if self._version is not None:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._version = version
+
+    def stats(self) -> dict:
+        return {**super().stats(), "invalidations": self.invalidations, "fund_universe_version": self._version}
@@ -0,0 +1,256 @@
+"""Nightly refresh of every stored assessment and recommendation.
+
+When the fund universe or the allocation rules change, stored
+recommendations go stale until each user asks again. This job regenerates
+them for the whole user base:
+
+- users are read in pages of ``chunk_size`` from one cursor sorted by
+  ``user_id`` (``UserRepository.pages``);
+- each chunk is scored and given a fresh recommendation in a worker process
+  (the vectorized risk engine, then ``EnhancedFinancialAdvisorAI``), with up
+  to two chunks per worker in flight while results are written. A profile
+  the engine cannot score fails only its own user, not the chunk;
+- results go back with unordered bulk writes: assessments are inserted with
+  an ``_id`` of ``<run id>:<user id>``, recommendation records are upserted
+  per user, so rewriting a chunk is harmless;
+- after each write the job checkpoints the last user of the longest run of
+  completed chunks, and the ids of users that failed. A run that stops part
+  way resumes from there with the same run id, retrying its failed users
+  first; a finished run starts a new one.
+
+Workers build their own advisor from the environment (``advisor``), without
+importing the app.
+
+Run it from the backend directory:
+
+    python refresh_recommendations.py --chunk-size 1000 --workers 4
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from database import Database, MongoSettings
+from risk_assessment import USER_PROFILE_FIELDS, assessment_document
+from risk_engine import analyze_profiles
+
+JOB_NAME = "refresh_recommendations"
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_WORKERS = max(1, (multiprocessing.cpu_count() or 2) - 1)
+LOG_EVERY_SECONDS = 10.0
+# Failed user ids kept in the checkpoint document; failures past this are only counted
+MAX_RECORDED_FAILURES = 10000
+
+logger = logging.getLogger("investwise.refresh")
+
+_advisor = None
+
+
+def _init_worker() -> None:
+    """Load the advisor (and its fund data) once per worker process"""
+    global _advisor
+    from advisor import advisor_from_env
+    _advisor = advisor_from_env()
+
+
+async def _recommend(users: List[dict], analyses: List[dict], now: datetime) -> Tuple[list, list]:
+    records, failed = [], []
+    for user, analysis in zip(users, analyses):
+        try:
+            recommendations = await _advisor.generate_investment_recommendations(user, analysis, sections=())
+            record = _advisor.recommendation_record(
+                user["user_id"], recommendations, _advisor.recommendation_parameters(user, analysis)
+            )
+            record["created_at"] = now
+            records.append(record)
+        except Exception as e:
+            failed.append((user["user_id"], str(e)))
+    return records, failed
+
+
+def _analyze(users: List[dict]) -> Tuple[List[dict], List[dict], list]:
+    """Users that could be scored, their analyses, and (user_id, error) for the ones that could not"""
+    try:
+        return users, analyze_profiles(users), []
+    except Exception:
+        # One malformed profile fails the whole vectorized batch; score users one by one instead
+        scored, analyses, failed = [], [], []
+        for user in users:
+            try:
+                analyses.extend(analyze_profiles([user]))
+                scored.append(user)
+            except Exception as e:
+                failed.append((user["user_id"], str(e)))
+        return scored, analyses, failed
+
+
+def refresh_chunk(users: List[dict], run_id: str, now: datetime) -> Tuple[list, list, list]:
+    """Assessments, recommendation records and (user_id, error) failures for a chunk of users"""
+    users, analyses, unscored = _analyze(users)
+    records, failed = asyncio.run(_recommend(users, analyses, now))
+    assessments = [
+        {"_id": f"{run_id}:{user['user_id']}", **assessment_document(user["user_id"], analysis, now)}
+        for user, analysis in zip(users, analyses)
+    ]
+    return assessments, records, unscored + failed
+
+
+async def _write_chunk(database: Database, assessments: list, records: list, failures: list) -> List[str]:
+    """Store a chunk's results; returns the ids of users whose refresh or writes failed"""
+    assessment_errors = await database.assessments.add_many_once(assessments)
+    record_errors = await database.recommendations.upsert_many(records)
+    for user_id, error in failures:
+        logger.warning("Refresh of %s failed: %s", user_id, error)
+    failed = {user_id for user_id, _ in failures}
+    failed.update(assessments[i]["user_id"] for i in assessment_errors)
+    failed.update(records[i]["user_id"] for i in record_errors)
+    return sorted(failed)
+
+
+def _executor(workers: int) -> Executor:
+    if workers == 0:
+        # In-process, for small runs and tests
+        return ThreadPoolExecutor(max_workers=1, initializer=_init_worker)
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+    )
+
+
+async def refresh_all(
+    database: Database,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = DEFAULT_WORKERS,
+    restart: bool = False,
+    limit: Optional[int] = None,
+) -> dict:
+    """Regenerate assessments and recommendations for every user; returns run statistics
+
+    ``limit`` stops after about that many users (whole chunks), leaving the
+    checkpoint for the next run to resume from.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    checkpoint = await database.job_checkpoints.get(JOB_NAME)
+    if restart or not checkpoint or checkpoint.get("completed"):
+        checkpoint = {"run_id": uuid.uuid4().hex[:12], "started_at": datetime.now(), "last_user_id": None,
+                      "processed": 0, "failed": 0, "failed_user_ids": [], "completed": False}
+        await database.job_checkpoints.save(JOB_NAME, checkpoint)
+    resumed_from = checkpoint["last_user_id"]
+    run_id = checkpoint["run_id"]
+    now = datetime.now()
+    failed_user_ids = set(checkpoint.get("failed_user_ids", []))
+
+    def record_failures(user_ids: List[str]) -> None:
+        """Remember failed users for the next resume, up to MAX_RECORDED_FAILURES"""
+        room = max(MAX_RECORDED_FAILURES - len(failed_user_ids), 0)
+        failed_user_ids.update([user_id for user_id in user_ids if user_id not in failed_user_ids][:room])
+        checkpoint["failed_user_ids"] = sorted(failed_user_ids)
+
+    projection = {"_id": 0, "user_id": 1, **{field: 1 for field in USER_PROFILE_FIELDS}}
+    pages = database.users.pages(chunk_size, after=resumed_from, projection=projection)
+
+    loop = asyncio.get_running_loop()
+    max_in_flight = max(1, workers) * 2
+    in_flight = {}          # future -> (chunk number, last user id, size)
+    completed = {}          # chunk number -> last user id, for chunks past the watermark
+    watermark = 0           # chunks below this number are all written
+    issued = read = processed = failed = retried = 0
+    exhausted = False
+    started = last_log = time.perf_counter()
+
+    with _executor(workers) as executor:
+        # Users that failed before the run stopped are retried first
+        retry = sorted(failed_user_ids)
+        for start in range(0, len(retry), chunk_size):
+            batch = retry[start:start + chunk_size]
+            chunk = await database.users.find_many(batch, projection)
+            still_failing = []
+            if chunk:
+                results = await loop.run_in_executor(executor, refresh_chunk, chunk, run_id, now)
+                still_failing = await _write_chunk(database, *results)
+            failed_user_ids.difference_update(batch)
+            record_failures(still_failing)
+            checkpoint["failed"] -= len(batch) - len(still_failing)
+            retried += len(chunk)
+            checkpoint["updated_at"] = datetime.now()
+            await database.job_checkpoints.save(JOB_NAME, checkpoint)
+
+        while True:
+            while not exhausted and len(in_flight) < max_in_flight and (limit is None or read < limit):
+                chunk = await anext(pages, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                future = loop.run_in_executor(executor, refresh_chunk, chunk, run_id, now)
+                in_flight[future] = (issued, chunk[-1]["user_id"], len(chunk))
+                issued += 1
+                read += len(chunk)
+            if not in_flight:
+                break
+
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                number, last_user_id, size = in_flight.pop(future)
+                chunk_failures = await _write_chunk(database, *future.result())
+                record_failures(chunk_failures)
+                processed += size
+                failed += len(chunk_failures)
+
+                completed[number] = last_user_id
+                while watermark in completed:
+                    checkpoint["last_user_id"] = completed.pop(watermark)
+                    watermark += 1
+                checkpoint["processed"] += size
+                checkpoint["failed"] += len(chunk_failures)
+                checkpoint["updated_at"] = datetime.now()
+                await database.job_checkpoints.save(JOB_NAME, checkpoint)
+
+            if time.perf_counter() - last_log >= LOG_EVERY_SECONDS:
+                last_log = time.perf_counter()
+                logger.info("Refreshed %d users (%.0f users/sec)", processed, processed / (last_log - started))
+
+    await pages.aclose()
+    elapsed = time.perf_counter() - started
+    checkpoint["completed"] = exhausted
+    await database.job_checkpoints.save(JOB_NAME, checkpoint)
+    return {
+        "run_id": run_id,
+        "resumed_from": resumed_from,
+        "processed": processed,
+        "failed": failed,
+        "retried": retried,
+        "still_failing": len(failed_user_ids),
+        "completed": exhausted,
+        "elapsed_seconds": round(elapsed, 3),
+        "users_per_second": round(processed / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description="Regenerate every stored assessment and recommendation")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="worker processes; 0 runs in-process")
+    parser.add_argument("--restart", action="store_true", help="ignore an unfinished run's checkpoint")
+    parser.add_argument("--limit", type=int, default=None, help="stop after about this many users")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    database = Database.from_settings(MongoSettings.from_env())
+    try:
+        summary = asyncio.run(refresh_all(database, args.chunk_size, args.workers, args.restart, args.limit))
+    finally:
+        database.close()
+    print(json.dumps(summary, default=str))
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""Templates for the recommendation report sections.
+
+The markdown sections of a recommendation used to be rebuilt with ``+=`` on
+every request even though most of their text never changes. Here each
+template is split into literal text and fields once at import, so rendering
+only formats the values, and sections are split by what they depend on:
+
+- the investment strategy is the same for everyone and is a single constant;
+- tax notes depend on two flags and are rendered once per variant;
+- risk mitigation depends on the bias set and risk band and is memoized;
+- the rationale's bias notes and portfolio lines depend only on the biases
+  and allocation and are memoized; only its profile header quotes the user,
+  and it is a plain f-string since it is rendered on every request;
+- expected returns depend only on allocation, risk score and timeline, and
+  the advisor memoizes the section on those.
+
+The output is character-for-character what the old f-string builders produced.
+"""
+
+from functools import lru_cache
+from string import Formatter
+from typing import Iterable, List, Tuple
+
+
+class Template:
+    """A format string parsed once into literal text and plain-name fields
+
+    Rendering joins the literals with ``format(value, spec)`` for each field:
+    fields can only be looked up and formatted, never evaluated, and the
+    source is not parsed again.
+    """
+
+    __slots__ = ('source', 'fields', '_parts')
+
+    def __init__(self, source: str):
+        self.source = source
+        parts = []
+        for literal, field, spec, conversion in Formatter().parse(source):
+            if field is not None and (not field.isidentifier() or conversion or '{' in spec):
+                raise ValueError(f"Template fields must be plain names with a literal format spec: {field!r}")
+            parts.append((literal, field, spec))
+        self._parts = tuple(parts)
+        self.fields = tuple(dict.fromkeys(field for _, field, _ in parts if field is not None))
+
+    def render(self, **values) -> str:
+        return "".join([
+            literal if field is None else literal + format(values[field], spec)
+            for literal, field, spec in self._parts
+        ])
+
+
+def age_advantage(age: int) -> str:
+    """Get age-based investment advantage"""
+    if age < 25:
+        return "Maximum time for compounding"
+    elif age < 35:
+        return "Strong compounding advantage"
+    elif age < 45:
+        return "Good wealth building phase"
+    elif age < 55:
+        return "Wealth consolidation phase"
+    else:
+        return "Wealth preservation phase"
+
+
+def investment_horizon(age: int) -> Tuple[str, str]:
+    """Horizon length and what it allows, as quoted in the rationale"""
+    if age < 40:
+        return "long", "higher growth potential"
+    if age < 55:
+        return "moderate", "balanced growth with stability"
+    return "short", "capital preservation focus"
+
+
+# Rationale
+def _rationale_head(name: str, age: int, income: float, profile: str, personality: str) -> str:
+    """Profile header of the rationale, the only part quoting the user; rendered on every request"""
+    horizon, horizon_focus = investment_horizon(age)
+    return f"""
+        **Personalized Investment Strategy for {name}**
+
+        **Your Profile Analysis:**
+        - Age: {age} years ({age_advantage(age)})
+        - Risk Profile: {profile}
+        - Investment Personality: {personality}
+        - Annual Income: ₹{income:,}
+
+        **Why This Allocation Works:**
+
+        🎯 **Age-Appropriate Strategy**: At {age}, you have a {horizon} investment horizon, allowing for {horizon_focus}.
+
+        💡 **Behavioral Considerations**: 
+        """
+
+
+BIAS_RATIONALE = {
+    'loss_aversion': "- Your conservative approach is balanced with growth assets to beat inflation while preserving capital.\n",
+    'overconfidence_bias': "- Diversified approach prevents over-concentration and emotional decision-making.\n",
+    'herding_behavior': "- Systematic investment approach helps avoid market timing and crowd psychology.\n",
+    'sector_bias': "- Multi-sector diversification reduces concentration risk in your familiar sectors.\n",
+}
+RATIONALE_PORTFOLIO_HEADER = """
+        📊 **Portfolio Rationale**:
+        """
+ALLOCATION_RATIONALE = (
+    ('large_cap', Template("- **Large Cap ({percentage}%)**: Provides stability and consistent returns from established companies.\n")),
+    ('mid_cap', Template("- **Mid Cap ({percentage}%)**: Captures growth potential of emerging companies with higher returns.\n")),
+    ('small_cap', Template("- **Small Cap ({percentage}%)**: High growth potential for long-term wealth creation.\n")),
+    ('debt', Template("- **Debt Funds ({percentage}%)**: Provides stability, regular income, and reduces overall portfolio volatility.\n")),
+    ('hybrid', Template("- **Hybrid Funds ({percentage}%)**: Balanced approach with automatic rebalancing between equity and debt.\n")),
+    ('international', Template("- **International Funds ({percentage}%)**: Global diversification and currency hedging.\n")),
+)
+RATIONALE_FOOTER = """
+        🇮🇳 **Indian Market Context**: This allocation considers Indian market cycles, monsoon impact, budget announcements, and festival season volatility.
+        """
+
+
+@lru_cache(maxsize=4096)
+def _rationale_body(biases: Tuple[str, ...], percentages: Tuple[int, ...]) -> str:
+    """Bias notes, portfolio lines and footer: shared by every user with the same biases and allocation"""
+    parts = [BIAS_RATIONALE[bias] for bias in biases if bias in BIAS_RATIONALE]
+    parts.append(RATIONALE_PORTFOLIO_HEADER)
+    for (_, template), percentage in zip(ALLOCATION_RATIONALE, percentages):
+        if percentage > 0:
+            parts.append(template.render(percentage=percentage))
+    parts.append(RATIONALE_FOOTER)
+    return "".join(parts)
+
+
+def render_rationale(name: str, age: int, income: float, profile: str, personality: str,
+                     biases: Iterable[str], allocation: dict) -> str:
+    head = _rationale_head(name, age, income, profile, personality)
+    percentages = tuple(allocation.get(category, 0) for category, _ in ALLOCATION_RATIONALE)
+    return head + _rationale_body(tuple(biases), percentages)
+
+
+# Risk mitigation
+UNIVERSAL_STRATEGIES = (
+    "🎯 **SIP Strategy**: Invest through Systematic Investment Plans to average out market volatility",
+    "⏰ **Time Diversification**: Stay invested for at least 5-7 years to ride out market cycles",
+    "🔄 **Regular Rebalancing**: Review and rebalance portfolio annually or when allocation drifts by 5%",
+)
+BIAS_STRATEGIES = (
+    ('loss_aversion', (
+        "💪 **Confidence Building**: Start with conservative allocation and gradually increase risk as comfort grows",
+        "📈 **Focus on Long-term**: Avoid checking portfolio daily; review monthly or quarterly",
+    )),
+    ('overconfidence_bias', (
+        "🎓 **Continuous Learning**: Stay updated with market research but avoid frequent changes",
+        "📊 **Stick to Plan**: Resist urge to time the market or chase hot funds",
+    )),
+    ('herding_behavior', (
+        "🧠 **Independent Thinking**: Make decisions based on your goals, not market noise",
+        "📰 **Limit Media Exposure**: Reduce consumption of daily market news and tips",
+    )),
+    ('sector_bias', (
+        "🌐 **Diversification**: Maintain exposure across different sectors and market caps",
+        "🔍 **Fund Selection**: Choose funds with diverse holdings across sectors",
+    )),
+)
+# Risk band (0: score <= 3, 1: middle, 2: score >= 8) -> extra strategies
+RISK_BAND_STRATEGIES = (
+    (
+        "🛡️ **Emergency Fund**: Maintain 6-12 months of expenses in liquid funds",
+        "📋 **Asset Allocation**: Maintain 60-70% in low-risk instruments initially",
+    ),
+    (),
+    (
+        "⚖️ **Risk Management**: Never invest more than 10% in any single fund",
+        "💰 **Profit Booking**: Book profits when equity allocation exceeds target by 10%",
+    ),
+)
+INDIAN_MARKET_STRATEGIES = (
+    "🇮🇳 **Indian Market Cycles**: Understand and prepare for budget, monsoon, and festival impacts",
+    "💸 **Tax Planning**: Optimize investments for tax efficiency under Indian tax laws",
+    "🏛️ **Regulatory Awareness**: Stay informed about SEBI regulations and fund changes",
+)
+
+
+def risk_band(risk_score: int) -> int:
+    if risk_score <= 3:
+        return 0
+    if risk_score >= 8:
+        return 2
+    return 1
+
+
+@lru_cache(maxsize=None)
+def _risk_mitigation(present: Tuple[bool, ...], band: int) -> str:
+    strategies: List[str] = list(UNIVERSAL_STRATEGIES)
+    for (_, lines), included in zip(BIAS_STRATEGIES, present):
+        if included:
+            strategies.extend(lines)
+    strategies.extend(RISK_BAND_STRATEGIES[band])
+    strategies.extend(INDIAN_MARKET_STRATEGIES)
+    return "\n".join(strategies)
+
+
+def render_risk_mitigation(biases: Iterable[str], risk_score: int) -> str:
+    biases = set(biases)
+    return _risk_mitigation(tuple(bias in biases for bias, _ in BIAS_STRATEGIES), risk_band(risk_score))
+
+
+# Expected returns
+EXPECTED_RETURNS_TEMPLATE = Template("""
+        **Expected Returns (Indian Market Context):**
+        
+        📊 **Annual Returns**: {lower_range:.1f}% - {upper_range:.1f}%
+        📈 **Average Expected**: {weighted_return:.1f}%
+        
+        **Growth Projections:**
+        - **5 Years**: ₹10,000 SIP → ₹{sip_5y:,.0f}
+        - **10 Years**: ₹10,000 SIP → ₹{sip_10y:,.0f}
+        - **15 Years**: ₹10,000 SIP → ₹{sip_15y:,.0f}
+        
+        **Important Notes:**
+        - Returns are subject to market risks and past performance doesn't guarantee future results
+        - Consider inflation (avg. 6% in India) when evaluating real returns
+        - Actual returns may vary based on market conditions and fund performance
+        """)
+
+
+def render_expected_returns(lower_range: float, upper_range: float, weighted_return: float,
+                            sip_5y: float, sip_10y: float, sip_15y: float) -> str:
+    """``sip_*`` are the values of a ₹10,000 monthly SIP after 5, 10 and 15 years"""
+    return EXPECTED_RETURNS_TEMPLATE.render(
+        lower_range=lower_range, upper_range=upper_range, weighted_return=weighted_return,
+        sip_5y=sip_5y, sip_10y=sip_10y, sip_15y=sip_15y,
+    )
+
+
+# Tax implications
+TAX_HEAD = """
+        **Tax Implications (Indian Tax Laws):**
+        
+        📋 **Equity Funds Taxation**:
+        - **Short-term** (< 1 year): 15% tax on gains
+        - **Long-term** (> 1 year): 10% tax on gains above ₹1 lakh annually
+        
+        📋 **Debt Funds Taxation**:
+        - **Short-term** (< 3 years): Added to income, taxed as per slab
+        - **Long-term** (> 3 years): 20% with indexation benefit
+        
+        📋 **Tax-Saving Opportunities**:
+        """
+TAX_TAIL = """
+        - **SIP Benefits**: No TDS on SIP investments
+        - **Dividend Tax**: Dividend income taxed as per income slab
+        
+        💡 **Tax Planning Tips**:
+        - Hold equity funds for >1 year to get long-term capital gains benefit
+        - Use debt funds for tax-efficient income generation
+        - Plan withdrawals after retirement for lower tax brackets
+        """
+ELSS_NOTE = "- **ELSS Funds**: ₹1.5 lakh tax deduction under Section 80C\n"
+TAX_HARVESTING_NOTE = "- **Tax Harvesting**: Book losses to offset gains\n"
+# (has a tax goal, income above 10 lakh) -> section text
+TAX_IMPLICATIONS = {
+    (tax_goal, high_income): "".join(
+        [TAX_HEAD] + [ELSS_NOTE] * tax_goal + [TAX_HARVESTING_NOTE] * high_income + [TAX_TAIL]
+    )
+    for tax_goal in (False, True)
+    for high_income in (False, True)
+}
+
+
+def render_tax_implications(goals: Iterable[str], income: float) -> str:
+    return TAX_IMPLICATIONS[('tax' in goals, income > 1000000)]
+
+
+# Investment strategy: identical for every user
+INVESTMENT_STRATEGY = """
+        **Your Personalized Investment Strategy:**
+        
+        🎯 **Phase 1: Foundation Building (Months 1-6)**
+        - Start with conservative allocation to build confidence
+        - Focus on large-cap and hybrid funds
+        - Establish emergency fund (6 months expenses)
+        
+        🚀 **Phase 2: Growth Acceleration (Months 7-24)**
+        - Gradually increase mid-cap allocation
+        - Add international diversification
+        - Increase SIP amounts with salary increments
+        
+        📈 **Phase 3: Wealth Optimization (Years 2+)**
+        - Fine-tune allocation based on performance
+        - Add small-cap funds for higher growth
+        - Regular portfolio rebalancing
+        
+        🔄 **Ongoing Strategy**:
+        - Review portfolio quarterly
+        - Rebalance annually or when allocation drifts >5%
+        - Step-up SIP by 10% annually
+        - Stay disciplined during market volatility
+        """
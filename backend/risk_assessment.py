@@ -0,0 +1,120 @@
+"""Risk assessment persistence and the bulk-onboarding batch path.
+
+``assess_batch`` scores thousands of users in one call: stored users are
+fetched with a single ``$in`` query, inline profiles are onboarded as new
+users, everyone is scored in one vectorized pass by ``risk_engine``, and
+every resulting assessment is written with one unordered bulk insert so
+one bad document does not abort the rest of the batch.
+"""
+
+import asyncio
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from risk_engine import analyze_profiles
+
+MAX_BATCH_SIZE = 20000
+
+
+class BatchTooLargeError(Exception):
+    """A batch has more than MAX_BATCH_SIZE items"""
+
+# Profile fields persisted on a user document, matching /api/user-profile
+USER_PROFILE_FIELDS = (
+    "name",
+    "age",
+    "occupation",
+    "income",
+    "current_savings",
+    "investment_experience",
+    "risk_tolerance",
+    "financial_goals",
+    "investment_timeline",
+)
+
+
+def assessment_document(user_id: str, behavioral_analysis: dict, created_at: Optional[datetime] = None) -> dict:
+    """Build the stored assessment for a behavioral analysis"""
+    return {
+        "user_id": user_id,
+        "risk_score": behavioral_analysis['risk_score'],
+        "behavioral_profile": behavioral_analysis['behavioral_profile'],
+        "behavioral_biases": behavioral_analysis['behavioral_biases'],
+        "confidence_level": behavioral_analysis['confidence_level'],
+        "market_sentiment": behavioral_analysis['market_sentiment'],
+        "investment_personality": behavioral_analysis['investment_personality'],
+        "created_at": created_at or datetime.now(),
+    }
+
+
+async def score_profiles(profiles: List[dict]) -> List[dict]:
+    """Behavioral analysis for each profile, in input order, via the vectorized engine"""
+    return await asyncio.to_thread(analyze_profiles, profiles)
+
+
+async def assess_batch(database, user_ids: List[str] = (), profiles: List[dict] = ()) -> dict:
+    """Score stored users and inline profiles in one pass with one bulk write per collection
+
+    Results come back in input order (``user_ids`` first, then ``profiles``),
+    each tagged with its ``source``, position ``index`` and a ``status`` of
+    ``assessed``, ``not_found`` or ``failed``.
+    """
+    user_ids = list(user_ids)
+    profiles = list(profiles)
+    if len(user_ids) + len(profiles) > MAX_BATCH_SIZE:
+        raise BatchTooLargeError(f"Batch exceeds {MAX_BATCH_SIZE} items")
+
+    now = datetime.now()
+    stored = {}
+    if user_ids:
+        stored = {user['user_id']: user for user in await database.users.find_many(user_ids)}
+
+    results = []
+    to_score = []  # (result, user document)
+    for index, user_id in enumerate(user_ids):
+        result = {"source": "user_id", "index": index, "user_id": user_id}
+        results.append(result)
+        if user_id in stored:
+            to_score.append((result, stored[user_id]))
+        else:
+            result["status"] = "not_found"
+
+    new_users = []
+    for index, profile in enumerate(profiles):
+        user = {field: profile.get(field) for field in USER_PROFILE_FIELDS}
+        user["user_id"] = str(uuid.uuid4())
+        user["created_at"] = now
+        result = {"source": "profile", "index": index, "user_id": user["user_id"]}
+        results.append(result)
+        new_users.append((result, user))
+
+    user_errors = await database.users.create_many([user for _, user in new_users])
+    for position, (result, user) in enumerate(new_users):
+        if position in user_errors:
+            result.update(status="failed", error=user_errors[position])
+        else:
+            to_score.append((result, user))
+
+    analyses = await score_profiles([user for _, user in to_score])
+    documents = [
+        assessment_document(user["user_id"], analysis, now)
+        for (_, user), analysis in zip(to_score, analyses)
+    ]
+    assessment_errors = await database.assessments.add_many(documents)
+
+    for position, ((result, _), analysis) in enumerate(zip(to_score, analyses)):
+        if position in assessment_errors:
+            result.update(status="failed", error=assessment_errors[position])
+            continue
+        result.update(
+            status="assessed",
+            risk_score=analysis['risk_score'],
+            behavioral_profile=analysis['behavioral_profile'],
+            confidence_level=analysis['confidence_level'],
+        )
+
+    summary = {"assessed": 0, "not_found": 0, "failed": 0}
+    for result in results:
+        summary[result["status"]] += 1
+    return {"results": results, "summary": summary}
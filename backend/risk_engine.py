@@ -0,0 +1,282 @@
+"""Vectorized behavioral risk scoring.
+
+A columnar re-implementation of ``EnhancedFinancialAdvisorAI.analyze_behavioral_profile``
+for scoring many users at once. Profiles are encoded into NumPy arrays
+(age, income, experience code, occupation class flags, low-risk-tolerance
+flag, goal flags), and risk score, bias bitmask and confidence level are
+computed for all rows with array operations. Substring matching on
+``occupation`` happens once per distinct occupation string rather than once
+per user.
+
+The scalar path lists biases rule by rule, so a bias can appear more than
+once (e.g. ``overconfidence_bias`` from several rules). Each row records
+which rules fired as a bitmask in ``BIAS_RULES`` order, and ``rule_biases``
+expands it into exactly the scalar path's list. The bias bitmask, which
+records each bias once, is looked up from the rule mask.
+"""
+
+from dataclasses import dataclass
+from typing import Iterable, List
+
+import numpy as np
+
+# Bit i of a bias mask is BIASES[i]
+BIASES = (
+    "overconfidence_bias",
+    "herding_behavior",
+    "loss_aversion",
+    "status_quo_bias",
+    "sector_bias",
+    "recency_bias",
+    "fomo_bias",
+    "home_bias",
+    "small_numbers_bias",
+)
+BIAS_BITS = {name: np.uint16(1 << i) for i, name in enumerate(BIASES)}
+
+# Bit i of a rule mask is BIAS_RULES[i]: the biases one rule of
+# analyze_behavioral_profile appends, in the order it checks them
+BIAS_RULES = (
+    ("overconfidence_bias", "herding_behavior"),    # beginner
+    ("loss_aversion", "status_quo_bias"),           # low risk tolerance
+    ("sector_bias", "recency_bias"),                # tech occupation
+    ("overconfidence_bias",),                       # doctor or engineer
+    ("overconfidence_bias", "fomo_bias"),           # under 25
+    ("loss_aversion", "home_bias"),                 # over 45
+    ("small_numbers_bias",),                        # income under 5 lakh
+    ("overconfidence_bias",),                       # income over 20 lakh
+)
+
+
+def _rule_bias_masks() -> np.ndarray:
+    """Bias mask of every possible rule mask, for lookup by rule mask"""
+    rule_masks = np.arange(1 << len(BIAS_RULES))
+    masks = np.zeros(len(rule_masks), dtype=np.uint16)
+    for i, rule in enumerate(BIAS_RULES):
+        for bias in rule:
+            masks[(rule_masks & (1 << i)) != 0] |= BIAS_BITS[bias]
+    return masks
+
+
+RULE_BIAS_MASKS = _rule_bias_masks()
+
+EXPERIENCE_OTHER = 0
+EXPERIENCE_BEGINNER = 1
+EXPERIENCE_INTERMEDIATE = 2
+EXPERIENCE_EXPERIENCED = 3
+EXPERIENCE_CODES = {
+    'beginner': EXPERIENCE_BEGINNER,
+    'intermediate': EXPERIENCE_INTERMEDIATE,
+    'experienced': EXPERIENCE_EXPERIENCED,
+}
+
+# Occupation class flags (several can apply to one occupation)
+OCCUPATION_TECH = 1          # 'tech', 'software', 'it'
+OCCUPATION_PROFESSIONAL = 2  # 'doctor', 'engineer'
+OCCUPATION_ENTREPRENEUR = 4  # 'entrepreneur', 'business', 'trader'
+OCCUPATION_GOVERNMENT = 8    # 'government', 'teacher', 'clerk'
+OCCUPATION_TERMS = (
+    (OCCUPATION_TECH, ('tech', 'software', 'it')),
+    (OCCUPATION_PROFESSIONAL, ('doctor', 'engineer')),
+    (OCCUPATION_ENTREPRENEUR, ('entrepreneur', 'business', 'trader')),
+    (OCCUPATION_GOVERNMENT, ('government', 'teacher', 'clerk')),
+)
+
+GOAL_RETIREMENT = 1
+GOAL_EDUCATION = 2
+GOAL_WEALTH = 4
+GOAL_TAX = 8
+GOAL_CODES = {
+    'retirement': GOAL_RETIREMENT,
+    'education': GOAL_EDUCATION,
+    'wealth': GOAL_WEALTH,
+    'tax': GOAL_TAX,
+}
+
+CONFIDENCE_LEVELS = np.array(["low", "medium", "high"])
+BEHAVIORAL_PROFILES = np.array([
+    "Conservative Indian Investor",
+    "Moderate Indian Investor",
+    "Balanced Growth Investor",
+    "Aggressive Growth Investor",
+    "High-Risk Wealth Builder",
+])
+PROFILE_UPPER_BOUNDS = np.array([3, 5, 7, 8])
+
+
+def classify_occupation(occupation: str) -> int:
+    """Occupation class flags for one occupation string"""
+    occupation = (occupation or '').lower()
+    flags = 0
+    for flag, terms in OCCUPATION_TERMS:
+        if any(term in occupation for term in terms):
+            flags |= flag
+    return flags
+
+
+def classify_occupations(occupations: Iterable[str]) -> np.ndarray:
+    """Occupation class flags per row, classifying each distinct string once"""
+    classes = {}
+    flags = []
+    for occupation in occupations:
+        flag = classes.get(occupation)
+        if flag is None:
+            flag = classes[occupation] = classify_occupation(occupation)
+        flags.append(flag)
+    return np.array(flags, dtype=np.uint8)
+
+
+def _goal_mask(goals) -> int:
+    mask = 0
+    for goal in goals:
+        mask |= GOAL_CODES.get(goal, 0)
+    return mask
+
+
+@dataclass
+class ProfileColumns:
+    """Columnar profile batch; every array has one entry per user"""
+
+    age: np.ndarray
+    income: np.ndarray
+    experience: np.ndarray
+    occupation_class: np.ndarray
+    low_risk_tolerance: np.ndarray
+    goals: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.age)
+
+    @classmethod
+    def from_profiles(cls, profiles: List[dict]) -> "ProfileColumns":
+        """Encode profile dicts using the scalar path's defaults"""
+        n = len(profiles)
+        return cls(
+            age=np.fromiter((p.get('age', 30) for p in profiles), dtype=np.int64, count=n),
+            income=np.fromiter((p.get('income', 50000) for p in profiles), dtype=np.float64, count=n),
+            experience=np.fromiter(
+                (EXPERIENCE_CODES.get(p.get('investment_experience', 'beginner'), EXPERIENCE_OTHER)
+                 for p in profiles),
+                dtype=np.uint8, count=n,
+            ),
+            occupation_class=classify_occupations(p.get('occupation', '') for p in profiles),
+            low_risk_tolerance=np.fromiter(
+                (p.get('risk_tolerance') == 'low' for p in profiles), dtype=bool, count=n
+            ),
+            goals=np.fromiter((_goal_mask(p.get('financial_goals', [])) for p in profiles), dtype=np.uint8, count=n),
+        )
+
+
+@dataclass
+class RiskScores:
+    risk_score: np.ndarray   # int64, 1..10
+    bias_mask: np.ndarray    # uint16, bit i = BIASES[i]
+    rules: np.ndarray        # uint8, bit i = BIAS_RULES[i] fired
+    confidence: np.ndarray   # int8 index into CONFIDENCE_LEVELS
+
+
+def score(columns: ProfileColumns) -> RiskScores:
+    """Risk score, bias mask and confidence for every row"""
+    age = columns.age
+    income = columns.income
+    experience = columns.experience
+    occupation = columns.occupation_class
+    beginner = experience == EXPERIENCE_BEGINNER
+    tech = (occupation & OCCUPATION_TECH) != 0
+    professional = (occupation & OCCUPATION_PROFESSIONAL) != 0
+    entrepreneur = (occupation & OCCUPATION_ENTREPRENEUR) != 0
+    government = (occupation & OCCUPATION_GOVERNMENT) != 0
+
+    fired = (
+        beginner,
+        columns.low_risk_tolerance,
+        tech,
+        professional,
+        age < 25,
+        age > 45,
+        income < 500000,
+        income > 2000000,
+    )
+    rules = np.zeros(len(columns), dtype=np.uint8)
+    for i, condition in enumerate(fired):
+        rules |= condition.astype(np.uint8) << i
+    mask = RULE_BIAS_MASKS[rules]
+
+    risk = np.full(len(columns), 5, dtype=np.int64)
+    risk += np.select([age < 30, age < 40, age > 50], [2, 1, -1], 0)
+    risk += np.select([income > 1000000, income > 500000, income < 300000], [2, 1, -1], 0)
+    risk += np.select(
+        [experience == EXPERIENCE_EXPERIENCED, experience == EXPERIENCE_INTERMEDIATE, beginner],
+        [2, 1, -1],
+        0,
+    )
+    risk += np.select([entrepreneur, government], [2, -1], 0)
+    np.clip(risk, 1, 10, out=risk)
+
+    confidence = np.select(
+        [(risk >= 7) & ~beginner, (risk <= 3) | beginner],
+        [2, 0],
+        1,
+    ).astype(np.int8)
+    return RiskScores(risk_score=risk, bias_mask=mask, rules=rules, confidence=confidence)
+
+
+def decode_biases(mask: int) -> List[str]:
+    """Bias names set in a mask, in BIASES order"""
+    return [name for i, name in enumerate(BIASES) if mask & (1 << i)]
+
+
+def rule_biases(rules: int) -> List[str]:
+    """Biases of the fired rules in the scalar path's order, repeats included"""
+    return [bias for i, rule in enumerate(BIAS_RULES) if rules & (1 << i) for bias in rule]
+
+
+def analyze_profiles(profiles: List[dict]) -> List[dict]:
+    """Batch equivalent of analyze_behavioral_profile, one dict per profile"""
+    if not profiles:
+        return []
+    columns = ProfileColumns.from_profiles(profiles)
+    scores = score(columns)
+    risk = scores.risk_score
+    mask = scores.bias_mask
+    goals = columns.goals
+    age = columns.age
+
+    def has(bias):
+        return (mask & BIAS_BITS[bias]) != 0
+
+    sentiment = np.select(
+        [has("loss_aversion") & has("status_quo_bias"),
+         has("overconfidence_bias") & has("fomo_bias"),
+         risk >= 7],
+        ["Risk-averse and market-fearful",
+         "Overconfident and trend-following",
+         "Optimistic and growth-oriented"],
+        "Cautious and stability-seeking",
+    )
+    personality = np.select(
+        [((goals & GOAL_RETIREMENT) != 0) & (age > 40),
+         (goals & GOAL_EDUCATION) != 0,
+         ((goals & GOAL_WEALTH) != 0) & (risk >= 7),
+         (goals & GOAL_TAX) != 0],
+        ["Retirement Planner", "Family Goal Investor", "Wealth Creator", "Tax-Efficient Investor"],
+        "Goal-Based Investor",
+    )
+    profile_labels = BEHAVIORAL_PROFILES[np.searchsorted(PROFILE_UPPER_BOUNDS, risk, side='left')]
+    confidence = CONFIDENCE_LEVELS[scores.confidence]
+
+    decoded = {}
+    results = []
+    for i in range(len(profiles)):
+        fired = int(scores.rules[i])
+        if fired not in decoded:
+            decoded[fired] = rule_biases(fired)
+        results.append({
+            'risk_score': int(risk[i]),
+            'behavioral_biases': list(decoded[fired]),
+            'behavioral_profile': str(profile_labels[i]),
+            'confidence_level': str(confidence[i]),
+            'market_sentiment': str(sentiment[i]),
+            'investment_personality': str(personality[i]),
+        })
+    return results
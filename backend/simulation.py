@@ -0,0 +1,131 @@
+"""Monte Carlo simulation of monthly SIP paths.
+
+Category returns are modelled as correlated normal monthly returns and the
+portfolio is rebalanced to its target weights every month, so the portfolio's
+monthly return is itself normal with mean ``w·mu`` and variance ``w'Σw``. That
+lets the engine draw one return per path per month instead of one per
+category, and the SIP value of every path is computed with cumulative
+products and sums rather than a Python loop:
+
+    G_t = prod_{j<=t} (1 + r_j)          growth of one rupee invested at t=0
+    V_t = sip * G_t * sum_{k<=t} 1 / G_k
+
+which is the end-of-month contribution convention used by
+``_calculate_sip_value``.
+
+Paths are simulated in chunks of at most ``CHUNK_CELLS`` path-months, and
+only each path's year-end values and drawdown are kept, so memory stays
+bounded for the largest requests (``MAX_PATHS`` over ``MAX_YEARS`` would be
+30 million cells per array at once). Chunks draw from one generator in
+order, so a seed gives the same paths however they are chunked.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from market_assumptions import CATEGORIES, EXPECTED_RETURNS, allocation_weights, covariance_matrix
+
+DEFAULT_PATHS = 10000
+MAX_PATHS = 50000
+MAX_YEARS = 50
+PERCENTILES = (5, 50, 95)
+CHUNK_CELLS = 1_000_000         # path-months per chunk: about 8MB per working array
+
+
+@dataclass
+class SimulationResult:
+    years: List[int]
+    bands: Dict[str, List[float]]   # "p5"/"p50"/"p95" corpus at the end of each year
+    total_invested: List[float]
+    goal_probability: Optional[float]
+    max_drawdown: Dict[str, float]  # percentiles of per-path max drawdown, as fractions
+    expected_annual_return: float
+    annual_volatility: float
+    paths: int
+
+    def to_dict(self) -> dict:
+        return {
+            "years": self.years,
+            "percentile_bands": self.bands,
+            "total_invested": self.total_invested,
+            "goal_probability": self.goal_probability,
+            "max_drawdown": self.max_drawdown,
+            "expected_annual_return": self.expected_annual_return,
+            "annual_volatility": self.annual_volatility,
+            "paths": self.paths,
+        }
+
+
+def portfolio_monthly_moments(allocation: dict) -> tuple:
+    """Monthly mean and standard deviation of the rebalanced portfolio return"""
+    weights = allocation_weights(allocation)
+    annual = np.array([EXPECTED_RETURNS[c] for c in CATEGORIES]) / 100
+    monthly_mean = (1 + annual) ** (1 / 12) - 1
+    monthly_cov = covariance_matrix() / 12
+    return float(weights @ monthly_mean), float(np.sqrt(weights @ monthly_cov @ weights))
+
+
+def _simulate_chunk(rng, mean: float, std: float, paths: int, months: int, year_ends: np.ndarray) -> tuple:
+    """Year-end values of a one-rupee monthly SIP and max drawdowns for ``paths`` paths"""
+    # Floor returns at -99% so a growth factor can never reach zero
+    growth = 1 + np.maximum(rng.normal(mean, std, size=(paths, months)), -0.99)
+    np.cumprod(growth, axis=1, out=growth)
+
+    # A contribution made at the end of month k compounds by G_t / G_k
+    values = np.cumsum(1 / growth, axis=1)
+    values *= growth
+
+    # Drawdowns of the unit value (contributions excluded), peak includes the start
+    peak = np.maximum(np.maximum.accumulate(growth, axis=1), 1.0)
+    np.divide(growth, peak, out=peak)
+    return values[:, year_ends], 1 - np.minimum(peak.min(axis=1), 1.0)
+
+
+def simulate_sip(
+    allocation: dict,
+    monthly_sip: float,
+    years: int,
+    paths: int = DEFAULT_PATHS,
+    goal_corpus: Optional[float] = None,
+    seed: Optional[int] = None,
+) -> SimulationResult:
+    """Simulate ``paths`` monthly SIP paths over ``years`` for an allocation"""
+    if not 1 <= years <= MAX_YEARS:
+        raise ValueError(f"years must be between 1 and {MAX_YEARS}")
+    if not 1 <= paths <= MAX_PATHS:
+        raise ValueError(f"paths must be between 1 and {MAX_PATHS}")
+    if monthly_sip <= 0:
+        raise ValueError("monthly_sip must be positive")
+
+    mean, std = portfolio_monthly_moments(allocation)
+    months = years * 12
+    rng = np.random.default_rng(seed)
+    year_ends = np.arange(12, months + 1, 12) - 1
+    year_values = np.empty((paths, years))
+    drawdowns = np.empty(paths)
+    chunk = max(1, CHUNK_CELLS // months)
+    for start in range(0, paths, chunk):
+        stop = min(start + chunk, paths)
+        year_values[start:stop], drawdowns[start:stop] = _simulate_chunk(
+            rng, mean, std, stop - start, months, year_ends)
+    year_values *= monthly_sip
+
+    bands = np.percentile(year_values, PERCENTILES, axis=0)
+    drawdown_bands = np.percentile(drawdowns, PERCENTILES)
+
+    goal_probability = None
+    if goal_corpus is not None:
+        goal_probability = float((year_values[:, -1] >= goal_corpus).mean())
+
+    return SimulationResult(
+        years=list(range(1, years + 1)),
+        bands={f"p{p}": np.round(band, 2).tolist() for p, band in zip(PERCENTILES, bands)},
+        total_invested=[float(monthly_sip * 12 * y) for y in range(1, years + 1)],
+        goal_probability=goal_probability,
+        max_drawdown={f"p{p}": round(float(d), 4) for p, d in zip(PERCENTILES, drawdown_bands)},
+        expected_annual_return=round(((1 + mean) ** 12 - 1) * 100, 2),
+        annual_volatility=round(float(std * np.sqrt(12)) * 100, 2),
+        paths=paths,
+    )
@@ -201,7 +201,8 @@ function App() {
     setError('');
     
     try {
-      const response = await fetch(`${BACKEND_URL}/api/investment-recommendations?user_id=${userId}`, {
+      // Allocation and funds first; the text sections are fetched separately
+      const response = await fetch(`${BACKEND_URL}/api/investment-recommendations?user_id=${userId}&include=`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -214,6 +215,7 @@ function App() {
 
       const data = await response.json();
       setRecommendations(data);
+      loadRecommendationSections(data.recommendation_id);
       setLoadingProgress(100);
       setTimeout(() => {
         setLoading(false);
@@ -225,6 +227,23 @@ function App() {
     }
   };
 
+  const RECOMMENDATION_SECTIONS = ['rationale', 'risk_mitigation', 'expected_returns', 'tax_implications', 'investment_strategy'];
+
+  const loadRecommendationSections = (recommendationId) => {
+    RECOMMENDATION_SECTIONS.forEach(async (name) => {
+      try {
+        const response = await fetch(`${BACKEND_URL}/api/recommendations/${recommendationId}/sections/${name}`);
+        if (!response.ok) {
+          return;
+        }
+        const section = await response.json();
+        setRecommendations((current) => current && { ...current, [name]: section.content });
+      } catch (err) {
+        // The section card stays empty; the rest of the dashboard is unaffected
+      }
+    });
+  };
+
   const LoadingScreen = ({ message }) => (
     <div className="loading-screen">
       <div className="loading-container">
@@ -843,7 +862,7 @@ function App() {
               <div className="insight-card glass-card">
                 <h3>Why This Strategy Works for You</h3>
                 <div className="insight-content">
-                  {recommendations.rationale.split('\n').map((line, index) => (
+                  {(recommendations.rationale || '').split('\n').map((line, index) => (
                     line.trim() && <p key={index}>{line.trim()}</p>
                   ))}
                 </div>
@@ -852,7 +871,7 @@ function App() {
               <div className="insight-card glass-card">
                 <h3>Risk Management Strategy</h3>
                 <div className="insight-content">
-                  {recommendations.risk_mitigation.split('\n').map((line, index) => (
+                  {(recommendations.risk_mitigation || '').split('\n').map((line, index) => (
                     line.trim() && <p key={index}>{line.trim()}</p>
                   ))}
                 </div>
@@ -861,7 +880,7 @@ function App() {
               <div className="insight-card glass-card returns">
                 <h3>Expected Returns & Growth</h3>
                 <div className="returns-content">
-                  {recommendations.expected_returns.split('\n').map((line, index) => (
+                  {(recommendations.expected_returns || '').split('\n').map((line, index) => (
                     line.trim() && <p key={index}>{line.trim()}</p>
                   ))}
                 </div>
@@ -870,7 +889,7 @@ function App() {
               <div className="insight-card glass-card">
                 <h3>Tax Implications</h3>
                 <div className="insight-content">
-                  {recommendations.tax_implications.split('\n').map((line, index) => (
+                  {(recommendations.tax_implications || '').split('\n').map((line, index) => (
                     line.trim() && <p key={index}>{line.trim()}</p>
                   ))}
                 </div>
@@ -879,7 +898,7 @@ function App() {
               <div className="insight-card glass-card">
                 <h3>Investment Strategy</h3>
                 <div className="insight-content">
-                  {recommendations.investment_strategy.split('\n').map((line, index) => (
+                  {(recommendations.investment_strategy || '').split('\n').map((line, index) => (
                     line.trim() && <p key={index}>{line.trim()}</p>
                   ))}
                 </div>
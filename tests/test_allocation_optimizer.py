@@ -0,0 +1,139 @@
+import random
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from allocation_optimizer import (  # noqa: E402
+    AGE_BAND_BOUNDS,
+    RISK_BAND_BOUNDS,
+    AllocationTable,
+    bounds_for,
+    risk_band,
+    solve,
+    to_percentages,
+)
+from market_assumptions import CATEGORIES, allocation_weights, covariance_matrix  # noqa: E402
+
+PROFILES = [(band, retirement, tax) for band in AGE_BAND_BOUNDS for retirement in (False, True) for tax in (False, True)]
+AGES = {0: 25, 1: 40, 2: 60}
+
+
+@pytest.fixture(scope="module")
+def table():
+    return AllocationTable()
+
+
+def goals_for(retirement, tax):
+    return ["wealth"] + (["retirement"] if retirement else []) + (["tax"] if tax else [])
+
+
+def volatility(table, allocation):
+    weights = allocation_weights(allocation)
+    return float(np.sqrt(weights @ table.sigma @ weights))
+
+
+def test_every_allocation_sums_to_100_within_bounds(table):
+    for band, retirement, tax in PROFILES:
+        previous = 0.0
+        for score in range(1, 11):
+            lower, upper = bounds_for(band, retirement, tax, risk_band(score))
+            allocation = table.allocation(score, AGES[band], goals_for(retirement, tax))
+            assert sum(allocation.values()) == 100
+            assert all(isinstance(p, int) and p > 0 for p in allocation.values())
+            percentages = np.array([allocation.get(c, 0) for c in CATEGORIES])
+            # Rounding to whole percentages moves a weight by at most one point
+            assert (percentages >= lower * 100 - 1).all() and (percentages <= upper * 100 + 1).all()
+            risk = volatility(table, allocation)
+            assert risk >= previous - 0.002
+            previous = risk
+        if tax:
+            assert allocation["elss"] == 15
+        if band == 2:
+            assert allocation["debt"] >= 25
+
+
+def test_small_caps_rise_with_the_score_and_stay_capped_when_conservative(table):
+    for band, retirement, tax in PROFILES:
+        allocations = [table.allocation(score, AGES[band], goals_for(retirement, tax)) for score in range(1, 11)]
+        small_caps = [allocation.get("small_cap", 0) for allocation in allocations]
+        assert small_caps == sorted(small_caps)
+        for score, allocation in zip(range(1, 11), allocations):
+            if score <= 3:
+                assert allocation.get("small_cap", 0) <= 5 and allocation.get("mid_cap", 0) <= 5
+                assert allocation["large_cap"] >= 30 - 1
+            elif score <= 5:
+                assert allocation.get("small_cap", 0) <= 10 and allocation["large_cap"] >= 25 - 1
+    # A young conservative investor holds mostly large caps and debt
+    young = table.allocation(3, 25, [])
+    assert young["large_cap"] + young["debt"] >= 80 and young["large_cap"] > young.get("small_cap", 0)
+    assert [risk_band(score) for score in range(1, 11)] == [3, 3, 3, 5, 5, 7, 7, 10, 10, 10]
+    assert max(RISK_BAND_BOUNDS) == 10
+
+
+def random_feasible(rng, lower, upper, count):
+    samples = np.repeat(lower[None, :], count, axis=0)
+    for sample in samples:
+        remaining = 1 - sample.sum()
+        for i in rng.permutation(len(lower)):
+            add = min(upper[i] - sample[i], remaining * rng.random())
+            sample[i] += add
+            remaining -= add
+        for i in rng.permutation(len(lower)):
+            add = min(upper[i] - sample[i], remaining)
+            sample[i] += add
+            remaining -= add
+    return samples
+
+
+def test_frontier_is_efficient(table):
+    rng = np.random.default_rng(23)
+    for profile, frontier in table.frontiers.items():
+        assert (np.diff(frontier.volatility) > 0).all() and (np.diff(frontier.returns) > 0).all()
+        lower, upper = bounds_for(*profile)
+        samples = random_feasible(rng, lower, upper, 2000)
+        assert np.allclose(samples.sum(axis=1), 1)
+        sample_returns = samples @ table.mu
+        sample_risk = np.sqrt(np.einsum('pi,ij,pj->p', samples, table.sigma, samples))
+        inside = sample_risk <= frontier.volatility[-1]
+        best = np.interp(sample_risk[inside], frontier.volatility, frontier.returns)
+        # No feasible portfolio earns more at the same risk
+        assert (sample_returns[inside] <= best + 1e-4).all()
+        assert sample_risk.min() >= frontier.volatility[0] - 1e-9
+
+
+def test_solver_optimality_conditions():
+    mu = np.array([0.12, 0.15, 0.18, 0.075, 0.10, 0.11, 0.13])
+    sigma = covariance_matrix()
+    lower, upper = bounds_for(1, False, True)
+    weights = solve(mu, sigma, 4.0, lower, upper)
+    objective = mu @ weights - 2.0 * weights @ sigma @ weights
+    rng = np.random.default_rng(5)
+    for sample in random_feasible(rng, lower, upper, 2000):
+        assert mu @ sample - 2.0 * sample @ sigma @ sample <= objective + 1e-12
+
+
+def test_largest_remainder_rounding():
+    assert to_percentages(np.array([1, 1, 1, 0, 0, 0, 0]) / 3) == {'large_cap': 34, 'mid_cap': 33, 'small_cap': 33}
+    rng = np.random.default_rng(1)
+    for weights in rng.dirichlet(np.ones(len(CATEGORIES)), 1000):
+        assert sum(to_percentages(weights).values()) == 100
+
+
+def test_advisor_allocations_sum_to_100_and_are_lookups():
+    server = pytest.importorskip("server")
+    rng = random.Random(23)
+    profiles = [
+        (rng.randint(1, 10), rng.randint(18, 80), rng.sample(["retirement", "tax", "house", "education"], rng.randint(0, 3)))
+        for _ in range(5000)
+    ]
+    start = time.perf_counter()
+    allocations = [server.ai_advisor._calculate_optimal_allocation(score, age, 1e6, goals, "5-10 years")
+                   for score, age, goals in profiles]
+    elapsed = time.perf_counter() - start
+    assert elapsed / len(profiles) < 50e-6
+    assert all(sum(allocation.values()) == 100 for allocation in allocations)
+    # Callers may modify what they get
+    allocations[0]["debt"] = 1000
+    assert server.ai_advisor._calculate_optimal_allocation(*profiles[0][:2], 1e6, profiles[0][2], "") != allocations[0]
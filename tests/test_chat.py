@@ -0,0 +1,254 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from chat import ChatMemory, ChatMemorySettings, ExtractiveSummarizer, estimate_tokens, stream_reply, trim_to_tokens
+from llm import LocalAdvisorModel, OpenAIChatClient, client_from_env
+from llm_gateway import LLMGateway
+
+mongomock = pytest.importorskip("mongomock")
+server = pytest.importorskip("server")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from database import Database  # noqa: E402
+
+
+def parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event = "message"
+        for line in block.split("\n"):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((event, json.loads(line[len("data: "):])))
+    return events
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = Database(mongomock.MongoClient(), "investwise_test", executor_workers=2)
+    database.db.users.insert_one({
+        "user_id": "u1", "name": "Asha", "age": 31, "occupation": "engineer", "income": 1800000,
+        "current_savings": 400000, "investment_experience": "intermediate", "risk_tolerance": "moderate",
+        "financial_goals": ["retirement"], "investment_timeline": "long_term",
+    })
+    monkeypatch.setattr(server, "database", database)
+    monkeypatch.setattr(server, "llm_gateway", LLMGateway(LocalAdvisorModel()))
+    yield database
+    database.close()
+
+
+def test_local_model_is_deterministic():
+    model = LocalAdvisorModel()
+    messages = [{"role": "user", "content": "Should I keep my SIP going?"}]
+    first = asyncio.run(model.complete(messages))
+    assert first == asyncio.run(model.complete(messages))
+    assert first == model.reply_for(messages)
+    assert "SIP" in first
+
+
+def test_chat_route_streams_tokens_and_stores_exchange(database):
+    client = TestClient(server.app)
+    payload = {"user_id": "u1", "session_id": "s1", "message": "How do I save tax?"}
+    with client.stream("POST", "/api/chat", json=payload) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_events(response.read().decode())
+
+    tokens = [data["token"] for event, data in events if event == "message"]
+    expected = LocalAdvisorModel().reply_for([{"role": "user", "content": payload["message"]}])
+    assert len(tokens) > 1
+    assert "".join(tokens) == expected
+    assert events[-1][0] == "done"
+
+    stored = list(database.db.chat_messages.find({"session_id": "s1"}, sort=[("seq", 1)]))
+    assert [(m["seq"], m["role"]) for m in stored] == [(1, "user"), (2, "assistant")]
+    assert stored[1]["content"] == expected
+    assert events[-1][1]["seq"] == 2
+
+    # The next turn sees the earlier exchange
+    memory = ChatMemory(database, ExtractiveSummarizer())
+    messages = asyncio.run(memory.prompt("s1", server.ai_advisor.system_message, None, "And retirement?"))
+    assert [m["role"] for m in messages] == ["system", "user", "assistant", "user"]
+
+
+def test_chat_route_unknown_user(database):
+    response = TestClient(server.app).post(
+        "/api/chat", json={"user_id": "missing", "session_id": "s1", "message": "hi"}
+    )
+    assert response.status_code == 404
+
+
+def test_chat_route_rejects_another_users_session(database):
+    database.db.users.insert_one(dict(database.db.users.find_one({"user_id": "u1"}, {"_id": 0}), user_id="u2"))
+    client = TestClient(server.app)
+    with client.stream("POST", "/api/chat", json={"user_id": "u1", "session_id": "s1", "message": "hi"}) as response:
+        response.read()
+    response = client.post("/api/chat", json={"user_id": "u2", "session_id": "s1", "message": "What did I ask?"})
+    assert response.status_code == 404
+    assert database.db.chat_messages.count_documents({"session_id": "s1"}) == 2
+    assert database.db.chat_sessions.find_one({"session_id": "s1"})["user_id"] == "u1"
+
+
+async def _save(reply):
+    return 2
+
+
+def test_first_token_arrives_before_reply_completes():
+    model = LocalAdvisorModel(token_delay=0.01)
+    messages = [{"role": "user", "content": "retirement"}]
+
+    async def run():
+        start = time.perf_counter()
+        first = None
+        async for _ in stream_reply(model, messages, "s1", _save):
+            if first is None:
+                first = time.perf_counter() - start
+        return first, time.perf_counter() - start
+
+    first, total = asyncio.run(run())
+    assert first < total / 5
+
+
+def test_provider_failure_ends_stream_with_error_event():
+    class FailingModel(LocalAdvisorModel):
+        async def stream(self, messages):
+            yield "partial"
+            raise RuntimeError("upstream reset")
+
+    saved = []
+
+    async def save(reply):
+        saved.append(reply)
+        return 1
+
+    async def run():
+        return [event async for event in stream_reply(FailingModel(), [{"role": "user", "content": "x"}], "s1", save)]
+
+    events = parse_events("".join(asyncio.run(run())))
+    assert events[0] == ("message", {"token": "partial"})
+    assert events[-1][0] == "error"
+    assert saved == []
+
+
+def test_trim_to_tokens_keeps_newest_lines():
+    text = "\n".join(f"line {i} " + "x" * 40 for i in range(50))
+    trimmed = trim_to_tokens(text, 60)
+    assert estimate_tokens(trimmed) <= 60
+    assert trimmed.endswith(text.splitlines()[-1])
+    assert trim_to_tokens("short", 60) == "short"
+
+
+def test_prompt_respects_token_budget(database):
+    settings = ChatMemorySettings(token_budget=900, window_messages=40, fold_batch=4, summary_tokens=100)
+    memory = ChatMemory(database, ExtractiveSummarizer(), settings)
+
+    async def run():
+        for turn in range(30):
+            await memory.record("s2", "u1", f"Question {turn}: " + "details " * 30, "Answer " * 60)
+            await memory.compact("s2")
+        return await memory.prompt("s2", "persona", None, "latest question")
+
+    messages = asyncio.run(run())
+    assert sum(estimate_tokens(m["content"]) for m in messages) <= settings.token_budget
+    assert messages[-1] == {"role": "user", "content": "latest question"}
+    # Newest history is kept verbatim, in order
+    assert messages[-2]["role"] == "assistant"
+
+    with pytest.raises(ValueError):
+        asyncio.run(memory.prompt("s2", "persona", None, "word " * 5000))
+
+
+def test_compaction_folds_and_caps_history(database):
+    settings = ChatMemorySettings(window_messages=6, fold_batch=4, max_stored_messages=20)
+    memory = ChatMemory(database, ExtractiveSummarizer(), settings)
+
+    async def run():
+        for turn in range(40):
+            await memory.record("s3", "u1", f"question {turn}", f"answer {turn}")
+            await memory.compact("s3")
+
+    asyncio.run(run())
+    session = database.db.chat_sessions.find_one({"session_id": "s3"})
+    assert session["message_count"] == 80
+    assert 80 - session["summarized_through"] <= settings.window_messages + settings.fold_batch
+    assert "question 0" in session["summary"]
+    seqs = [m["seq"] for m in database.db.chat_messages.find({"session_id": "s3"})]
+    # The cap is applied when a batch is folded, so it can be exceeded by at most one batch
+    assert len(seqs) <= settings.max_stored_messages + settings.fold_batch + 2
+    assert max(seqs) == 80
+
+
+def test_per_turn_cost_is_constant_over_long_sessions(database):
+    """500-turn session: prompt size and turn latency plateau instead of growing"""
+    memory = ChatMemory(database, ExtractiveSummarizer())
+    model = LocalAdvisorModel()
+    questions = ["Should I continue my SIP?", "How much tax can ELSS save?",
+                 "The market is falling, what now?", "How should I plan retirement?"]
+
+    async def run():
+        prompt_tokens, timings = [], []
+        for turn in range(500):
+            start = time.perf_counter()
+            question = f"{questions[turn % 4]} (turn {turn})"
+            messages = await memory.prompt("long", server.ai_advisor.system_message, None, question)
+
+            async def save(reply):
+                return await memory.record("long", "u1", question, reply)
+
+            async for _ in stream_reply(model, messages, "long", save, after=lambda: memory.compact("long")):
+                pass
+            timings.append(time.perf_counter() - start)
+            prompt_tokens.append(sum(estimate_tokens(m["content"]) for m in messages))
+        return prompt_tokens, timings
+
+    prompt_tokens, timings = asyncio.run(run())
+    naive_tokens = estimate_tokens(server.ai_advisor.system_message) + 500 * 2 * 40
+    assert max(prompt_tokens) <= ChatMemorySettings().token_budget
+    assert max(prompt_tokens[400:]) <= max(prompt_tokens[50:100]) + 50
+    assert prompt_tokens[-1] < naive_tokens / 10
+
+    early = sorted(timings[50:150])[50]
+    late = sorted(timings[400:500])[50]
+    assert late < early * 3
+    settings = ChatMemorySettings()
+    stored = database.db.chat_messages.count_documents({"session_id": "long"})
+    assert stored <= settings.max_stored_messages + settings.fold_batch + 2
+
+
+def test_openai_client_parses_streamed_deltas():
+    chunks = ["Hello", " there", "!"]
+    body = "".join(
+        f"data: {json.dumps({'choices': [{'delta': {'content': c}}]})}\n\n" for c in chunks
+    ) + "data: [DONE]\n\n"
+
+    def handler(request):
+        sent = json.loads(request.content)
+        assert sent["stream"] is True
+        assert request.headers["authorization"] == "Bearer test-key"
+        return httpx.Response(200, content=body.encode(), headers={"content-type": "text/event-stream"})
+
+    client = OpenAIChatClient("test-key", transport=httpx.MockTransport(handler))
+
+    async def run():
+        # Both requests go through the client's one connection pool
+        first = [token async for token in client.stream([{"role": "user", "content": "hi"}])]
+        second = await client.complete([{"role": "user", "content": "again"}])
+        await client.aclose()
+        return first, second
+
+    assert asyncio.run(run()) == (chunks, "Hello there!")
+    assert client._client.is_closed
+
+
+def test_client_from_env(monkeypatch):
+    monkeypatch.delenv("LLM_PROVIDER", raising=False)
+    assert isinstance(client_from_env(None), LocalAdvisorModel)
+    assert isinstance(client_from_env("key"), OpenAIChatClient)
+    monkeypatch.setenv("LLM_PROVIDER", "local")
+    assert isinstance(client_from_env("key"), LocalAdvisorModel)
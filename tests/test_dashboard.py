@@ -0,0 +1,235 @@
+import asyncio
+import copy
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import (  # noqa: E402
+    RECOMMENDATION_TEXT_FIELDS,
+    Database,
+    MongoSettings,
+    build_dashboard_pipeline,
+    parse_dashboard_fields,
+)
+
+
+def _lookups(pipeline):
+    return {stage["$lookup"]["as"]: stage["$lookup"] for stage in pipeline if "$lookup" in stage}
+
+
+def _fixture_collections():
+    now = datetime(2024, 1, 2)
+    return {
+        "users": [
+            {"_id": 1, "user_id": "u1", "name": "Asha", "age": 31},
+            {"_id": 2, "user_id": "u2", "name": "Ravi", "age": 45},
+        ],
+        "assessments": [
+            {"_id": 3, "user_id": "u1", "risk_score": 4, "created_at": now - timedelta(days=1)},
+            {"_id": 4, "user_id": "u1", "risk_score": 7, "created_at": now},
+            {"_id": 5, "user_id": "u2", "risk_score": 2, "created_at": now + timedelta(days=1)},
+        ],
+        "recommendations": [
+            {"_id": 6, "user_id": "u1", "portfolio_allocation": {"debt": 100}, "rationale": "long text",
+             "created_at": now},
+        ],
+    }
+
+
+def _expression(expression, document, variables):
+    """Evaluate the aggregation expressions build_dashboard_pipeline emits"""
+    if expression == "$$ROOT":
+        return document
+    if isinstance(expression, str) and expression.startswith("$$"):
+        return variables[expression[2:]]
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = document
+        for part in expression[1:].split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        return value
+    if isinstance(expression, dict) and not any(key.startswith("$") for key in expression):
+        return {key: _expression(value, document, variables) for key, value in expression.items()}
+    if isinstance(expression, dict):
+        (operator, args), = expression.items()
+        values = [_expression(arg, document, variables) for arg in args]
+        if operator == "$eq":
+            return values[0] == values[1]
+        if operator == "$ifNull":
+            return values[1] if values[0] is None else values[0]
+        if operator == "$arrayElemAt":
+            return values[0][values[1]] if values[1] < len(values[0]) else None
+        raise NotImplementedError(operator)
+    return expression
+
+
+def _project(document, projection):
+    if any(value == 1 for value in projection.values()):
+        keep = {field for field, value in projection.items() if value == 1} | {"_id"}
+        keep -= {field for field, value in projection.items() if value == 0}
+        return {field: value for field, value in document.items() if field in keep}
+    return {field: value for field, value in document.items() if field not in projection}
+
+
+def _run_pipeline(pipeline, documents, collections, variables=None):
+    """Run the stages build_dashboard_pipeline emits in Python, following MongoDB's semantics"""
+    variables = variables or {}
+    documents = copy.deepcopy(documents)
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            documents = [
+                document for document in documents
+                if (_expression(spec["$expr"], document, variables) if "$expr" in spec
+                    else all(document.get(field) == value for field, value in spec.items()))
+            ]
+        elif name == "$limit":
+            documents = documents[:spec]
+        elif name == "$sort":
+            (field, direction), = spec.items()
+            documents.sort(key=lambda document: document[field], reverse=direction < 0)
+        elif name == "$project":
+            documents = [_project(document, spec) for document in documents]
+        elif name == "$replaceRoot":
+            documents = [_expression(spec["newRoot"], document, variables) for document in documents]
+        elif name == "$addFields":
+            for document in documents:
+                document.update({field: _expression(value, document, variables) for field, value in spec.items()})
+        elif name == "$lookup":
+            for document in documents:
+                let = {name: _expression(value, document, variables) for name, value in spec["let"].items()}
+                document[spec["as"]] = _run_pipeline(spec["pipeline"], collections[spec["from"]], collections, let)
+        else:
+            raise NotImplementedError(name)
+    return documents
+
+
+def test_parse_fields_defaults_to_all_sections():
+    assert parse_dashboard_fields(None) == {
+        "user_profile": None,
+        "risk_assessment": None,
+        "recommendations": None,
+    }
+
+
+def test_parse_fields_sparse_and_whole_sections():
+    sections = parse_dashboard_fields("user_profile.name, risk_assessment,risk_assessment.risk_score,"
+                                      "recommendations.portfolio_allocation")
+    assert sections == {
+        "user_profile": {"name"},
+        "risk_assessment": None,
+        "recommendations": {"portfolio_allocation"},
+    }
+
+
+def test_parse_fields_rejects_unknown_section():
+    with pytest.raises(ValueError):
+        parse_dashboard_fields("portfolio.rationale")
+
+
+def test_default_pipeline_is_one_aggregation_without_ids_or_text():
+    pipeline = build_dashboard_pipeline("u1", parse_dashboard_fields(None))
+    assert pipeline[0] == {"$match": {"user_id": "u1"}}
+    lookups = _lookups(pipeline)
+    assert set(lookups) == {"risk_assessment", "recommendations"}
+    for lookup in lookups.values():
+        # Correlated on user_id with let + $expr, which runs before MongoDB 5.0
+        assert "localField" not in lookup and lookup["let"] == {"user_id": "$user_profile.user_id"}
+        assert lookup["pipeline"][:3] == [
+            {"$match": {"$expr": {"$eq": ["$user_id", "$$user_id"]}}}, {"$sort": {"created_at": -1}}, {"$limit": 1},
+        ]
+        assert lookup["pipeline"][3]["$project"]["_id"] == 0
+    recommendation_projection = lookups["recommendations"]["pipeline"][3]["$project"]
+    for field in RECOMMENDATION_TEXT_FIELDS:
+        assert recommendation_projection[field] == 0
+
+
+def test_sparse_pipeline_skips_unrequested_lookups():
+    pipeline = build_dashboard_pipeline("u1", parse_dashboard_fields("recommendations.rationale"))
+    lookups = _lookups(pipeline)
+    assert set(lookups) == {"recommendations"}
+    # Derived fields are rendered from the stored record, so its inputs are fetched with them
+    assert lookups["recommendations"]["pipeline"][3]["$project"] == {
+        "rationale": 1, "parameters": 1, "portfolio_allocation": 1, "fund_codes": 1, "_id": 0,
+    }
+    assert pipeline[-1] == {"$project": {"user_profile": 0}}
+
+
+def test_pipeline_output_shape_on_fixture_documents():
+    collections = _fixture_collections()
+
+    def run(user_id, fields):
+        pipeline = build_dashboard_pipeline(user_id, parse_dashboard_fields(fields))
+        return _run_pipeline(pipeline, collections["users"], collections)
+
+    # Latest assessment of this user only; the recommendation without its text sections
+    assert run("u1", None) == [{
+        "user_profile": {"user_id": "u1", "name": "Asha", "age": 31},
+        "risk_assessment": {"user_id": "u1", "risk_score": 7, "created_at": datetime(2024, 1, 2)},
+        "recommendations": {"user_id": "u1", "portfolio_allocation": {"debt": 100}, "created_at": datetime(2024, 1, 2)},
+    }]
+    assert run("u1", "recommendations.rationale") == [
+        {"recommendations": {"rationale": "long text", "portfolio_allocation": {"debt": 100}}},
+    ]
+    assert run("u2", "user_profile.name,risk_assessment.risk_score,recommendations") == [{
+        "user_profile": {"user_id": "u2", "name": "Ravi"},
+        "risk_assessment": {"risk_score": 2},
+        "recommendations": None,
+    }]
+    assert run("missing", None) == []
+
+
+def test_dashboard_route_fields_and_errors(monkeypatch):
+    server = pytest.importorskip("server")
+    TestClient = pytest.importorskip("fastapi.testclient").TestClient
+    calls = []
+
+    async def fake_dashboard(user_id, sections):
+        calls.append((user_id, sections))
+        return {"risk_assessment": {"risk_score": 7}} if user_id == "u1" else None
+
+    monkeypatch.setattr(server.database, "dashboard", fake_dashboard)
+    client = TestClient(server.app)
+
+    response = client.get("/api/user/u1/dashboard", params={"fields": "risk_assessment.risk_score"})
+    assert response.status_code == 200
+    assert response.json() == {"risk_assessment": {"risk_score": 7}}
+    assert calls[-1] == ("u1", {"risk_assessment": {"risk_score"}})
+
+    assert client.get("/api/user/u1/dashboard", params={"fields": "bogus"}).status_code == 400
+    assert client.get("/api/user/nobody/dashboard").status_code == 404
+
+
+@pytest.mark.skipif(not os.getenv("MONGO_TEST_URL"), reason="$lookup with let needs a live MongoDB 3.6+ (set MONGO_TEST_URL)")
+def test_dashboard_aggregation_against_mongo():
+    settings = MongoSettings(url=os.getenv("MONGO_TEST_URL"), database="investwise_dashboard_test")
+    database = Database.from_settings(settings)
+    database.client.drop_database(settings.database)
+    now = datetime.now()
+    database.db.users.insert_one({"user_id": "u1", "name": "Asha", "age": 31})
+    database.db.assessments.insert_many([
+        {"user_id": "u1", "risk_score": 4, "created_at": now - timedelta(days=1)},
+        {"user_id": "u1", "risk_score": 7, "created_at": now},
+    ])
+    database.db.recommendations.insert_one(
+        {"user_id": "u1", "portfolio_allocation": {"debt": 100}, "rationale": "long text", "created_at": now}
+    )
+
+    async def scenario():
+        return (
+            await database.dashboard("u1", parse_dashboard_fields(None)),
+            await database.dashboard("u1", parse_dashboard_fields("recommendations.rationale")),
+            await database.dashboard("missing", parse_dashboard_fields(None)),
+        )
+
+    try:
+        full, sparse, missing = asyncio.run(scenario())
+        assert full["user_profile"]["name"] == "Asha"
+        assert "_id" not in full["user_profile"]
+        assert full["risk_assessment"]["risk_score"] == 7
+        assert "rationale" not in full["recommendations"]
+        assert sparse == {"recommendations": {"rationale": "long text", "portfolio_allocation": {"debt": 100}}}
+        assert missing is None
+    finally:
+        database.client.drop_database(settings.database)
+        database.close()
@@ -0,0 +1,219 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+mongomock = pytest.importorskip("mongomock")
+httpx = pytest.importorskip("httpx")
+
+from database import INDEXES, AsyncCollection, Database, MongoSettings  # noqa: E402
+
+LATENCY = 0.02
+CONCURRENCY = 50
+
+
+class SlowCollection:
+    """mongomock collection that sleeps before every driver call, like a network round-trip"""
+
+    def __init__(self, collection, latency=LATENCY):
+        self._collection = collection
+        self._latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def slow(*args, **kwargs):
+            time.sleep(self._latency)
+            return attr(*args, **kwargs)
+        return slow
+
+
+class SlowDatabase(Database):
+    def _collection(self, name):
+        return AsyncCollection(SlowCollection(self.db[name]), self.executor)
+
+
+@pytest.fixture
+def slow_db():
+    database = SlowDatabase(mongomock.MongoClient(), "investwise_test", executor_workers=CONCURRENCY)
+    yield database
+    database.close()
+
+
+def test_settings_from_env(monkeypatch):
+    monkeypatch.setenv('MONGO_URL', 'mongodb://db:27017')
+    monkeypatch.setenv('MONGO_MAX_POOL_SIZE', '80')
+    monkeypatch.delenv('MONGO_EXECUTOR_WORKERS', raising=False)
+    settings = MongoSettings.from_env()
+    assert settings.url == 'mongodb://db:27017'
+    assert settings.max_pool_size == 80
+    assert settings.workers == 80
+
+    monkeypatch.setenv('MONGO_EXECUTOR_WORKERS', '16')
+    assert MongoSettings.from_env().workers == 16
+
+
+def test_repositories_round_trip():
+    database = Database(mongomock.MongoClient(), "investwise_test", executor_workers=4)
+
+    async def scenario():
+        await database.users.create({"user_id": "u1", "name": "Asha"})
+        await database.assessments.add({"user_id": "u1", "risk_score": 6, "created_at": datetime.now()})
+        await database.chat_sessions.add({"session_id": "s1", "user_id": "u1"})
+        return (
+            await database.users.get("u1"),
+            await database.assessments.latest_for_user("u1"),
+            await database.chat_sessions.get("s1"),
+            await database.users.get("missing"),
+        )
+
+    user, assessment, session, missing = asyncio.run(scenario())
+    database.close()
+    assert user["name"] == "Asha"
+    assert assessment["risk_score"] == 6
+    assert session["user_id"] == "u1"
+    assert missing is None
+
+
+def test_user_pages_follow_user_id_order():
+    database = Database(mongomock.MongoClient(), "investwise_test", executor_workers=4)
+    database.db.users.insert_many([{"user_id": f"u{i:02d}"} for i in reversed(range(25))])
+
+    async def read(after):
+        pages = database.users.pages(10, after=after, projection={"_id": 0, "user_id": 1})
+        return [page async for page in pages]
+
+    pages, rest = asyncio.run(read(None)), asyncio.run(read("u19"))
+    database.close()
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert pages[1][0] == {"user_id": "u10"} and pages[2][-1] == {"user_id": "u24"}
+    assert rest == [[{"user_id": f"u{i}"} for i in range(20, 25)]]
+
+
+def test_load_concurrent_throughput_before_and_after(slow_db):
+    """Blocking driver calls serialize concurrent requests; the executor-backed layer overlaps them"""
+    raw = SlowCollection(slow_db.db.users)
+
+    async def blocking_handler(user_id):
+        return raw.find_one({"user_id": user_id})
+
+    async def async_handler(user_id):
+        return await slow_db.users.get(user_id)
+
+    async def measure(handler):
+        start = time.perf_counter()
+        await asyncio.gather(*(handler(f"u{i}") for i in range(CONCURRENCY)))
+        return CONCURRENCY / (time.perf_counter() - start)
+
+    before = asyncio.run(measure(blocking_handler))
+    after = asyncio.run(measure(async_handler))
+    assert after > before * 5
+
+
+def test_routes_do_not_block_event_loop(slow_db, monkeypatch):
+    server = pytest.importorskip("server")
+    monkeypatch.setattr(server, "database", slow_db)
+    slow_db.db.users.insert_one({"user_id": "u1", "name": "Asha", "age": 30})
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            responses = await asyncio.gather(
+                *(client.post("/api/risk-assessment", params={"user_id": "u1"}) for _ in range(CONCURRENCY))
+            )
+            return responses, time.perf_counter() - start
+
+    responses, elapsed = asyncio.run(scenario())
+    assert all(r.status_code == 200 for r in responses)
+    assert slow_db.db.assessments.count_documents({"user_id": "u1"}) == CONCURRENCY
+    # A lookup and an insert per request, run serially, would take CONCURRENCY * 2 * LATENCY.
+    assert elapsed < CONCURRENCY * 2 * LATENCY / 5
+
+
+def test_ensure_indexes_and_latest_document():
+    database = Database(mongomock.MongoClient(), "investwise_test", executor_workers=4)
+    now = datetime.now()
+
+    async def scenario():
+        await database.ensure_indexes()
+        await database.ensure_indexes()  # idempotent across worker restarts
+        for age_days, score in [(3, 4), (0, 8), (1, 6)]:
+            await database.assessments.add(
+                {"user_id": "u1", "risk_score": score, "created_at": now - timedelta(days=age_days)}
+            )
+        return await database.assessments.latest_for_user("u1")
+
+    latest = asyncio.run(scenario())
+    assert latest["risk_score"] == 8
+
+    for name, indexes in INDEXES.items():
+        for _, options in indexes:
+            assert options["name"] in database.db[name].index_information()
+    for name in ("users", "recommendations"):
+        assert database.db[name].index_information()["user_id_unique"]["unique"] is True
+    info = database.db.assessments.index_information()
+    assert info["user_id_created_at"]["key"] == [("user_id", 1), ("created_at", -1)]
+    database.close()
+
+
+def test_ensure_indexes_replaces_the_recommendations_history_index():
+    database = Database(mongomock.MongoClient(), "investwise_test", executor_workers=4)
+    database.db.recommendations.create_index([("user_id", 1), ("created_at", -1)], name="user_id_created_at")
+
+    async def scenario():
+        await database.ensure_indexes()
+        await database.recommendations.upsert_for_user({"user_id": "u1", "risk_score": 4})
+        await database.recommendations.upsert_for_user({"user_id": "u1", "risk_score": 7})
+        with pytest.raises(DuplicateKeyError):
+            await database.recommendations.collection.insert_one({"user_id": "u1"})
+        return await database.recommendations.latest_for_user("u1")
+
+    latest = asyncio.run(scenario())
+    assert "user_id_created_at" not in database.db.recommendations.index_information()
+    assert latest["risk_score"] == 7 and database.db.recommendations.count_documents({}) == 1
+    database.close()
+
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+@pytest.mark.skipif(not os.getenv("MONGO_TEST_URL"), reason="explain() needs a live MongoDB (set MONGO_TEST_URL)")
+def test_latest_queries_use_index_not_collscan():
+    settings = MongoSettings(url=os.getenv("MONGO_TEST_URL"), database="investwise_explain_test")
+    database = Database.from_settings(settings)
+    database.client.drop_database(settings.database)
+
+    async def scenario():
+        await database.ensure_indexes()
+        for i in range(200):
+            doc = {"user_id": f"u{i % 20}", "created_at": datetime.now()}
+            await database.assessments.add(dict(doc))
+            await database.recommendations.upsert_for_user(dict(doc))
+        return [
+            await database.assessments.explain_latest("u7"),
+            await database.recommendations.explain_latest("u7"),
+        ]
+
+    try:
+        for explain in asyncio.run(scenario()):
+            stages = set(_plan_stages(explain["queryPlanner"]["winningPlan"]))
+            assert "COLLSCAN" not in stages
+            assert "SORT" not in stages
+            assert "IXSCAN" in stages or "EXPRESS_IXSCAN" in stages
+    finally:
+        database.client.drop_database(settings.database)
+        database.close()
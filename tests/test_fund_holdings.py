@@ -0,0 +1,122 @@
+import csv
+import itertools
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from fund_holdings import FundHoldings, FundHoldingsStore  # noqa: E402
+
+SECTORS = ["Financials", "IT", "Energy", "Consumer", "Healthcare", "Industrials"]
+
+
+def random_rows(schemes, stocks=2000, per_scheme=60, seed=0, codes=None):
+    rng = np.random.default_rng(seed)
+    codes = codes or [f"scheme-{i}" for i in range(schemes)]
+    rows = []
+    for code in codes:
+        held = rng.choice(stocks, rng.integers(per_scheme // 2, per_scheme + 1), replace=False)
+        weights = rng.dirichlet(np.ones(len(held))) * rng.uniform(90, 100)
+        rows.extend(
+            {"scheme_code": code, "isin": f"INE{stock:06d}", "stock": f"Stock {stock}",
+             "sector": SECTORS[stock % len(SECTORS)], "weight": weight}
+            for stock, weight in zip(held, weights)
+        )
+    return rows
+
+
+def dense(rows):
+    """Scheme -> {isin: fraction} the slow way"""
+    weights = {}
+    for row in rows:
+        scheme = weights.setdefault(row["scheme_code"], {})
+        scheme[row["isin"]] = scheme.get(row["isin"], 0) + float(row["weight"]) / 100
+    return weights
+
+
+def test_overlap_and_exposure_match_dense_formulas():
+    rows = random_rows(40, stocks=150, seed=1)
+    # A stock listed twice for one scheme adds up
+    rows.append(dict(rows[0], weight=1.5))
+    holdings = FundHoldings.from_rows(rows)
+    expected = dense(rows)
+    assert len(holdings.indices) == sum(len(w) for w in expected.values())
+    codes = ["scheme-3", "scheme-0", "scheme-17", "scheme-39"]
+    fund_weights = np.array([0.4, 0.3, 0.2, 0.1])
+
+    overlap, common = holdings.overlap(np.array([holdings.row_for(c) for c in codes]))
+    for (i, a), (j, b) in itertools.product(enumerate(codes), repeat=2):
+        shared = expected[a].keys() & expected[b].keys()
+        assert overlap[i, j] == pytest.approx(sum(min(expected[a][s], expected[b][s]) for s in shared), abs=1e-6)
+        assert common[i, j] == len(shared)
+
+    exposure = holdings.exposure(np.array([holdings.row_for(c) for c in codes]), fund_weights)
+    for stock in range(holdings.stocks):
+        isin = holdings.isins[stock]
+        assert exposure[stock] == pytest.approx(
+            sum(w * expected[c].get(isin, 0) for c, w in zip(codes, fund_weights)), abs=1e-6)
+
+    report = holdings.analyze(codes, fund_weights * 10, top=5)
+    assert len(report["pairwise_overlap"]) == 6 and len(report["top_stocks"]) == 5
+    assert sum(report["sector_exposure"].values()) == pytest.approx(exposure.sum() * 100, abs=0.05)
+    with pytest.raises(ValueError):
+        holdings.analyze(["scheme-0", "unknown"])
+    with pytest.raises(ValueError):
+        holdings.analyze(["scheme-0", "scheme-1"], [1.0])
+
+
+def test_store_reloads_changed_file(tmp_path):
+    path = tmp_path / "holdings.csv"
+    store = FundHoldingsStore(str(path))
+    assert store.reload_if_changed() is None
+    rows = random_rows(3, stocks=20, per_scheme=10, seed=3)
+    with open(path, "w", newline="") as fh:
+        writer = csv.DictWriter(fh, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    first = store.reload_if_changed()
+    assert first is not None and len(first.schemes) == 3
+    assert store.reload_if_changed() is None
+
+
+def test_holdings_benchmark():
+    """Loading 10,000 schemes and the pairwise overlap of a recommendation's candidates"""
+    rows = random_rows(10_000, stocks=3000, seed=4)
+    start = time.perf_counter()
+    holdings = FundHoldings.from_rows(rows)
+    loaded = time.perf_counter() - start
+    candidates = np.arange(0, 10_000, 10_000 // 56)[:56]
+    start = time.perf_counter()
+    for _ in range(20):
+        holdings.overlap(candidates)
+    elapsed = (time.perf_counter() - start) / 20
+    assert loaded < 3
+    assert elapsed < 0.1
+
+
+def test_overlap_route():
+    server = pytest.importorskip("server")
+    from fastapi.testclient import TestClient
+
+    advisor = server.ai_advisor
+    universe = advisor.fund_index.universe
+    codes = [universe.value("scheme_code", advisor.fund_index.top_rows(c)[0]) for c in ("large_cap", "mid_cap")]
+    portfolio = [("INE000001", "Financials"), ("INE000002", "IT")]
+    holdings = FundHoldings.from_rows([
+        {"scheme_code": code, "isin": isin, "stock": isin, "sector": sector, "weight": 50}
+        for code in codes for isin, sector in portfolio
+    ])
+    client = TestClient(server.app)
+    assert client.post("/api/funds/overlap", json={"scheme_codes": codes}).status_code == 404
+    advisor.refresh_fund_universe(universe, advisor.fund_index.metrics, holdings)
+    try:
+        response = client.post("/api/funds/overlap", json={"scheme_codes": codes, "weights": [60, 40]})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["pairwise_overlap"][0]["overlap_percent"] == 100.0
+        assert body["pairwise_overlap"][0]["common_stocks"] == 2
+        assert body["sector_exposure"] == {"Financials": 50.0, "IT": 50.0}
+        assert client.post("/api/funds/overlap", json={"scheme_codes": [codes[0], "nope"]}).status_code == 400
+    finally:
+        advisor.refresh_fund_universe(universe, advisor.fund_index.metrics)
@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+from fund_index import RANKINGS, FundIndex  # noqa: E402
+from fund_universe import DEFAULT_PATH, FundUniverse  # noqa: E402
+
+
+def random_universe(rng, categories=("large_cap", "mid_cap", "debt"), per_category=60):
+    universe = {}
+    for category in categories:
+        universe[category] = [
+            {
+                "name": f"{category} fund {i}",
+                "rating": rng.choice([3.5, 4.0, 4.2, 4.5]),
+                "returns_3y": round(rng.uniform(5, 25), 1),
+                "returns_5y": round(rng.uniform(5, 20), 1),
+                "returns_10y": round(rng.uniform(5, 18), 1),
+                "aum": rng.randint(100, 30000),
+                "expense_ratio": round(rng.uniform(0.1, 2.5), 2),
+                "exit_load": rng.choice([0, 0.25, 1.0]),
+                "min_investment": rng.choice([100, 500, 1000, 5000]),
+                "stocks_count": rng.randint(0, 100),
+                "category": category,
+                "fund_manager": "Fund Manager",
+            }
+            for i in range(per_category)
+        ]
+    return universe
+
+
+def sort_key(rank_by):
+    return lambda f: tuple(-f[field] if descending else f[field] for field, descending in RANKINGS[rank_by])
+
+
+def brute_force(funds, k, rank_by, max_min_investment, zero_exit_load):
+    eligible = [
+        f for f in funds
+        if (max_min_investment is None or f["min_investment"] <= max_min_investment)
+        and (not zero_exit_load or f["exit_load"] == 0)
+    ]
+    return [f["name"] for f in sorted(eligible, key=sort_key(rank_by))[:k]]
+
+
+def test_matches_brute_force_queries():
+    rng = random.Random(11)
+    universe = random_universe(rng)
+    index = FundIndex(FundUniverse.from_categories(universe))
+    for _ in range(500):
+        category = rng.choice(list(universe))
+        args = (
+            rng.randint(1, 10),
+            rng.choice(list(RANKINGS)),
+            rng.choice([None, 50, 100, 499, 500, 2500, 10000]),
+            rng.random() < 0.5,
+        )
+        k, rank_by, max_min_investment, zero_exit_load = args
+        expected = brute_force(universe[category], *args)
+        funds = index.top(category, k, rank_by=rank_by, max_min_investment=max_min_investment,
+                          zero_exit_load=zero_exit_load)
+        assert [f["name"] for f in funds] == expected
+
+
+def test_default_ranking_matches_legacy_selection():
+    universe = FundUniverse.load(DEFAULT_PATH)
+    index = FundIndex(universe)
+    for category in universe.categories:
+        funds = universe.records(universe.rows(category))
+        legacy = sorted(funds, key=lambda x: (x['rating'], x['returns_3y']), reverse=True)[0]
+        assert index.best(category) == legacy
+
+
+def test_unknown_category_and_ranking():
+    index = FundIndex(FundUniverse.from_categories(
+        random_universe(random.Random(1), categories=("debt",), per_category=5)
+    ))
+    assert index.top("gold") == []
+    assert "debt" in index and "gold" not in index
+    with pytest.raises(ValueError):
+        index.top("debt", rank_by="sharpe")
+
+
+def test_top_funds_route():
+    server = pytest.importorskip("server")
+    TestClient = pytest.importorskip("fastapi.testclient").TestClient
+    client = TestClient(server.app)
+
+    response = client.get("/api/funds/large_cap", params={"k": 2, "rank_by": "expense_ratio"})
+    assert response.status_code == 200
+    ratios = [f["expense_ratio"] for f in response.json()["funds"]]
+    assert ratios == sorted(ratios) and len(ratios) == 2
+    assert client.get("/api/funds/gold").status_code == 404
+    assert client.get("/api/funds/debt", params={"rank_by": "sharpe"}).status_code == 400
@@ -0,0 +1,169 @@
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from fund_index import FundIndex  # noqa: E402
+from fund_metrics import (  # noqa: E402
+    METRIC_FIELDS,
+    RISK_FREE_RATE,
+    TRADING_DAYS,
+    FundMetrics,
+    compute,
+    load_or_refresh,
+    refresh,
+    roll_forward,
+    scheme_groups,
+)
+from fund_universe import DEFAULT_PATH, FundUniverse  # noqa: E402
+from nav_history import NavHistory, write_generation  # noqa: E402
+
+
+def random_navs(schemes: int, days: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    drift = rng.uniform(-0.0002, 0.0008, (schemes, 1))
+    returns = rng.normal(drift, rng.uniform(0.002, 0.015, (schemes, 1)), (schemes, days))
+    navs = 10 * np.exp(np.cumsum(returns, axis=1))
+    # Late launches and the odd day without a NAV
+    for row in range(0, schemes, 7):
+        navs[row, :rng.integers(1, days // 2)] = np.nan
+    navs[rng.random((schemes, days)) < 0.01] = np.nan
+    return navs.astype(np.float32)
+
+
+def calendar(days: int) -> np.ndarray:
+    return np.busday_offset("2015-01-01", np.arange(days), roll="forward")
+
+
+def store(path, navs, codes=None) -> NavHistory:
+    codes = codes or [f"scheme-{i}" for i in range(len(navs))]
+    return write_generation(str(path), calendar(navs.shape[1]), navs, codes)
+
+
+def test_metrics_of_one_scheme_match_direct_formulas(tmp_path):
+    rng = np.random.default_rng(3)
+    navs = (10 * np.exp(np.cumsum(rng.normal(0.0004, 0.01, (1, 6 * TRADING_DAYS)), axis=1))).astype(np.float32)
+    series = navs[0].astype(np.float64)
+    # Days without a NAV carry the previous one
+    for day in (5, len(series) - 100, len(series) - 99):
+        navs[0, day] = np.nan
+        series[day] = series[day - 1]
+    history = store(tmp_path, navs)
+    metrics = compute(history, np.array([-1]))
+    values = metrics.for_scheme("scheme-0")
+
+    returns = series[-757:][1:] / series[-757:][:-1] - 1
+    daily_rf = (1 + RISK_FREE_RATE) ** (1 / TRADING_DAYS) - 1
+    assert values["volatility"] == pytest.approx(returns.std(ddof=1) * np.sqrt(TRADING_DAYS), abs=1e-4)
+    assert values["sharpe"] == pytest.approx(
+        (returns.mean() - daily_rf) / returns.std(ddof=1) * np.sqrt(TRADING_DAYS), abs=1e-4)
+    peak = np.maximum.accumulate(series)
+    assert values["max_drawdown"] == pytest.approx((series / peak - 1).min(), abs=1e-4)
+    assert values["cagr_1y"] == pytest.approx(series[-1] / series[-1 - TRADING_DAYS] - 1, abs=1e-4)
+    assert values["cagr_5y"] == pytest.approx((series[-1] / series[-1 - 5 * TRADING_DAYS]) ** 0.2 - 1, abs=1e-4)
+    # No peer group, no downside capture
+    assert values["downside_capture"] is None
+
+
+def test_short_histories_and_downside_capture(tmp_path):
+    navs = random_navs(4, 2 * TRADING_DAYS, seed=5)
+    navs[3, :-60] = np.nan  # launched 60 days ago
+    navs[2] = navs[1]       # tracks its peer exactly
+    history = store(tmp_path, navs)
+    metrics = compute(history, np.array([0, 0, 0, 0]))
+    assert metrics.for_scheme("scheme-3")["sharpe"] is None
+    assert metrics.for_scheme("scheme-3")["max_drawdown"] is not None
+    assert metrics.for_scheme("scheme-0")["cagr_3y"] is None
+    captures = [metrics.for_scheme(f"scheme-{i}")["downside_capture"] for i in range(3)]
+    assert captures[1] == captures[2]
+    # The peer group is the average of its members, so captures straddle 100
+    assert min(captures) < 100 < max(captures)
+
+
+def test_rolling_forward_matches_a_full_pass(tmp_path):
+    navs = random_navs(300, 5 * TRADING_DAYS + 40, seed=7)
+    groups = np.arange(300, dtype=np.int16) % 4 - 1
+    before = compute(store(tmp_path / "a", navs[:, :-40]), groups)
+    history = store(tmp_path / "b", navs)
+    rolled = refresh(history, groups, before)
+    full = compute(history, groups)
+    assert rolled.days == full.days and rolled.last_day == full.last_day
+    for field in METRIC_FIELDS:
+        np.testing.assert_allclose(rolled.columns[field], full.columns[field], rtol=1e-9, equal_nan=True)
+    # Anything but appended days (here, different peer groups) means a full pass
+    assert refresh(history, groups + 1, before).columns["downside_capture"].shape == (300,)
+    assert refresh(history, groups, rolled) is rolled
+
+
+def test_saved_metrics_are_rolled_forward(tmp_path):
+    universe = FundUniverse.load(DEFAULT_PATH)
+    codes = [universe.value('scheme_code', row) for row in range(universe.size)]
+    navs = random_navs(len(codes), 4 * TRADING_DAYS, seed=9)
+    first = load_or_refresh(store(tmp_path, navs[:, :-1], codes), universe)
+    assert FundMetrics.load(str(tmp_path)).days == first.days
+    history = store(tmp_path, navs, codes)
+    second = load_or_refresh(history, universe)
+    assert second.days == first.days + 1
+    np.testing.assert_allclose(second.columns["sharpe"], compute(history, second.groups).columns["sharpe"],
+                               rtol=1e-9, equal_nan=True)
+    assert (scheme_groups(history, universe) >= 0).all()
+
+
+def test_index_ranks_by_risk_metrics(tmp_path):
+    universe = FundUniverse.load(DEFAULT_PATH)
+    codes = [universe.value('scheme_code', row) for row in range(universe.size)]
+    # The first fund of each category has no history
+    navs = random_navs(len(codes), 2 * TRADING_DAYS, seed=11)
+    history = store(tmp_path, navs[1:], codes[1:])
+    metrics = load_or_refresh(history, universe)
+    index = FundIndex(universe, metrics)
+    assert index.default_ranking == "sharpe" and "sortino" in index.rankings
+    assert index.version != FundIndex(universe).version
+
+    sharpe = metrics.columns_for(universe)["sharpe"]
+    for category in universe.categories:
+        ranked = index.top_rows(category, k=10)
+        values = sharpe[ranked]
+        known = values[~np.isnan(values)]
+        assert (np.diff(known) <= 0).all()
+        assert np.isnan(values[len(known):]).all()
+    with pytest.raises(ValueError):
+        FundIndex(universe).top_rows("large_cap", rank_by="sharpe")
+
+
+def test_metrics_benchmark(tmp_path):
+    """Whole-universe pass vs rolling forward one new NAV day"""
+    schemes, days = 3000, 5 * TRADING_DAYS
+    navs = random_navs(schemes, days + 1, seed=13)
+    groups = np.arange(schemes, dtype=np.int16) % 7
+    before = store(tmp_path / "a", navs[:, :-1])
+    history = store(tmp_path / "b", navs)
+
+    start = time.perf_counter()
+    previous = compute(before, groups)
+    full = time.perf_counter() - start
+    start = time.perf_counter()
+    rolled = roll_forward(previous, history)
+    incremental = time.perf_counter() - start
+    assert rolled.days == days + 1
+    assert incremental < full
+
+
+def test_metrics_route(tmp_path):
+    server = pytest.importorskip("server")
+    from fastapi.testclient import TestClient
+
+    universe = server.fund_store.universe
+    codes = [universe.value('scheme_code', row) for row in range(universe.size)]
+    metrics = load_or_refresh(store(tmp_path, random_navs(len(codes), 2 * TRADING_DAYS, seed=17), codes), universe)
+    client = TestClient(server.app)
+    assert client.get(f"/api/funds/{codes[0]}/metrics").status_code == 404
+    server.ai_advisor.refresh_fund_universe(universe, metrics)
+    try:
+        response = client.get(f"/api/funds/{codes[0]}/metrics").json()
+        assert set(METRIC_FIELDS) <= set(response) and response["as_of"] == str(metrics.last_day)
+        assert client.get("/api/funds/large_cap", params={"rank_by": "sortino"}).status_code == 200
+    finally:
+        server.ai_advisor.refresh_fund_universe(universe)
+    assert client.get("/api/funds/large_cap", params={"rank_by": "sortino"}).status_code == 400
@@ -0,0 +1,177 @@
+import itertools
+import random
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import fund_selection  # noqa: E402
+from fund_holdings import FundHoldings  # noqa: E402
+from fund_index import FundIndex  # noqa: E402
+from fund_selection import fund_count, pairwise_overlap, select_funds, split_percentage  # noqa: E402
+from fund_universe import FundUniverse  # noqa: E402
+from market_assumptions import CATEGORIES  # noqa: E402
+
+
+def random_universe(per_category, seed=0, min_investment=None):
+    rng = random.Random(seed)
+    records = []
+    for category in CATEGORIES:
+        for i in range(per_category):
+            records.append({
+                "scheme_code": f"{category}-{i}", "allocation_category": category, "name": f"{category} fund {i}",
+                "category": category, "rating": round(rng.uniform(3, 5), 1),
+                "returns_3y": round(rng.uniform(5, 25), 2), "returns_5y": round(rng.uniform(5, 20), 2),
+                "returns_10y": round(rng.uniform(5, 18), 2), "aum": rng.randint(100, 50000),
+                "stocks_count": rng.randint(20, 80), "expense_ratio": round(rng.uniform(0.2, 2.2), 2),
+                "exit_load": 1.0, "min_investment": min_investment or rng.choice([100, 500, 1000, 5000]),
+                "fund_manager": f"Manager {i % 50}",
+            })
+    return FundUniverse.from_records(records)
+
+
+def random_holdings(universe, stocks=400, seed=0):
+    """Funds of a category draw from a shared pool of stocks, so they overlap a lot"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for row in range(universe.size):
+        category = CATEGORIES.index(universe.value("allocation_category", row))
+        pool = np.arange(category * 40, category * 40 + 120) % stocks
+        held = rng.choice(pool, rng.integers(20, 40), replace=False)
+        for stock, weight in zip(held, rng.dirichlet(np.ones(len(held))) * 98):
+            rows.append({"scheme_code": universe.value("scheme_code", row), "isin": f"INE{stock:06d}",
+                         "stock": f"Stock {stock}", "sector": f"Sector {stock % 9}", "weight": weight})
+    return FundHoldings.from_rows(rows)
+
+
+def selection_cost(index, allocation, chosen, overlap_of):
+    """The documented cost of a selection: ranking and expense ratio per fund, overlap per pair"""
+    universe = index.universe
+    funds = []
+    for category, rows in chosen:
+        ranked = list(index.top_rows(category, fund_selection.CANDIDATES_PER_CATEGORY))
+        share = allocation[category] / 100 / len(rows)
+        funds.extend((row, share, ranked.index(row)) for row in rows)
+    cost = sum(share * (fund_selection.RANK_PENALTY * rank
+                        + fund_selection.EXPENSE_PENALTY * universe.value("expense_ratio", row))
+               for row, share, rank in funds)
+    for (a, share_a, _), (b, share_b, _) in itertools.combinations(funds, 2):
+        cost += overlap_of(a, b) * min(share_a, share_b)
+    return cost
+
+
+def test_fund_counts_and_split_percentages():
+    assert fund_count(40, None) == 1
+    assert fund_count(40, 40000) == 3 and fund_count(30, 40000) == 2 and fund_count(5, 40000) == 1
+    assert fund_count(2, 10 ** 7) == 2
+    assert split_percentage(40, 3) == [14, 13, 13]
+    assert sum(split_percentage(37, 2)) == 37
+
+
+def test_beam_search_finds_the_cheapest_selection(monkeypatch):
+    universe = random_universe(8, seed=1, min_investment=500)
+    index = FundIndex(universe)
+    holdings = random_holdings(universe, seed=1)
+    allocation = {"large_cap": 40, "mid_cap": 30, "small_cap": 20, "debt": 10}
+    monthly_investment = 40000
+
+    monkeypatch.setattr(fund_selection, "BEAM_WIDTH", 10 ** 6)
+    chosen = select_funds(index, allocation, monthly_investment, holdings, budget=10.0)
+    assert [(c, len(rows)) for c, rows in chosen] == [("large_cap", 3), ("mid_cap", 2), ("small_cap", 1), ("debt", 1)]
+
+    candidates = {c: list(index.top_rows(c, fund_selection.CANDIDATES_PER_CATEGORY)) for c in allocation}
+    flat = [row for c in allocation for row in candidates[c]]
+    matrix = pairwise_overlap(holdings, [universe.value("scheme_code", row) for row in flat])
+    position = {row: i for i, row in enumerate(flat)}
+
+    def overlap_of(a, b):
+        return matrix[position[a], position[b]]
+
+    def valid_sets(category, count):
+        return [s for s in itertools.combinations(candidates[category], count)
+                if all(overlap_of(a, b) <= fund_selection.REDUNDANT_OVERLAP for a, b in itertools.combinations(s, 2))]
+
+    best = min(
+        selection_cost(index, allocation, list(zip(allocation, sets)), overlap_of)
+        for sets in itertools.product(*[valid_sets(c, len(rows)) for c, rows in chosen])
+    )
+    assert selection_cost(index, allocation, chosen, overlap_of) == pytest.approx(best)
+    for _, rows in chosen:
+        for a, b in itertools.combinations(rows, 2):
+            assert overlap_of(a, b) <= fund_selection.REDUNDANT_OVERLAP
+
+
+def test_min_investment_limits_fund_count():
+    universe = random_universe(8, seed=2, min_investment=10000)
+    index = FundIndex(universe)
+    allocation = {"large_cap": 50, "debt": 50}
+    # 12,000 a month per category would be two funds, but none accepts 6,000
+    chosen = dict(select_funds(index, allocation, 24000))
+    assert len(chosen["large_cap"]) == 1 and len(chosen["debt"]) == 1
+    assert len(dict(select_funds(index, allocation, 40000))["debt"]) == 2
+    # Nothing accepts a 1,000 SIP: the category still gets its best fund
+    assert list(dict(select_funds(index, allocation, 2000))["debt"]) == list(index.top_rows("debt"))
+    # Without holdings or a SIP amount it is the best fund of each category
+    assert [list(rows) for _, rows in select_funds(index, allocation)] == [
+        list(index.top_rows("large_cap")), list(index.top_rows("debt"))]
+
+
+def test_selection_benchmark_on_a_large_universe():
+    """Every request returns within its time budget on a 10,000-scheme universe"""
+    universe = random_universe(10_000 // len(CATEGORIES), seed=3)
+    index = FundIndex(universe)
+    holdings = random_holdings(universe, seed=3)
+    rng = random.Random(3)
+    timings = []
+    for _ in range(50):
+        weights = [rng.randint(0, 40) for _ in CATEGORIES]
+        allocation = dict(zip(CATEGORIES, weights))
+        start = time.perf_counter()
+        chosen = select_funds(index, allocation, rng.choice([5000, 20000, 100000]), holdings)
+        timings.append(time.perf_counter() - start)
+        assert {c for c, _ in chosen} == {c for c, w in allocation.items() if w > 0}
+    # Out of time straight away: still a complete, greedy selection
+    greedy = select_funds(index, {"large_cap": 40, "mid_cap": 30, "debt": 30}, 100000, holdings, budget=0.0)
+    assert [len(rows) for _, rows in greedy] == [3, 3, 3]
+    # Without a budget the full beam is searched, however long it takes
+    allocation = {"large_cap": 40, "mid_cap": 30, "small_cap": 20, "debt": 10}
+    full = select_funds(index, allocation, 100000, holdings, budget=None)
+    assert [(c, list(r)) for c, r in full] == [(c, list(r)) for c, r in select_funds(
+        index, allocation, 100000, holdings, budget=10.0)]
+    timings.sort()
+    assert timings[len(timings) // 2] < fund_selection.TIME_BUDGET_SECONDS * 2
+
+
+def test_recommendations_spread_large_sips_across_funds():
+    server = pytest.importorskip("server")
+    advisor = server.ai_advisor
+    allocation = {"large_cap": 60, "mid_cap": 40}
+    funds = advisor._select_best_funds(allocation, 100000)
+    by_category = {}
+    for fund in funds:
+        by_category.setdefault(fund.universe.value("allocation_category", fund.row), []).append(fund)
+    assert len(by_category["large_cap"]) > 1
+    for category, selected in by_category.items():
+        assert sum(f["allocation_percentage"] for f in selected) == allocation[category]
+    codes = advisor._fund_codes(advisor._assign_fund_sips(funds, 6e6))
+    restored = advisor._record_funds(codes, allocation, 6e6)
+    assert [f["scheme_code"] for f in restored] == [f["scheme_code"] for f in funds]
+
+    # With holdings loaded, a fund duplicating another category's pick gives way to the runner-up
+    universe = advisor.fund_index.universe
+    top = {c: [universe.value("scheme_code", r) for r in advisor.fund_index.top_rows(c, 2)] for c in allocation}
+    rows = [{"scheme_code": code, "isin": isin, "stock": isin, "sector": "Financials", "weight": 50}
+            for code in (top["large_cap"][0], top["mid_cap"][0]) for isin in ("INE000001", "INE000002")]
+    rows.append({"scheme_code": top["mid_cap"][1], "isin": "INE000003", "stock": "INE000003",
+                 "sector": "Energy", "weight": 100})
+    before = [f["scheme_code"] for f in advisor._select_best_funds(allocation)]
+    assert before == [top["large_cap"][0], top["mid_cap"][0]]
+    assert len(advisor._fund_selections) > 0
+    advisor.refresh_fund_universe(universe, advisor.fund_index.metrics, FundHoldings.from_rows(rows))
+    assert len(advisor._fund_selections) == 0 and len(advisor._market_returns_sections) == 0
+    try:
+        selected = advisor._select_best_funds(allocation)
+        assert [f["scheme_code"] for f in selected] == [top["large_cap"][0], top["mid_cap"][1]]
+    finally:
+        advisor.refresh_fund_universe(universe, advisor.fund_index.metrics)
@@ -0,0 +1,198 @@
+import csv
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from fund_index import FundIndex  # noqa: E402
+from fund_universe import DEFAULT_PATH, FIELDS, RECORD_FIELDS, FundUniverse, FundUniverseStore  # noqa: E402
+
+CATEGORIES = ["large_cap", "mid_cap", "small_cap", "debt", "hybrid", "international", "elss"]
+
+
+def synthetic_rows(n, seed=0):
+    rng = random.Random(seed)
+    for i in range(n):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        yield {
+            "scheme_code": str(100000 + i),
+            "allocation_category": category,
+            "name": f"Scheme {i} {category.replace('_', ' ').title()} Fund - Direct Growth",
+            "category": category.replace('_', ' ').title(),
+            "rating": rng.choice([3.0, 3.5, 4.0, 4.5, 5.0]),
+            "returns_3y": round(rng.uniform(4, 30), 2),
+            "returns_5y": round(rng.uniform(4, 25), 2),
+            "returns_10y": round(rng.uniform(4, 20), 2),
+            "aum": round(rng.uniform(10, 50000), 2),
+            "stocks_count": rng.randint(0, 120),
+            "expense_ratio": round(rng.uniform(0.1, 2.5), 2),
+            "exit_load": rng.choice([0.0, 0.25, 0.5, 1.0]),
+            "min_investment": rng.choice([100, 500, 1000, 5000]),
+            "fund_manager": f"Manager {rng.randint(1, 400)}",
+        }
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as fh:
+        writer = csv.DictWriter(fh, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def test_shipped_universe_covers_every_allocation_category():
+    universe = FundUniverse.load(DEFAULT_PATH)
+    assert set(CATEGORIES) <= set(universe.categories)
+    elss = universe.records(universe.rows("elss"))
+    assert elss and all(f["exit_load"] == 0 for f in elss)
+
+
+def test_whole_number_fields_keep_their_source_type(tmp_path):
+    # The shipped file gives AUM in whole crores and exit loads as decimals
+    record = FundUniverse.load(DEFAULT_PATH).record(0)
+    assert record["aum"] == 25420 and type(record["aum"]) is int
+    assert record["exit_load"] == 1.0 and type(record["exit_load"]) is float
+    assert json.dumps(record["aum"]) == "25420"
+
+    rows = [dict(row, aum=int(row["aum"])) for row in synthetic_rows(20)]
+    write_csv(tmp_path / "funds.csv", rows)
+    with open(tmp_path / "funds.jsonl", "w") as fh:
+        for row in rows:
+            fh.write(json.dumps(row) + "\n")
+    for universe in (FundUniverse.from_records(rows), FundUniverse.load(str(tmp_path / "funds.csv")),
+                     FundUniverse.load(str(tmp_path / "funds.jsonl"))):
+        assert universe.integral_fields == {"aum"}
+        assert [universe.record(i)["aum"] for i in range(20)] == [row["aum"] for row in rows]
+
+
+def test_csv_and_jsonl_load_the_same_universe(tmp_path):
+    rows = list(synthetic_rows(200))
+    write_csv(tmp_path / "funds.csv", rows)
+    with open(tmp_path / "funds.jsonl", "w") as fh:
+        for row in rows:
+            fh.write(json.dumps(row) + "\n")
+
+    from_csv = FundUniverse.load(str(tmp_path / "funds.csv"))
+    from_jsonl = FundUniverse.load(str(tmp_path / "funds.jsonl"))
+    assert len(from_csv) == 200
+    assert from_csv.version == from_jsonl.version
+    assert from_csv.record(7) == from_jsonl.record(7)
+    assert from_csv.record(7)["min_investment"] == rows[7]["min_investment"]
+    with pytest.raises(ValueError):
+        FundUniverse.load(str(tmp_path / "funds.xlsx"))
+
+
+def test_store_swaps_universe_when_file_changes(tmp_path):
+    path = tmp_path / "funds.csv"
+    write_csv(path, synthetic_rows(50))
+    store = FundUniverseStore(str(path))
+    first = store.load()
+    assert store.reload_if_changed() is None
+
+    write_csv(path, synthetic_rows(80, seed=1))
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000_000))
+    second = store.reload_if_changed()
+    assert second is store.universe
+    assert len(second) == 80 and second.version != first.version
+    assert len(first) == 50  # readers holding the old universe are unaffected
+
+
+def test_reload_route_swaps_advisor_index(tmp_path, monkeypatch):
+    server = pytest.importorskip("server")
+    TestClient = pytest.importorskip("fastapi.testclient").TestClient
+    path = tmp_path / "funds.csv"
+    write_csv(path, synthetic_rows(140))
+    monkeypatch.setattr(server, "fund_store", FundUniverseStore(str(path)))
+    original_index = server.ai_advisor.fund_index
+    try:
+        response = TestClient(server.app).post("/api/funds/reload")
+        assert response.status_code == 200
+        assert response.json()["schemes"] == 140
+        assert server.ai_advisor.fund_index.version == response.json()["version"]
+    finally:
+        server.ai_advisor.refresh_fund_universe(original_index.universe)
+
+
+def test_benchmark_load_time_and_memory_at_12k_schemes(tmp_path):
+    path = tmp_path / "amfi.csv"
+    write_csv(path, synthetic_rows(12000))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    universe = FundUniverse.load(str(path))
+    load_seconds = time.perf_counter() - start
+    index = FundIndex(universe)
+    index_seconds = time.perf_counter() - start - load_seconds
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(universe) == 12000
+    assert len(index.top("large_cap", 10)) == 10
+    assert load_seconds < 2.0 and index_seconds < 1.0
+    assert current < 16e6 and peak < 64e6
+
+
+def legacy_layout(rows):
+    """The old INDIAN_MUTUAL_FUNDS layout: {category: [dict with 12 keys]}"""
+    universe = {}
+    for row in rows:
+        fund = {k: v for k, v in row.items() if k not in ("scheme_code", "allocation_category")}
+        universe.setdefault(row["allocation_category"], []).append(fund)
+    return universe
+
+
+def deep_sizeof(obj, seen=None):
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+def test_fixed_point_fields_round_trip_exactly():
+    rows = list(synthetic_rows(300))
+    universe = FundUniverse.from_records(rows)
+    for i in (0, 1, 150, 299):
+        record = universe.record(i)
+        for field in RECORD_FIELDS:
+            assert record[field] == rows[i][field], field
+    assert json.dumps(universe.record(0))  # plain Python scalars only
+
+
+def test_out_of_range_values_are_rejected():
+    rows = list(synthetic_rows(3))
+    rows[1]["rating"] = 1000.0  # would overflow int16 hundredths
+    with pytest.raises(ValueError):
+        FundUniverse.from_records(rows)
+
+
+def test_views_decode_lazily_and_layer_fields():
+    universe = FundUniverse.from_records(synthetic_rows(20))
+    view = universe.view(3)
+    assert dict(view) == universe.record(3)
+    extended = view.with_fields(allocation_percentage=40, monthly_sip=2000)
+    assert extended["monthly_sip"] == 2000 and extended["name"] == view["name"]
+    assert "monthly_sip" not in view
+    assert len(extended) == len(RECORD_FIELDS) + 2
+    with pytest.raises(KeyError):
+        view["allocation_percentage"]
+
+
+def test_benchmark_bytes_per_fund_vs_dict_layout():
+    rows = list(synthetic_rows(12000))
+    legacy = legacy_layout(rows)
+    universe = FundUniverse.from_records(rows)
+
+    dict_bytes = deep_sizeof(legacy) / len(rows)
+    columnar_bytes = universe.nbytes / len(rows)
+    assert columnar_bytes * 5 < dict_bytes
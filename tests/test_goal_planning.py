@@ -0,0 +1,136 @@
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from goal_planning import Goal, corpus, plan_goals, portfolio_return, required_return, required_sip, sip_growth_factor  # noqa: E402
+
+ALLOCATION = {'large_cap': 35, 'mid_cap': 25, 'debt': 20, 'hybrid': 15, 'international': 5}
+
+
+def simulated_corpus(monthly_sip, annual_return, months, step_up=0.0, current_savings=0.0):
+    """Month-by-month reference: end-of-month instalments, stepped up every 12"""
+    rate = annual_return / 12 / 100
+    value, instalment = current_savings, monthly_sip
+    for month in range(months):
+        if month and month % 12 == 0:
+            instalment *= 1 + step_up / 100
+        value = value * (1 + rate) + instalment
+    return value
+
+
+@pytest.mark.parametrize("annual_return,months,step_up,savings", [
+    (12.0, 120, 0.0, 0.0),
+    (12.0, 127, 10.0, 50000.0),
+    (7.5, 7, 0.0, 1000.0),
+    (0.0, 30, 5.0, 0.0),
+    (-3.0, 60, 0.0, 0.0),
+])
+def test_closed_form_matches_month_by_month(annual_return, months, step_up, savings):
+    expected = simulated_corpus(10000, annual_return, months, step_up, savings)
+    assert corpus(10000, annual_return, months, step_up, savings) == pytest.approx(expected, rel=1e-12)
+
+
+def test_no_step_up_matches_sip_value():
+    server = pytest.importorskip("server")
+    for years in (5, 10, 15):
+        expected = server.ai_advisor._calculate_sip_value(10000, 12.0, years)
+        assert 10000 * sip_growth_factor(12.0, years * 12) == pytest.approx(expected)
+
+
+def test_required_sip_reaches_target():
+    targets = np.array([5e6, 2e6, 1e5, 3e7])
+    returns = np.array([12.0, 9.0, 7.5, 14.0])
+    months = np.array([240, 120, 6, 300])
+    step_up = np.array([10.0, 0.0, 0.0, 5.0])
+    savings = np.array([2e5, 0.0, 0.0, 1e5])
+    sips = required_sip(targets, returns, months, step_up, savings)
+    np.testing.assert_allclose(corpus(sips, returns, months, step_up, savings), targets, rtol=1e-10)
+
+    # Savings that already cover the target need no SIP
+    assert required_sip(1e5, 12.0, 120, current_savings=1e5)[()] == 0
+
+
+def test_required_return_inverts_corpus():
+    rng = np.random.default_rng(3)
+    returns = rng.uniform(-5, 25, 1000)
+    months = rng.integers(12, 480, 1000)
+    step_up = rng.uniform(0, 15, 1000)
+    targets = corpus(5000, returns, months, step_up, 10000, exact=True)
+    np.testing.assert_allclose(required_return(targets, 5000, months, step_up, 10000), returns, atol=1e-6)
+
+    # Out of reach even at the top of the search range
+    assert np.isnan(required_return(1e12, 100, 12))
+
+
+def test_household_plan():
+    goals = [
+        Goal("retirement", 5e7, 25, step_up=10, current_savings=5e5),
+        Goal("education", 2.5e6, 12, inflation=8, allocation={'large_cap': 50, 'debt': 50}),
+        Goal("house", 2e6, 5, current_savings=3e5),
+    ]
+    plan = plan_goals(goals, ALLOCATION, monthly_budget=40000)
+    retirement, education, _ = plan.goals
+
+    assert retirement["expected_annual_return"] == round(portfolio_return(ALLOCATION), 2)
+    # The reported return is the 0.1% grid rate the SIP was projected at (9.75% -> 9.8%)
+    assert portfolio_return({'large_cap': 50, 'debt': 50}) == pytest.approx(9.75)
+    assert education["expected_annual_return"] == 9.8
+    assert education["monthly_sip"] == np.ceil(required_sip(2.5e6 * 1.08 ** 12, 9.8, 144))
+    assert education["target_corpus"] == pytest.approx(2.5e6 * 1.08 ** 12, rel=1e-9)
+    assert plan.total_monthly_sip == sum(goal["monthly_sip"] for goal in plan.goals)
+    assert sum(plan.fund_wise_sip.values()) == pytest.approx(plan.total_monthly_sip)
+    assert set(plan.fund_wise_sip) == set(ALLOCATION)
+
+    assert sum(goal["budget_share"] for goal in plan.goals) == pytest.approx(40000)
+    # A share below the required SIP needs a higher return than the allocation expects
+    assert plan.total_monthly_sip > 40000
+    for goal in plan.goals:
+        assert goal["budget_share"] < goal["monthly_sip"]
+        assert goal["required_annual_return"] > goal["expected_annual_return"]
+
+    with pytest.raises(ValueError):
+        plan_goals([Goal("bad", -1, 5)], ALLOCATION)
+    with pytest.raises(ValueError):
+        plan_goals([Goal("bad", 1e6, 80)], ALLOCATION)
+
+
+def test_many_goals_solved_in_milliseconds():
+    rng = np.random.default_rng(0)
+    goals = [
+        Goal(f"goal {i}", float(rng.uniform(1e5, 1e8)), int(rng.integers(1, 40)), step_up=float(rng.uniform(0, 15)))
+        for i in range(10000)
+    ]
+    start = time.perf_counter()
+    plan = plan_goals(goals[:3], ALLOCATION, monthly_budget=50000)
+    household = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sips = required_sip(
+        [g.target_corpus for g in goals], portfolio_return(ALLOCATION), [g.years * 12 for g in goals],
+        [g.step_up for g in goals],
+    )
+    batch = time.perf_counter() - start
+
+    assert len(plan.goals) == 3 and len(sips) == 10000
+    assert household < 0.05
+    assert batch < 0.05
+
+
+def test_goal_plan_route():
+    server = pytest.importorskip("server")
+    from fastapi.testclient import TestClient
+
+    client = TestClient(server.app)
+    response = client.post("/api/goal-plan", json={
+        "portfolio_allocation": ALLOCATION,
+        "goals": [{"name": "retirement", "target_corpus": 1e7, "years": 20, "step_up": 10}],
+    })
+    assert response.status_code == 200
+    assert response.json()["goals"][0]["monthly_sip"] > 0
+
+    response = client.post("/api/goal-plan", json={
+        "portfolio_allocation": {"crypto": 100}, "goals": [{"name": "x", "target_corpus": 1e6, "years": 5}],
+    })
+    assert response.status_code == 400
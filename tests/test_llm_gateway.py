@@ -0,0 +1,177 @@
+import asyncio
+
+import pytest
+
+from llm import LLMClient, LLMError
+from llm_gateway import LLMGateway, prompt_key
+
+
+class FakeProvider(LLMClient):
+    """Scripted provider: counts calls, tracks concurrency, fails on request"""
+
+    name = "fake"
+
+    def __init__(self, delay: float = 0.01, failures=(), hang: bool = False):
+        self.delay = delay
+        self.failures = list(failures)
+        self.hang = hang
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def stream(self, messages):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            if self.failures:
+                failure = self.failures.pop(0)
+                if failure is not None:
+                    raise failure
+            if self.hang:
+                await asyncio.sleep(3600)
+            for word in f"reply to {messages[-1]['content']}".split(" "):
+                await asyncio.sleep(self.delay)
+                yield word + " "
+        finally:
+            self.active -= 1
+
+
+def ask(question: str):
+    return [{"role": "system", "content": "persona"}, {"role": "user", "content": question}]
+
+
+def test_llm_client_requires_stream():
+    with pytest.raises(TypeError):
+        LLMClient()
+
+
+def test_identical_in_flight_prompts_share_one_call():
+    provider = FakeProvider()
+    gateway = LLMGateway(provider)
+
+    async def run():
+        return await asyncio.gather(*(gateway.complete(ask("What is a SIP?")) for _ in range(20)))
+
+    replies = asyncio.run(run())
+    assert provider.calls == 1
+    assert set(replies) == {"reply to What is a SIP? "}
+    assert gateway.stats()["coalesced"] == 19
+
+
+def test_late_joiner_replays_tokens_already_received():
+    provider = FakeProvider(delay=0.02)
+    gateway = LLMGateway(provider)
+
+    async def run():
+        first = asyncio.create_task(gateway.complete(ask("one two three four")))
+        await asyncio.sleep(0.05)
+        second = await gateway.complete(ask("one two three four"))
+        return await first, second
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert provider.calls == 1
+
+
+def test_normalized_prompts_hit_the_cache():
+    provider = FakeProvider(delay=0)
+    gateway = LLMGateway(provider)
+
+    async def run():
+        first = await gateway.complete(ask("What is a SIP?"))
+        second = await gateway.complete(ask("  what is a   SIP "))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert provider.calls == 1
+    assert gateway.stats()["cache"]["hits"] == 1
+    assert prompt_key("m", ask("A b?")) == prompt_key("m", ask("a  B"))
+    assert prompt_key("m", ask("a b")) != prompt_key("other", ask("a b"))
+
+
+def test_semaphore_limits_concurrency_and_records_queueing():
+    provider = FakeProvider(delay=0.01)
+    gateway = LLMGateway(provider, max_concurrency=2)
+
+    async def run():
+        await asyncio.gather(*(gateway.complete(ask(f"question {i}")) for i in range(10)))
+
+    asyncio.run(run())
+    stats = gateway.stats()
+    assert provider.calls == 10
+    assert provider.max_active == 2
+    assert stats["max_queue_depth"] >= 8
+    assert stats["queue_depth"] == 0 and stats["in_flight"] == 0
+    assert stats["wait_ms"]["max"] > 0
+
+
+def test_retryable_failures_are_retried_with_backoff():
+    provider = FakeProvider(delay=0, failures=[LLMError("429"), LLMError("503")])
+    gateway = LLMGateway(provider, retries=2, backoff_base=0.001)
+
+    reply = asyncio.run(gateway.complete(ask("retry me")))
+    assert reply == "reply to retry me "
+    assert provider.calls == 3
+    assert gateway.stats()["retries"] == 2
+
+    delays = [gateway.backoff(3) for _ in range(200)]
+    assert all(0 <= d <= 0.008 for d in delays)
+    assert len(set(delays)) > 1
+
+
+def test_non_retryable_failures_are_not_retried():
+    provider = FakeProvider(failures=[LLMError("401", retryable=False)])
+    gateway = LLMGateway(provider, retries=3, backoff_base=0.001)
+
+    with pytest.raises(LLMError):
+        asyncio.run(gateway.complete(ask("bad key")))
+    assert provider.calls == 1
+    assert gateway.stats()["failures"] == 1
+
+
+def test_timeouts_fail_every_waiting_caller():
+    provider = FakeProvider(hang=True)
+    gateway = LLMGateway(provider, timeout=0.05, retries=1, backoff_base=0.001)
+
+    async def run():
+        return await asyncio.gather(
+            *(gateway.complete(ask("stuck")) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, LLMError) for r in results)
+    stats = gateway.stats()
+    assert stats["timeouts"] == 2
+    assert provider.calls == 2
+    assert stats["cache"]["size"] == 0
+
+
+def test_failure_after_first_token_is_not_retried():
+    class BrokenMidStream(FakeProvider):
+        async def stream(self, messages):
+            self.calls += 1
+            yield "partial "
+            raise LLMError("connection reset")
+
+    provider = BrokenMidStream()
+    gateway = LLMGateway(provider, retries=3, backoff_base=0.001)
+
+    async def run():
+        tokens = []
+        with pytest.raises(LLMError):
+            async for token in gateway.stream(ask("x")):
+                tokens.append(token)
+        return tokens
+
+    assert asyncio.run(run()) == ["partial "]
+    assert provider.calls == 1
+
+
+def test_metrics_route_reports_gateway():
+    server = pytest.importorskip("server")
+    from fastapi.testclient import TestClient
+
+    body = TestClient(server.app).get("/api/metrics").json()
+    assert {"queue_depth", "wait_ms", "coalesced", "cache"} <= set(body["llm_gateway"])
@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nav_history import NavHistory, NavHistoryStore, ingest, write_generation  # noqa: E402
+
+
+def write_day(directory, day: str, navs: dict) -> str:
+    path = directory / f"nav-{day}.csv"
+    path.write_text("scheme_code,date,nav\n" + "".join(f"{code},{day},{nav}\n" for code, nav in navs.items()))
+    return str(path)
+
+
+def test_ingest_and_read_series(tmp_path):
+    store = tmp_path / "store"
+    files = [
+        write_day(tmp_path, "2024-01-01", {"alpha": 10.0, "beta": 20.0}),
+        write_day(tmp_path, "2024-01-02", {"alpha": 10.5, "beta": "N.A."}),
+        write_day(tmp_path, "2024-01-03", {"alpha": 11.0, "beta": 21.0}),
+    ]
+    history = ingest(str(store), files)
+    assert history.schemes == ("alpha", "beta") and history.days == 3
+    assert isinstance(history.navs, np.memmap) and history.navs.dtype == np.float32
+
+    alpha = history.series("alpha", "2024-01-02")
+    np.testing.assert_array_equal(alpha, [10.5, 11.0])
+    assert np.shares_memory(alpha, history.navs)
+    beta = history.series("beta")
+    assert np.isnan(beta[1]) and beta[2] == 21.0
+    dates, navs = history.published("beta")
+    assert dates.astype(str).tolist() == ["2024-01-01", "2024-01-03"] and navs.tolist() == [20.0, 21.0]
+    assert history.matrix(["beta", "alpha"], end="2024-01-01").tolist() == [[20.0], [10.0]]
+    with pytest.raises(KeyError):
+        history.series("gamma")
+
+
+def test_incremental_ingest_keeps_rows_and_swaps_generation(tmp_path):
+    store = str(tmp_path / "store")
+    first = ingest(store, [write_day(tmp_path, "2024-01-01", {"alpha": 10.0, "beta": 20.0})])
+    reader = NavHistoryStore(store)
+    assert reader.reload_if_changed().generation == 1
+    assert reader.reload_if_changed() is None
+
+    # AMFI-style dates, a new scheme, a corrected NAV and an earlier day
+    amfi = tmp_path / "amfi.csv"
+    amfi.write_text("scheme_code,date,nav\ngamma,02-Jan-2024,5.0\nbeta,01-Jan-2024,20.5\nalpha,29-Dec-2023,9.5\n")
+    second = ingest(store, [str(amfi)])
+    assert second.schemes == ("alpha", "beta", "gamma") and second.generation == 2
+    assert second.dates().astype(str).tolist() == ["2023-12-29", "2024-01-01", "2024-01-02"]
+    np.testing.assert_array_equal(second.series("alpha"), [9.5, 10.0, np.nan])
+    assert second.series("beta")[1] == 20.5
+
+    # The reader that opened the first generation still sees it
+    assert first.series("beta").tolist() == [20.0]
+    assert reader.reload_if_changed().generation == 2
+
+
+def test_open_benchmark(tmp_path):
+    """Ten years of daily NAVs: open the store and read 500 funds' series"""
+    schemes, days = 3000, 2500
+    rng = np.random.default_rng(21)
+    returns = rng.normal(0.0004, 0.01, (schemes, days))
+    navs = (10 * np.exp(np.cumsum(returns, axis=1))).astype(np.float32)
+    calendar = np.busday_offset("2014-01-01", np.arange(days), roll="forward")
+    codes = [f"scheme-{i}" for i in range(schemes)]
+    write_generation(str(tmp_path), calendar, navs, codes)
+
+    start = time.perf_counter()
+    history = NavHistory.open(str(tmp_path))
+    opened = time.perf_counter() - start
+    wanted = codes[::6]
+    start = time.perf_counter()
+    last_navs = [float(history.series(code)[-1]) for code in wanted]
+    read = time.perf_counter() - start
+    np.testing.assert_array_equal(last_navs, navs[::6, -1])
+    assert opened < 1 and read < 1
+
+
+def test_nav_route(tmp_path):
+    server = pytest.importorskip("server")
+    from fastapi.testclient import TestClient
+
+    ingest(str(tmp_path), [
+        write_day(tmp_path, "2024-01-01", {"alpha": 10.0}),
+        write_day(tmp_path, "2024-01-02", {"alpha": "N.A."}),
+        write_day(tmp_path, "2024-01-03", {"alpha": 11.25}),
+    ])
+    previous = server.nav_store
+    server.nav_store = NavHistoryStore(str(tmp_path))
+    server.nav_store.reload_if_changed()
+    try:
+        client = TestClient(server.app)
+        response = client.get("/api/funds/alpha/nav", params={"start": "2024-01-01"})
+        assert response.json() == {"scheme_code": "alpha", "dates": ["2024-01-01", "2024-01-03"],
+                                   "navs": [10.0, 11.25]}
+        assert client.get("/api/funds/unknown/nav").status_code == 404
+        assert client.get("/api/funds/alpha/nav", params={"end": "soon"}).status_code == 400
+        assert client.get("/api/metrics").json()["nav_history"]["schemes"] == 1
+    finally:
+        server.nav_store = previous
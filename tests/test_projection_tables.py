@@ -0,0 +1,111 @@
+import random
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from goal_planning import sip_growth_factor  # noqa: E402
+from market_assumptions import EXPECTED_RETURNS  # noqa: E402
+from projection_tables import (  # noqa: E402
+    MAX_MONTHS,
+    annuity_factors,
+    annuity_row,
+    growth_factors,
+    quantize_return,
+    sip_value,
+    table_stats,
+)
+
+
+def formula_sip_value(monthly_sip, annual_return, years):
+    """``_calculate_sip_value`` as it was before the tables"""
+    monthly_return = annual_return / 12 / 100
+    months = years * 12
+    if monthly_return == 0:
+        return monthly_sip * months
+    return monthly_sip * (((1 + monthly_return) ** months - 1) / monthly_return)
+
+
+def test_lookups_equal_the_formula_at_the_rounded_return():
+    rng = random.Random(18)
+    for _ in range(2000):
+        annual_return = rng.uniform(-10, 30)
+        years = rng.randint(0, 50)
+        expected = formula_sip_value(10000, quantize_return(annual_return), years)
+        assert sip_value(10000, annual_return, years * 12) == expected
+    assert sip_value(1000, 0.0, 24) == 24000
+    # Rounding to 0.1% moves a 15-year projection by well under 1%
+    assert sip_value(10000, 12.65, 180) == pytest.approx(formula_sip_value(10000, 12.65, 15), rel=0.01)
+
+
+def test_array_lookups_match_scalar_lookups():
+    returns = np.array([[12.0, 7.55], [13.2, -4.0]])
+    months = np.array([[60, 600], [0, 13]])
+    annuity = annuity_factors(returns, months)
+    growth = growth_factors(returns, months)
+    assert annuity.shape == growth.shape == (2, 2)
+    for index in np.ndindex(returns.shape):
+        assert annuity[index] == sip_value(1, float(returns[index]), int(months[index]))
+        assert growth[index] == (1 + quantize_return(float(returns[index])) / 12 / 100) ** int(months[index])
+    with pytest.raises(ValueError):
+        growth_factors(12.0, MAX_MONTHS + 1)
+    with pytest.raises(ValueError):
+        sip_value(1, 12.0, -1)
+
+
+def test_tables_are_built_lazily_once_per_return():
+    before = table_stats()["returns_tabulated"]
+    growth_factors([43.21, 43.24, 43.2], [12, 24, 36])
+    sip_value(100, 43.2, 12)
+    assert table_stats()["returns_tabulated"] == before + 1
+    with pytest.raises(ValueError):
+        sip_value(100, 250.0, 12)
+
+
+def test_projection_benchmark():
+    """Projection cost per recommendation (a ₹10,000 SIP over 5, 10 and 15 years): formula vs tables"""
+    server = pytest.importorskip("server")
+    rng = random.Random(3)
+    returns = []
+    for _ in range(2000):
+        risk_score, age = rng.randint(1, 10), rng.randint(18, 75)
+        income = rng.randint(100000, 5000000)
+        timeline = rng.choice(['1-3 years', '5-10 years', '10+ years'])
+        allocation = server.ai_advisor._calculate_optimal_allocation(risk_score, age, income, [], timeline)
+        weighted = sum(p * EXPECTED_RETURNS[c] for c, p in allocation.items()) / 100
+        returns.append(weighted * (0.9 if timeline == '1-3 years' else 1.1 if timeline == '10+ years' else 1))
+
+    def formula(annual_return):
+        return [formula_sip_value(10000, annual_return, years) for years in (5, 10, 15)]
+
+    def lookup(annual_return):
+        annuity = annuity_row(annual_return)
+        return [10000 * annuity[60], 10000 * annuity[120], 10000 * annuity[180]]
+
+    def per_request(project):
+        best = float("inf")
+        for _ in range(7):
+            start = time.perf_counter()
+            for annual_return in returns:
+                project(annual_return)
+            best = min(best, time.perf_counter() - start)
+        return best / len(returns)
+
+    for annual_return in returns:  # build the rows this set needs
+        lookup(annual_return)
+    formula_time, lookup_time = per_request(formula), per_request(lookup)
+
+    assert lookup_time < formula_time
+    for annual_return in returns[:50]:
+        assert lookup(annual_return) == formula(quantize_return(annual_return))
+
+
+def test_batch_projections_use_the_tables():
+    returns = np.random.default_rng(0).uniform(5, 15, 10000)
+    months = np.random.default_rng(1).integers(1, MAX_MONTHS, returns.size)
+    tabled = sip_growth_factor(returns, months)
+    exact = sip_growth_factor(returns, months, exact=True)
+    np.testing.assert_allclose(tabled, annuity_factors(returns, months))
+    # 0.05% of rounding compounds to at most about 2.5% over 50 years
+    np.testing.assert_allclose(tabled, exact, rtol=0.03)
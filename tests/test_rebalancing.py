@@ -0,0 +1,191 @@
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from market_assumptions import CATEGORIES  # noqa: E402
+from rebalancing import (  # noqa: E402
+    Book,
+    TaxRules,
+    book_targets,
+    category_code,
+    rebalance_book,
+    rebalance_portfolio,
+)
+
+server = pytest.importorskip("server")
+
+TARGET = {'large_cap': 50, 'mid_cap': 20, 'debt': 30}
+
+
+def scheme(category: str) -> str:
+    return server.ai_advisor.fund_index.best(category)['scheme_code']
+
+
+def plan(holdings, allocation=TARGET, **options):
+    return rebalance_portfolio(holdings, allocation, server.ai_advisor.fund_index, **options)
+
+
+def by_action(result, action):
+    return [trade for trade in result["trades"] if trade["action"] == action]
+
+
+def test_portfolio_within_tolerance_places_no_trades():
+    holdings = [
+        {"scheme_code": scheme('large_cap'), "units": 520, "nav": 100},
+        {"scheme_code": scheme('mid_cap'), "units": 180, "nav": 100},
+        {"scheme_code": scheme('debt'), "units": 300, "nav": 100},
+    ]
+    result = plan(holdings, monthly_sip=10000, redirect_months=6)
+    assert not result["rebalance_needed"]
+    assert result["drift"] == {"large_cap": 2.0, "mid_cap": -2.0, "debt": 0.0}
+    assert result["trades"] == []
+    assert result["estimated_tax"] == 0 and result["estimated_exit_load"] == 0
+
+
+def test_sip_is_redirected_to_the_gap_once_out_of_tolerance():
+    holdings = [
+        {"scheme_code": scheme('large_cap'), "units": 560, "nav": 100},
+        {"scheme_code": scheme('mid_cap'), "units": 140, "nav": 100},
+        {"scheme_code": scheme('debt'), "units": 300, "nav": 100},
+    ]
+    result = plan(holdings, monthly_sip=10000, redirect_months=3)
+    # Three months of SIPs cover the overweight, so nothing is sold and new money follows the gaps
+    assert result["rebalance_needed"] and not by_action(result, "sell")
+    redirected = {t["category"]: t["monthly_amount"] for t in by_action(result, "sip_redirect")}
+    assert redirected == {"large_cap": 3000, "mid_cap": 4000, "debt": 3000}
+
+
+def test_sells_cheapest_lots_first_and_reaches_target():
+    large_cap = scheme('large_cap')
+    holdings = [
+        # Short-term with a large gain and an exit load: expensive to sell
+        {"scheme_code": large_cap, "units": 1000, "nav": 800, "cost_per_unit": 500, "held_days": 200},
+        # Long-term, small gain: cheap
+        {"scheme_code": large_cap, "units": 5000, "nav": 50, "cost_per_unit": 49, "held_days": 900},
+        {"scheme_code": scheme('debt'), "units": 2000, "nav": 30, "held_days": 100},
+    ]
+    result = plan(holdings)
+    sells = by_action(result, "sell")
+    assert [s["units"] for s in sells] == [306.25, 5000.0]
+    assert sells[0]["exit_load"] == pytest.approx(245000 * 0.01)
+    # Short-term gain on the expensive lot: 37.5% of the sale at 20%; the LTCG is under the exemption
+    assert result["estimated_tax"] == pytest.approx(245000 * 0.375 * 0.20)
+
+    values = {c: 0.0 for c in TARGET}
+    values['large_cap'] = 1000 * 800 + 5000 * 50 - sum(s["amount"] for s in sells)
+    values['debt'] = 2000 * 30
+    for buy in by_action(result, "buy"):
+        values[buy["category"]] += buy["amount"]
+    total = sum(values.values())
+    assert total == pytest.approx(result["total_value"] - result["estimated_exit_load"])
+    for category, percentage in TARGET.items():
+        assert values[category] / total * 100 == pytest.approx(percentage, abs=0.5)
+
+
+def test_tax_rules_and_load_windows_are_inputs():
+    holdings = [
+        {"scheme_code": scheme('debt'), "units": 1000, "nav": 100, "cost_per_unit": 80, "held_days": 100},
+        {"scheme_code": scheme('large_cap'), "units": 100, "nav": 100},
+    ]
+    allocation = {'debt': 50, 'large_cap': 50}
+    default = plan(holdings, allocation)
+    lower_slab = plan(holdings, allocation, rules=TaxRules(slab_rate=0.05))
+    sold = sum(s["amount"] for s in by_action(default, "sell"))
+    assert default["estimated_tax"] == pytest.approx(sold * 0.2 * 0.30)
+    assert lower_slab["estimated_tax"] == pytest.approx(sold * 0.2 * 0.05)
+
+    large_cap = scheme('large_cap')
+    loaded = [{"scheme_code": large_cap, "units": 1000, "nav": 100, "held_days": 100},
+              {"scheme_code": scheme('debt'), "units": 100, "nav": 100}]
+    assert plan(loaded, allocation)["estimated_exit_load"] > 0
+    loaded[0]["exit_load_days"] = 90
+    assert plan(loaded, allocation)["estimated_exit_load"] == 0
+    with pytest.raises(ValueError):
+        TaxRules(slab_rate=30)
+
+
+def test_locked_elss_and_expected_inflows_limit_sales():
+    holdings = [
+        {"scheme_code": scheme('elss'), "units": 900, "nav": 100, "held_days": 400},
+        {"scheme_code": scheme('debt'), "units": 100, "nav": 100},
+    ]
+    result = plan(holdings, {'elss': 50, 'debt': 50})
+    assert result["rebalance_needed"]
+    assert not by_action(result, "sell")
+
+    holdings[0]["held_days"] = 2000
+    sold_now = sum(s["amount"] for s in by_action(plan(holdings, {'elss': 50, 'debt': 50}), "sell"))
+    with_inflows = plan(holdings, {'elss': 50, 'debt': 50}, monthly_sip=5000, redirect_months=12)
+    sold_later = sum(s["amount"] for s in by_action(with_inflows, "sell"))
+    assert sold_now == pytest.approx(40000)
+    assert sold_later == pytest.approx(40000 - 5000 * 12 / 2)
+
+
+def test_unknown_scheme_needs_a_category():
+    with pytest.raises(ValueError):
+        plan([{"scheme_code": "unlisted-fund", "units": 10, "nav": 10}])
+    result = plan([{"scheme_code": "unlisted-fund", "units": 10, "nav": 10, "allocation_category": "debt"}])
+    assert result["drift"]["debt"] == 70
+
+
+def random_book(portfolios: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    lots_per_portfolio = rng.integers(1, 10, portfolios)
+    size = int(lots_per_portfolio.sum())
+    nav = rng.uniform(10, 500, size)
+    book = Book(
+        portfolio=np.repeat(np.arange(portfolios), lots_per_portfolio),
+        category=rng.integers(0, len(CATEGORIES), size),
+        units=rng.uniform(1, 2000, size),
+        nav=nav,
+        cost=nav * rng.uniform(0.6, 1.2, size),
+        held_days=rng.integers(0, 2000, size),
+        exit_load=rng.choice([0.0, 0.25, 1.0], size),
+    )
+    weights = rng.dirichlet(np.ones(len(CATEGORIES)), portfolios)
+    return book, weights, rng.uniform(0, 50000, portfolios)
+
+
+def test_book_trades_balance_and_respect_limits():
+    book, targets, sips = random_book(2000, seed=1)
+    result = rebalance_book(book, targets, sips, redirect_months=3)
+    value = book.units * book.nav
+
+    assert (result.sell_value >= 0).all() and (result.sell_value <= value + 1e-6).all()
+    locked = (book.category == category_code('elss')) & (book.held_days < 3 * 365)
+    assert (result.sell_value[locked] == 0).all()
+    assert (result.sell_value[~result.rebalanced[book.portfolio]] == 0).all()
+
+    proceeds = np.bincount(book.portfolio, weights=result.sell_value - result.exit_load_cost, minlength=2000)
+    np.testing.assert_allclose(result.buy_value.sum(axis=1), proceeds, atol=1e-6)
+    np.testing.assert_allclose(result.sip_split.sum(axis=1), sips)
+
+
+def test_whole_book_benchmark():
+    """Nightly run: every portfolio of a 200k-portfolio book in one vectorized pass"""
+    portfolios = 200000
+    book, targets, sips = random_book(portfolios, seed=2)
+    start = time.perf_counter()
+    result = rebalance_book(book, targets, sips)
+    elapsed = time.perf_counter() - start
+    assert result.rebalanced.any()
+    assert elapsed < 10
+
+
+def test_book_targets_and_rebalance_route():
+    assert book_targets([TARGET])[0].sum() == pytest.approx(1)
+    from fastapi.testclient import TestClient
+
+    client = TestClient(server.app)
+    holdings = [{"scheme_code": scheme('large_cap'), "units": 100, "nav": 100}]
+    response = client.post("/api/rebalance", json={"holdings": holdings, "portfolio_allocation": TARGET})
+    assert response.status_code == 200
+    assert response.json()["drift"]["large_cap"] == 50
+    assert client.post("/api/rebalance", json={
+        "holdings": [{"scheme_code": "nope", "units": 1, "nav": 1}], "portfolio_allocation": TARGET,
+    }).status_code == 400
+    assert client.post("/api/rebalance", json={
+        "holdings": holdings, "portfolio_allocation": TARGET, "tax_slab_rate": 30,
+    }).status_code == 400
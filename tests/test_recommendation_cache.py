@@ -0,0 +1,115 @@
+import asyncio
+import random
+
+import pytest
+
+server = pytest.importorskip("server")
+
+from fund_universe import FundUniverse  # noqa: E402
+from recommendation_cache import RecommendationCache, recommendation_fingerprint  # noqa: E402
+from risk_engine import analyze_profiles  # noqa: E402
+
+GOALS = ["retirement", "education", "wealth", "tax"]
+TIMELINES = ["1-3 years", "3-5 years", "5-10 years", "10+ years"]
+
+
+def random_profile(rng):
+    return {
+        "name": rng.choice(["Asha", "Vikram", "Meera"]),
+        "age": rng.randint(20, 70),
+        "occupation": rng.choice(["Teacher", "Software Engineer", "Business owner", "Doctor"]),
+        "income": float(rng.randint(2, 40) * 100000),
+        "investment_experience": rng.choice(["beginner", "intermediate", "experienced"]),
+        "risk_tolerance": rng.choice(["low", "moderate", "high"]),
+        "financial_goals": rng.sample(GOALS, rng.randint(0, 3)),
+        "investment_timeline": rng.choice(TIMELINES),
+    }
+
+
+def recommend(advisor, profile, analysis):
+    return asyncio.run(advisor.generate_investment_recommendations(profile, analysis))
+
+
+def test_cached_recommendations_match_uncached():
+    rng = random.Random(5)
+    profiles = [random_profile(rng) for _ in range(300)]
+    analyses = analyze_profiles(profiles)
+
+    cached = server.EnhancedFinancialAdvisorAI(server.fund_store.universe)
+    uncached = server.EnhancedFinancialAdvisorAI(server.fund_store.universe)
+    uncached.recommendation_cache = RecommendationCache(max_entries=0)
+
+    for profile, analysis in zip(profiles * 2, analyses * 2):
+        assert recommend(cached, profile, analysis) == recommend(uncached, profile, analysis)
+    stats = cached.recommendation_cache.stats()
+    assert stats["hits"] >= 300
+    assert stats["size"] <= 300
+
+
+def test_cached_core_is_not_mutated_by_callers():
+    advisor = server.EnhancedFinancialAdvisorAI(server.fund_store.universe)
+    profile = {"name": "Asha", "age": 28, "income": 900000.0, "financial_goals": ["tax"],
+               "investment_timeline": "10+ years"}
+    analysis = analyze_profiles([profile])[0]
+    first = recommend(advisor, profile, analysis)
+    first["portfolio_allocation"]["debt"] = 99
+    assert recommend(advisor, profile, analysis)["portfolio_allocation"] != first["portfolio_allocation"]
+    with pytest.raises(TypeError):
+        first["mutual_funds"][0]["monthly_sip"] = -1  # fund entries are read-only views
+
+
+def test_fingerprint_is_canonical():
+    a = recommendation_fingerprint(6, 28, ["tax", "wealth"])
+    assert a == recommendation_fingerprint(6, 29, ["education", "tax", "tax"])
+    assert a != recommendation_fingerprint(6, 31, ["tax", "wealth"])
+    assert a != recommendation_fingerprint(6, 28, ["wealth"])
+    assert a != recommendation_fingerprint(6, 28, ["tax", "retirement"])
+    assert a != recommendation_fingerprint(7, 28, ["tax", "wealth"])
+
+
+def test_lru_eviction_ttl_and_version_invalidation(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("ttl_cache.time.monotonic", lambda: clock[0])
+    cache = RecommendationCache(max_entries=2, ttl_seconds=60)
+    cache.bind_version("v1")
+
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1       # a is now most recently used
+    cache.put("c", 3)                # evicts b
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    clock[0] += 61
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+    cache.put("d", 4)
+    cache.bind_version("v1")
+    assert cache.get("d") == 4
+    cache.bind_version("v2")
+    assert cache.get("d") is None
+    stats = cache.stats()
+    assert stats["invalidations"] == 1
+    assert stats["hits"] == 2 and stats["misses"] == 3
+
+
+def test_refresh_fund_universe_invalidates():
+    advisor = server.EnhancedFinancialAdvisorAI(server.fund_store.universe)
+    profile = {"age": 35, "income": 600000.0, "financial_goals": [], "investment_timeline": "5-10 years"}
+    analysis = analyze_profiles([profile])[0]
+    before = recommend(advisor, profile, analysis)
+
+    universe = server.fund_store.universe
+    records = []
+    for category in universe.categories:
+        for record in universe.records(universe.rows(category)):
+            records.append(dict(record, allocation_category=category))
+    runner_up = [r for r in records if r["allocation_category"] == "large_cap"][1]
+    runner_up["rating"] = 5.0
+    advisor.refresh_fund_universe(FundUniverse.from_records(records))
+
+    after = recommend(advisor, profile, analysis)
+    assert before["mutual_funds"][0]["name"] != after["mutual_funds"][0]["name"]
+    assert after["mutual_funds"][0]["name"] == runner_up["name"]
+    assert advisor.recommendation_cache.stats()["invalidations"] == 1
@@ -0,0 +1,109 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from database import RECOMMENDATION_TEXT_FIELDS, Database, parse_recommendation_sections
+
+mongomock = pytest.importorskip("mongomock")
+server = pytest.importorskip("server")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+PROFILE = {
+    "user_id": "u1", "name": "Asha", "age": 31, "occupation": "Software Engineer", "income": 1800000.0,
+    "current_savings": 400000.0, "investment_experience": "intermediate", "risk_tolerance": "moderate",
+    "financial_goals": ["tax", "retirement"], "investment_timeline": "10+ years",
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    database = Database(mongomock.MongoClient(), "investwise_test", executor_workers=2)
+    database.db.users.insert_one(dict(PROFILE))
+    analysis = asyncio.run(server.ai_advisor.analyze_behavioral_profile(PROFILE))
+    database.db.assessments.insert_one({"user_id": "u1", **analysis, "created_at": datetime.now()})
+    monkeypatch.setattr(server, "database", database)
+    yield TestClient(server.app), database
+    database.close()
+
+
+def test_parse_recommendation_sections():
+    assert parse_recommendation_sections(None) == RECOMMENDATION_TEXT_FIELDS
+    assert parse_recommendation_sections("") == ()
+    assert parse_recommendation_sections(" tax_implications,rationale ,") == ("rationale", "tax_implications")
+    with pytest.raises(ValueError):
+        parse_recommendation_sections("rationale,summary")
+
+
+def test_include_selects_sections_and_the_rest_render_on_demand(client):
+    client, database = client
+    full = client.post("/api/investment-recommendations", params={"user_id": "u1"}).json()
+    sparse = client.post("/api/investment-recommendations", params={"user_id": "u1", "include": ""}).json()
+
+    assert set(RECOMMENDATION_TEXT_FIELDS) <= set(full)
+    assert not set(RECOMMENDATION_TEXT_FIELDS) & set(sparse)
+    assert sparse["portfolio_allocation"] == full["portfolio_allocation"]
+    assert len(json.dumps(sparse)) < len(json.dumps(full)) / 2
+
+    for name in RECOMMENDATION_TEXT_FIELDS:
+        response = client.get(f"/api/recommendations/{sparse['recommendation_id']}/sections/{name}")
+        assert response.status_code == 200
+        assert response.json()["content"] == full[name]
+
+    stored = database.db.recommendations.find_one({"user_id": "u1"})
+    assert not set(RECOMMENDATION_TEXT_FIELDS) & set(stored)
+    assert stored["parameters"]["name"] == "Asha"
+
+    partial = client.post("/api/investment-recommendations",
+                          params={"user_id": "u1", "include": "rationale"}).json()
+    assert partial["rationale"] == full["rationale"]
+    assert "tax_implications" not in partial
+
+
+def test_unrequested_sections_are_not_rendered(client, monkeypatch):
+    client, _ = client
+    rendered = []
+    original = server.ai_advisor.render_recommendation_section
+
+    def counting(name, parameters, allocation):
+        rendered.append(name)
+        return original(name, parameters, allocation)
+
+    monkeypatch.setattr(server.ai_advisor, "render_recommendation_section", counting)
+    client.post("/api/investment-recommendations", params={"user_id": "u1", "include": "rationale"})
+    assert rendered == ["rationale"]
+
+
+def test_section_errors(client):
+    client, _ = client
+    assert client.post("/api/investment-recommendations",
+                       params={"user_id": "u1", "include": "summary"}).status_code == 400
+    assert client.post("/api/investment-recommendations", params={"user_id": "missing"}).status_code == 404
+    assert client.get("/api/recommendations/missing/sections/rationale").status_code == 404
+    recommendation_id = client.post("/api/investment-recommendations",
+                                    params={"user_id": "u1", "include": ""}).json()["recommendation_id"]
+    assert client.get(f"/api/recommendations/{recommendation_id}/sections/summary").status_code == 404
+
+
+def test_legacy_documents_serve_stored_text(client):
+    client, database = client
+    database.db.recommendations.insert_one({
+        "recommendation_id": "legacy", "user_id": "u1", "portfolio_allocation": {"debt": 100},
+        "rationale": "stored rationale", "created_at": datetime.now(),
+    })
+    response = client.get("/api/recommendations/legacy/sections/rationale")
+    assert response.json()["content"] == "stored rationale"
+
+
+def test_dashboard_renders_requested_sections():
+    parameters = server.ai_advisor.recommendation_parameters(
+        PROFILE, asyncio.run(server.ai_advisor.analyze_behavioral_profile(PROFILE)))
+    allocation = {"large_cap": 60, "debt": 40}
+    recommendation = {"parameters": parameters, "portfolio_allocation": allocation}
+
+    filled = server.ai_advisor.expand_recommendation(recommendation, {"tax_implications"})
+    assert filled == {
+        "tax_implications": server.ai_advisor.render_recommendation_section("tax_implications", parameters, allocation),
+    }
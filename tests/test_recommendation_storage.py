@@ -0,0 +1,148 @@
+import asyncio
+import random
+
+import pytest
+
+from database import RECOMMENDATION_TEXT_FIELDS, Database
+
+mongomock = pytest.importorskip("mongomock")
+bson = pytest.importorskip("bson")
+server = pytest.importorskip("server")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+GOALS = ["retirement", "tax", "house", "education", "wealth"]
+TIMELINES = ["1-3 years", "3-5 years", "5-10 years", "10+ years"]
+EXPERIENCE = ["beginner", "intermediate", "advanced"]
+
+
+def random_profile(rng: random.Random, user_id: str) -> dict:
+    return {
+        "user_id": user_id, "name": f"User {user_id}", "age": rng.randint(21, 70),
+        "occupation": rng.choice(["Software Engineer", "Teacher", "Doctor", "Business Owner"]),
+        "income": float(rng.randrange(300000, 5000000, 10000)), "current_savings": 100000.0,
+        "investment_experience": rng.choice(EXPERIENCE), "risk_tolerance": "moderate",
+        "financial_goals": rng.sample(GOALS, rng.randint(1, 3)), "investment_timeline": rng.choice(TIMELINES),
+    }
+
+
+def generate(profile: dict):
+    advisor = server.ai_advisor
+    analysis = asyncio.run(advisor.analyze_behavioral_profile(profile))
+    recommendations = asyncio.run(advisor.generate_investment_recommendations(profile, analysis))
+    record = advisor.recommendation_record(
+        profile["user_id"], recommendations, advisor.recommendation_parameters(profile, analysis)
+    )
+    return recommendations, record
+
+
+def plain(value):
+    """Plain-data form of a response; fund views become dicts"""
+    if isinstance(value, dict) or hasattr(value, "keys"):
+        return {key: plain(value[key]) for key in value}
+    if isinstance(value, list):
+        return [plain(item) for item in value]
+    return value
+
+
+def legacy_document(profile: dict, recommendations: dict, record: dict) -> dict:
+    """What the recommendations route stored per request before records were compacted"""
+    return {
+        "recommendation_id": record["recommendation_id"],
+        "user_id": profile["user_id"],
+        **plain(recommendations),
+        "created_at": record["created_at"],
+    }
+
+
+def test_record_expands_to_the_generated_recommendation():
+    rng = random.Random(16)
+    for i in range(50):
+        recommendations, record = generate(random_profile(rng, f"u{i}"))
+        assert not set(RECOMMENDATION_TEXT_FIELDS) & set(record)
+
+        stored = bson.decode(bson.encode(record))
+        expanded = server.ai_advisor.expand_recommendation(stored, set(recommendations))
+        assert plain({name: expanded[name] for name in recommendations}) == plain(recommendations)
+        assert not {"parameters", "fund_codes"} & set(expanded)
+
+
+def test_funds_missing_from_the_universe_are_flagged():
+    _, record = generate(random_profile(random.Random(1), "u1"))
+    category = next(iter(record["fund_codes"]))
+    record["fund_codes"][category] = "DELISTED"
+    percentage = record["portfolio_allocation"][category]
+    funds = server.ai_advisor.expand_recommendation(record, {"mutual_funds"})["mutual_funds"]
+    missing = [fund for fund in funds if fund["scheme_code"] == "DELISTED"]
+    assert missing == [{
+        "scheme_code": "DELISTED", "available": False,
+        "allocation_percentage": percentage, "monthly_sip": missing[0]["monthly_sip"],
+    }]
+    assert "parameters" not in record and "fund_codes" not in record
+
+
+@pytest.fixture
+def user_database(monkeypatch):
+    profile = random_profile(random.Random(2), "u1")
+    database = Database(mongomock.MongoClient(), "investwise_test", executor_workers=2)
+    database.db.users.insert_one(dict(profile))
+    analysis = asyncio.run(server.ai_advisor.analyze_behavioral_profile(profile))
+    database.db.assessments.insert_one({"user_id": "u1", **analysis, "created_at": server.datetime.now()})
+    monkeypatch.setattr(server, "database", database)
+    yield profile, database
+    database.close()
+
+
+def test_route_keeps_one_record_per_user(user_database):
+    _, database = user_database
+    client = TestClient(server.app)
+    first = client.post("/api/investment-recommendations", params={"user_id": "u1"}).json()
+    second = client.post("/api/investment-recommendations", params={"user_id": "u1", "include": ""}).json()
+    assert database.db.recommendations.count_documents({"user_id": "u1"}) == 1
+
+    # The id is stable per user, so section URLs a client holds keep working
+    stored = database.db.recommendations.find_one({"user_id": "u1"})
+    assert stored["recommendation_id"] == first["recommendation_id"] == second["recommendation_id"]
+    section = client.get(f"/api/recommendations/{second['recommendation_id']}/sections/rationale").json()
+    assert section["content"] == first["rationale"]
+
+
+def test_new_record_replaces_a_legacy_document(user_database):
+    profile, database = user_database
+    recommendations, record = generate(profile)
+    legacy = legacy_document(profile, recommendations, record)
+    legacy.update(recommendation_id="legacy", rationale="old rationale", rebalancing_frequency="old frequency")
+    database.db.recommendations.insert_one(legacy)
+
+    client = TestClient(server.app)
+    fresh = client.post("/api/investment-recommendations", params={"user_id": "u1"}).json()
+    stored = database.db.recommendations.find_one({"user_id": "u1"}, {"_id": 0})
+    assert set(stored) == set(record)
+    section = client.get(f"/api/recommendations/{fresh['recommendation_id']}/sections/rationale").json()
+    assert section["content"] == fresh["rationale"] != "old rationale"
+    assert client.get("/api/recommendations/legacy/sections/rationale").status_code == 404
+
+    # Records from the nightly job replace documents the same way
+    database.db.recommendations.replace_one({"user_id": "u1"}, legacy)
+    assert asyncio.run(database.recommendations.upsert_many([record])) == {}
+    assert set(database.db.recommendations.find_one({"user_id": "u1"}, {"_id": 0})) == set(record)
+    # A merged document still re-renders its text from its parameters
+    merged = dict(record, rationale="old rationale")
+    assert server.ai_advisor.stored_section(merged, "rationale") == fresh["rationale"]
+    assert server.ai_advisor.expand_recommendation(merged, {"rebalancing_frequency"})["rebalancing_frequency"] \
+        == fresh["rebalancing_frequency"]
+
+
+def test_storage_per_user_benchmark():
+    """BSON bytes per user: full per-request documents vs one compact record"""
+    rng = random.Random(1000)
+    legacy_bytes = compact_bytes = 0
+    samples = 500
+    for i in range(samples):
+        profile = random_profile(rng, f"user-{i:07d}")
+        recommendations, record = generate(profile)
+        legacy_bytes += len(bson.encode(legacy_document(profile, recommendations, record)))
+        compact_bytes += len(bson.encode(record))
+
+    # The old layout appended a full document per request; one of them is already 5x the record
+    assert compact_bytes * 5 < legacy_bytes
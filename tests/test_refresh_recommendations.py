@@ -0,0 +1,118 @@
+import asyncio
+import random
+
+import pytest
+
+from database import Database
+
+mongomock = pytest.importorskip("mongomock")
+advisor = pytest.importorskip("advisor")
+
+from refresh_recommendations import JOB_NAME, refresh_all  # noqa: E402
+
+GOALS = ["retirement", "tax", "house", "education", "wealth"]
+TIMELINES = ["1-3 years", "3-5 years", "5-10 years", "10+ years"]
+
+
+def seeded_database(users: int) -> Database:
+    rng = random.Random(20)
+    database = Database(mongomock.MongoClient(), "investwise_test", executor_workers=4)
+    database.db.users.insert_many([
+        {
+            "user_id": f"user-{i:06d}", "name": f"User {i}", "age": rng.randint(21, 70),
+            "occupation": "Teacher", "income": float(rng.randrange(300000, 5000000, 10000)),
+            "current_savings": 100000.0, "investment_experience": rng.choice(["beginner", "advanced"]),
+            "risk_tolerance": rng.choice(["conservative", "moderate", "aggressive"]),
+            "financial_goals": rng.sample(GOALS, rng.randint(1, 3)), "investment_timeline": rng.choice(TIMELINES),
+        }
+        for i in range(users)
+    ])
+    return database
+
+
+def run(database: Database, **options) -> dict:
+    return asyncio.run(refresh_all(database, **options))
+
+
+def test_refreshes_every_user_once():
+    database = seeded_database(250)
+    summary = run(database, chunk_size=40, workers=0)
+    assert summary["completed"] and summary["processed"] == 250 and summary["failed"] == 0
+
+    records = list(database.db.recommendations.find({}, {"_id": 0}))
+    assert len(records) == 250 == len({r["user_id"] for r in records})
+    assert all(r["fund_codes"] and r["parameters"]["name"] for r in records)
+    assert database.db.assessments.count_documents({}) == 250
+    checkpoint = database.db.job_checkpoints.find_one({"_id": JOB_NAME})
+    assert checkpoint["completed"] and checkpoint["last_user_id"] == "user-000249"
+
+    # A finished run is followed by a new one, which replaces the records
+    second = run(database, chunk_size=100, workers=0)
+    assert second["run_id"] != summary["run_id"] and second["resumed_from"] is None
+    assert database.db.recommendations.count_documents({}) == 250
+    assert database.db.assessments.count_documents({}) == 500
+
+
+def test_interrupted_run_resumes_from_checkpoint():
+    database = seeded_database(200)
+    first = run(database, chunk_size=30, workers=0, limit=90)
+    assert not first["completed"] and first["processed"] == 90
+    assert database.db.job_checkpoints.find_one({"_id": JOB_NAME})["last_user_id"] == "user-000089"
+
+    rest = run(database, chunk_size=30, workers=0)
+    assert rest["run_id"] == first["run_id"] and rest["resumed_from"] == "user-000089"
+    assert rest["completed"] and rest["processed"] == 110
+    assert database.db.assessments.count_documents({}) == 200
+    assert database.db.recommendations.count_documents({}) == 200
+
+    # Rewriting chunks already stored (a crash between write and checkpoint) adds nothing
+    database.db.job_checkpoints.update_one({"_id": JOB_NAME}, {"$set": {"completed": False, "last_user_id": None}})
+    again = run(database, chunk_size=50, workers=0)
+    assert again["run_id"] == first["run_id"] and again["failed"] == 0
+    assert database.db.assessments.count_documents({}) == 200
+
+
+def test_process_pool_refresh():
+    database = seeded_database(120)
+    summary = run(database, chunk_size=30, workers=2, restart=True)
+    assert summary["completed"] and summary["processed"] == 120 and summary["failed"] == 0
+    assert database.db.recommendations.count_documents({}) == 120
+
+
+def test_resumed_run_retries_failed_users(monkeypatch):
+    database = seeded_database(120)
+    record = advisor.EnhancedFinancialAdvisorAI.recommendation_record
+
+    def failing_record(self, user_id, *args):
+        if user_id == "user-000007":
+            raise RuntimeError("boom")
+        return record(self, user_id, *args)
+
+    monkeypatch.setattr(advisor.EnhancedFinancialAdvisorAI, "recommendation_record", failing_record)
+    first = run(database, chunk_size=20, workers=0, limit=60)
+    assert first["failed"] == 1 and first["still_failing"] == 1
+    checkpoint = database.db.job_checkpoints.find_one({"_id": JOB_NAME})
+    assert checkpoint["failed_user_ids"] == ["user-000007"] and checkpoint["last_user_id"] == "user-000059"
+    assert not database.db.recommendations.find_one({"user_id": "user-000007"})
+
+    monkeypatch.setattr(advisor.EnhancedFinancialAdvisorAI, "recommendation_record", record)
+    rest = run(database, chunk_size=20, workers=0)
+    assert rest["retried"] == 1 and rest["still_failing"] == 0 and rest["processed"] == 60
+    assert database.db.recommendations.find_one({"user_id": "user-000007"})
+    checkpoint = database.db.job_checkpoints.find_one({"_id": JOB_NAME})
+    assert checkpoint["failed_user_ids"] == [] and checkpoint["failed"] == 0
+    assert database.db.recommendations.count_documents({}) == 120
+
+
+def test_malformed_user_fails_alone():
+    database = seeded_database(100)
+    database.db.users.update_one({"user_id": "user-000042"}, {"$set": {"age": None}})
+    database.db.users.update_one({"user_id": "user-000043"}, {"$set": {"financial_goals": None}})
+    summary = run(database, chunk_size=25, workers=0)
+    assert summary["completed"] and summary["processed"] == 100 and summary["failed"] == 2
+    checkpoint = database.db.job_checkpoints.find_one({"_id": JOB_NAME})
+    assert checkpoint["failed_user_ids"] == ["user-000042", "user-000043"]
+    assert checkpoint["last_user_id"] == "user-000099"
+    assert database.db.recommendations.count_documents({}) == 98
+    assert database.db.assessments.count_documents({}) == 98
+
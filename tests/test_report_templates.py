@@ -0,0 +1,361 @@
+import random
+import time
+import tracemalloc
+from typing import List
+
+import pytest
+
+from market_assumptions import EXPECTED_RETURNS
+from report_templates import INVESTMENT_STRATEGY, TAX_IMPLICATIONS, Template
+
+server = pytest.importorskip("server")
+
+
+class LegacyReports:
+    """The report builders as they were before report_templates"""
+
+    def _generate_comprehensive_rationale(self, user_data: dict, behavioral_analysis: dict, allocation: dict) -> str:
+        """Generate comprehensive investment rationale"""
+        
+        age = user_data.get('age', 30)
+        income = user_data.get('income', 500000)
+        profile = behavioral_analysis['behavioral_profile']
+        personality = behavioral_analysis['investment_personality']
+        
+        rationale = f"""
+        **Personalized Investment Strategy for {user_data.get('name', 'You')}**
+
+        **Your Profile Analysis:**
+        - Age: {age} years ({self._get_age_advantage(age)})
+        - Risk Profile: {profile}
+        - Investment Personality: {personality}
+        - Annual Income: ₹{income:,}
+
+        **Why This Allocation Works:**
+
+        🎯 **Age-Appropriate Strategy**: At {age}, you have a {"long" if age < 40 else "moderate" if age < 55 else "short"} investment horizon, allowing for {"higher growth potential" if age < 40 else "balanced growth with stability" if age < 55 else "capital preservation focus"}.
+
+        💡 **Behavioral Considerations**: 
+        """
+        
+        biases = behavioral_analysis.get('behavioral_biases', [])
+        for bias in biases:
+            if bias == 'loss_aversion':
+                rationale += "- Your conservative approach is balanced with growth assets to beat inflation while preserving capital.\n"
+            elif bias == 'overconfidence_bias':
+                rationale += "- Diversified approach prevents over-concentration and emotional decision-making.\n"
+            elif bias == 'herding_behavior':
+                rationale += "- Systematic investment approach helps avoid market timing and crowd psychology.\n"
+            elif bias == 'sector_bias':
+                rationale += "- Multi-sector diversification reduces concentration risk in your familiar sectors.\n"
+        
+        rationale += f"""
+        📊 **Portfolio Rationale**:
+        """
+        
+        if allocation.get('large_cap', 0) > 0:
+            rationale += f"- **Large Cap ({allocation['large_cap']}%)**: Provides stability and consistent returns from established companies.\n"
+        
+        if allocation.get('mid_cap', 0) > 0:
+            rationale += f"- **Mid Cap ({allocation['mid_cap']}%)**: Captures growth potential of emerging companies with higher returns.\n"
+        
+        if allocation.get('small_cap', 0) > 0:
+            rationale += f"- **Small Cap ({allocation['small_cap']}%)**: High growth potential for long-term wealth creation.\n"
+        
+        if allocation.get('debt', 0) > 0:
+            rationale += f"- **Debt Funds ({allocation['debt']}%)**: Provides stability, regular income, and reduces overall portfolio volatility.\n"
+        
+        if allocation.get('hybrid', 0) > 0:
+            rationale += f"- **Hybrid Funds ({allocation['hybrid']}%)**: Balanced approach with automatic rebalancing between equity and debt.\n"
+        
+        if allocation.get('international', 0) > 0:
+            rationale += f"- **International Funds ({allocation['international']}%)**: Global diversification and currency hedging.\n"
+        
+        rationale += """
+        🇮🇳 **Indian Market Context**: This allocation considers Indian market cycles, monsoon impact, budget announcements, and festival season volatility.
+        """
+        
+        return rationale
+
+    def _get_age_advantage(self, age: int) -> str:
+        """Get age-based investment advantage"""
+        if age < 25:
+            return "Maximum time for compounding"
+        elif age < 35:
+            return "Strong compounding advantage"
+        elif age < 45:
+            return "Good wealth building phase"
+        elif age < 55:
+            return "Wealth consolidation phase"
+        else:
+            return "Wealth preservation phase"
+
+    def _generate_enhanced_risk_mitigation(self, behavioral_analysis: dict, user_data: dict) -> str:
+        """Generate enhanced risk mitigation strategies"""
+        
+        strategies = []
+        biases = behavioral_analysis.get('behavioral_biases', [])
+        risk_score = behavioral_analysis.get('risk_score', 5)
+        
+        # Universal strategies
+        strategies.append("🎯 **SIP Strategy**: Invest through Systematic Investment Plans to average out market volatility")
+        strategies.append("⏰ **Time Diversification**: Stay invested for at least 5-7 years to ride out market cycles")
+        strategies.append("🔄 **Regular Rebalancing**: Review and rebalance portfolio annually or when allocation drifts by 5%")
+        
+        # Bias-specific strategies
+        if 'loss_aversion' in biases:
+            strategies.append("💪 **Confidence Building**: Start with conservative allocation and gradually increase risk as comfort grows")
+            strategies.append("📈 **Focus on Long-term**: Avoid checking portfolio daily; review monthly or quarterly")
+        
+        if 'overconfidence_bias' in biases:
+            strategies.append("🎓 **Continuous Learning**: Stay updated with market research but avoid frequent changes")
+            strategies.append("📊 **Stick to Plan**: Resist urge to time the market or chase hot funds")
+        
+        if 'herding_behavior' in biases:
+            strategies.append("🧠 **Independent Thinking**: Make decisions based on your goals, not market noise")
+            strategies.append("📰 **Limit Media Exposure**: Reduce consumption of daily market news and tips")
+        
+        if 'sector_bias' in biases:
+            strategies.append("🌐 **Diversification**: Maintain exposure across different sectors and market caps")
+            strategies.append("🔍 **Fund Selection**: Choose funds with diverse holdings across sectors")
+        
+        # Risk score specific strategies
+        if risk_score <= 3:
+            strategies.append("🛡️ **Emergency Fund**: Maintain 6-12 months of expenses in liquid funds")
+            strategies.append("📋 **Asset Allocation**: Maintain 60-70% in low-risk instruments initially")
+        elif risk_score >= 8:
+            strategies.append("⚖️ **Risk Management**: Never invest more than 10% in any single fund")
+            strategies.append("💰 **Profit Booking**: Book profits when equity allocation exceeds target by 10%")
+        
+        # Indian market specific
+        strategies.append("🇮🇳 **Indian Market Cycles**: Understand and prepare for budget, monsoon, and festival impacts")
+        strategies.append("💸 **Tax Planning**: Optimize investments for tax efficiency under Indian tax laws")
+        strategies.append("🏛️ **Regulatory Awareness**: Stay informed about SEBI regulations and fund changes")
+        
+        return "\n".join(strategies)
+
+    def _calculate_indian_market_returns(self, allocation: dict, risk_score: int, timeline: str) -> str:
+        """Calculate expected returns with Indian market context"""
+        
+        # Expected returns by asset class (post-tax, inflation-adjusted)
+        returns = EXPECTED_RETURNS
+        
+        # Calculate weighted average return
+        weighted_return = 0
+        for category, percentage in allocation.items():
+            if category in returns:
+                weighted_return += (percentage * returns[category]) / 100
+        
+        # Timeline adjustments
+        if '1-3 years' in timeline:
+            weighted_return *= 0.9  # Lower returns for short term
+        elif '10+ years' in timeline:
+            weighted_return *= 1.1  # Higher returns for long term
+        
+        # Risk adjustments
+        if risk_score <= 3:
+            lower_range = weighted_return - 2
+            upper_range = weighted_return + 1
+        elif risk_score >= 8:
+            lower_range = weighted_return - 3
+            upper_range = weighted_return + 4
+        else:
+            lower_range = weighted_return - 2
+            upper_range = weighted_return + 2
+        
+        return f"""
+        **Expected Returns (Indian Market Context):**
+        
+        📊 **Annual Returns**: {lower_range:.1f}% - {upper_range:.1f}%
+        📈 **Average Expected**: {weighted_return:.1f}%
+        
+        **Growth Projections:**
+        - **5 Years**: ₹10,000 SIP → ₹{self._calculate_sip_value(10000, weighted_return, 5):,.0f}
+        - **10 Years**: ₹10,000 SIP → ₹{self._calculate_sip_value(10000, weighted_return, 10):,.0f}
+        - **15 Years**: ₹10,000 SIP → ₹{self._calculate_sip_value(10000, weighted_return, 15):,.0f}
+        
+        **Important Notes:**
+        - Returns are subject to market risks and past performance doesn't guarantee future results
+        - Consider inflation (avg. 6% in India) when evaluating real returns
+        - Actual returns may vary based on market conditions and fund performance
+        """
+
+    def _calculate_sip_value(self, monthly_sip: int, annual_return: float, years: int) -> float:
+        """Calculate SIP maturity value"""
+        monthly_return = annual_return / 12 / 100
+        months = years * 12
+        
+        if monthly_return == 0:
+            return monthly_sip * months
+        
+        future_value = monthly_sip * (((1 + monthly_return) ** months - 1) / monthly_return)
+        return future_value
+
+    def _generate_tax_implications(self, allocation: dict, goals: List[str], income: float) -> str:
+        """Generate tax implications for Indian investors"""
+        
+        tax_info = """
+        **Tax Implications (Indian Tax Laws):**
+        
+        📋 **Equity Funds Taxation**:
+        - **Short-term** (< 1 year): 15% tax on gains
+        - **Long-term** (> 1 year): 10% tax on gains above ₹1 lakh annually
+        
+        📋 **Debt Funds Taxation**:
+        - **Short-term** (< 3 years): Added to income, taxed as per slab
+        - **Long-term** (> 3 years): 20% with indexation benefit
+        
+        📋 **Tax-Saving Opportunities**:
+        """
+        
+        if 'tax' in goals:
+            tax_info += "- **ELSS Funds**: ₹1.5 lakh tax deduction under Section 80C\n"
+        
+        if income > 1000000:
+            tax_info += "- **Tax Harvesting**: Book losses to offset gains\n"
+        
+        tax_info += """
+        - **SIP Benefits**: No TDS on SIP investments
+        - **Dividend Tax**: Dividend income taxed as per income slab
+        
+        💡 **Tax Planning Tips**:
+        - Hold equity funds for >1 year to get long-term capital gains benefit
+        - Use debt funds for tax-efficient income generation
+        - Plan withdrawals after retirement for lower tax brackets
+        """
+        
+        return tax_info
+
+    def _generate_investment_strategy(self, user_data: dict, behavioral_analysis: dict) -> str:
+        """Generate comprehensive investment strategy"""
+        
+        strategy = f"""
+        **Your Personalized Investment Strategy:**
+        
+        🎯 **Phase 1: Foundation Building (Months 1-6)**
+        - Start with conservative allocation to build confidence
+        - Focus on large-cap and hybrid funds
+        - Establish emergency fund (6 months expenses)
+        
+        🚀 **Phase 2: Growth Acceleration (Months 7-24)**
+        - Gradually increase mid-cap allocation
+        - Add international diversification
+        - Increase SIP amounts with salary increments
+        
+        📈 **Phase 3: Wealth Optimization (Years 2+)**
+        - Fine-tune allocation based on performance
+        - Add small-cap funds for higher growth
+        - Regular portfolio rebalancing
+        
+        🔄 **Ongoing Strategy**:
+        - Review portfolio quarterly
+        - Rebalance annually or when allocation drifts >5%
+        - Step-up SIP by 10% annually
+        - Stay disciplined during market volatility
+        """
+        
+        return strategy
+
+
+class LegacyReportsOnReturnGrid(LegacyReports):
+    """Old builders with projections at the return rounded to 0.1%, as the projection tables do"""
+
+    def _calculate_sip_value(self, monthly_sip: int, annual_return: float, years: int) -> float:
+        return super()._calculate_sip_value(monthly_sip, round(annual_return * 10) / 10, years)
+
+
+BIASES = ['loss_aversion', 'overconfidence_bias', 'herding_behavior', 'sector_bias', 'recency_bias', 'fomo_bias']
+GOALS = ['retirement', 'tax', 'education', 'wealth']
+TIMELINES = ['1-3 years', '5-10 years', '10+ years']
+
+
+def random_cases(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    for _ in range(n):
+        risk_score = rng.randint(1, 10)
+        age = rng.randint(18, 75)
+        income = rng.choice([rng.randint(100000, 5000000), float(rng.randint(100000, 5000000))])
+        goals = rng.sample(GOALS, rng.randint(0, 3))
+        timeline = rng.choice(TIMELINES)
+        user = {'name': rng.choice(['Asha', 'Ravi', 'Meera']), 'age': age, 'income': income,
+                'financial_goals': goals, 'investment_timeline': timeline}
+        analysis = {
+            'risk_score': risk_score,
+            # Duplicates happen in real analyses and must render the same way
+            'behavioral_biases': [rng.choice(BIASES) for _ in range(rng.randint(0, 5))],
+            'behavioral_profile': server.ai_advisor._get_behavioral_profile([], risk_score, age, income),
+            'investment_personality': 'Goal-Based Investor',
+        }
+        allocation = server.ai_advisor._calculate_optimal_allocation(risk_score, age, income, goals, timeline)
+        yield user, analysis, allocation
+
+
+def render_all(reports, user, analysis, allocation):
+    return (
+        reports._generate_comprehensive_rationale(user, analysis, allocation),
+        reports._generate_enhanced_risk_mitigation(analysis, user),
+        reports._calculate_indian_market_returns(allocation, analysis['risk_score'], user['investment_timeline']),
+        reports._generate_tax_implications(allocation, user['financial_goals'], user['income']),
+        reports._generate_investment_strategy(user, analysis),
+    )
+
+
+def test_templates_render_exactly_what_the_old_builders_did():
+    legacy = LegacyReportsOnReturnGrid()
+    for user, analysis, allocation in random_cases(2000):
+        assert render_all(server.ai_advisor, user, analysis, allocation) == render_all(legacy, user, analysis, allocation)
+
+
+def test_template_parses_once_and_formats_fields():
+    template = Template("Income: ₹{income:,} at {rate:.1f}%")
+    assert template.fields == ('income', 'rate')
+    assert template.render(income=1200000, rate=12.345) == f"Income: ₹{1200000:,} at {12.345:.1f}%"
+    assert Template("{{literal}} {x}").render(x=1) == "{literal} 1"
+    assert Template("{x}-{x:>3}").render(x=7) == "7-  7"
+    assert Template("no fields").render() == "no fields"
+    # Only plain names: nothing in a template is evaluated
+    for source in ("{__import__('os')}", "{x.__class__}", "{x!r}", "{x:{y}}"):
+        with pytest.raises(ValueError):
+            Template(source)
+
+
+def test_user_invariant_sections_are_shared():
+    first = server.ai_advisor._generate_investment_strategy({}, {})
+    assert first is server.ai_advisor._generate_investment_strategy({'name': 'x'}, {}) is INVESTMENT_STRATEGY
+    analysis = {'risk_score': 9, 'behavioral_biases': ['sector_bias', 'loss_aversion']}
+    reordered = {'risk_score': 8, 'behavioral_biases': ['loss_aversion', 'sector_bias', 'sector_bias']}
+    assert (server.ai_advisor._generate_enhanced_risk_mitigation(analysis, {})
+            is server.ai_advisor._generate_enhanced_risk_mitigation(reordered, {}))
+    assert len(TAX_IMPLICATIONS) == 4
+
+
+def test_render_benchmark_time_and_allocations():
+    """Per-recommendation render time and retained bytes, templates vs string concatenation"""
+    cases = list(random_cases(500, seed=11))
+    legacy = LegacyReports()
+
+    def best_time(reports):
+        timings = []
+        for _ in range(20):
+            start = time.perf_counter()
+            for case in cases:
+                render_all(reports, *case)
+            timings.append(time.perf_counter() - start)
+        return min(timings) / len(cases)
+
+    def retained_bytes(reports):
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            kept = [render_all(reports, *case) for case in cases]
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        assert len(kept) == len(cases)
+        return (after - before) / len(cases)
+
+    render_all(server.ai_advisor, *cases[0])  # warm the memoized variants
+    legacy_time, template_time = best_time(legacy), best_time(server.ai_advisor)
+    legacy_bytes, template_bytes = retained_bytes(legacy), retained_bytes(server.ai_advisor)
+    assert template_time < legacy_time
+    assert template_bytes < legacy_bytes / 2
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+server = pytest.importorskip("server")
+
+import risk_assessment  # noqa: E402
+from database import Database  # noqa: E402
+from risk_assessment import BatchTooLargeError, assess_batch  # noqa: E402
+
+PROFILE = {
+    "name": "Rajesh Sharma",
+    "age": 28,
+    "occupation": "Software Engineer",
+    "income": 800000.0,
+    "current_savings": 150000.0,
+    "investment_experience": "intermediate",
+    "risk_tolerance": "moderate",
+    "financial_goals": ["wealth", "tax"],
+    "investment_timeline": "5-10 years",
+}
+
+
+class CountingCollection:
+    def __init__(self, collection):
+        self._collection = collection
+        self.calls = []
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if callable(attr):
+            def counted(*args, **kwargs):
+                self.calls.append(name)
+                return attr(*args, **kwargs)
+            return counted
+        return attr
+
+
+@pytest.fixture
+def database():
+    database = Database(mongomock.MongoClient(), "investwise_test", executor_workers=4)
+    yield database
+    database.close()
+
+
+def test_assess_batch_mixed_inputs(database):
+    database.db.users.insert_many([
+        dict(PROFILE, user_id="u1"),
+        dict(PROFILE, user_id="u2", age=62, investment_experience="beginner", occupation="Teacher"),
+    ])
+    counting = CountingCollection(database.db.assessments)
+    database.assessments.collection.collection = counting
+
+    outcome = asyncio.run(assess_batch(
+        database,
+        user_ids=["u1", "missing", "u2"],
+        profiles=[dict(PROFILE, age=45, income=2500000.0)],
+    ))
+
+    results = outcome["results"]
+    assert [r["status"] for r in results] == ["assessed", "not_found", "assessed", "assessed"]
+    assert [r["source"] for r in results] == ["user_id", "user_id", "user_id", "profile"]
+    assert outcome["summary"] == {"assessed": 3, "not_found": 1, "failed": 0}
+    assert counting.calls == ["bulk_write"]
+
+    expected = asyncio.run(server.ai_advisor.analyze_behavioral_profile(database.db.users.find_one({"user_id": "u2"})))
+    assert results[2]["risk_score"] == expected["risk_score"]
+    assert results[2]["confidence_level"] == expected["confidence_level"]
+
+    onboarded = database.db.users.find_one({"user_id": results[3]["user_id"]})
+    assert onboarded["income"] == 2500000.0
+    assert database.db.assessments.count_documents({}) == 3
+
+
+def test_assess_batch_rejects_oversized_batches(database, monkeypatch):
+    monkeypatch.setattr(risk_assessment, "MAX_BATCH_SIZE", 2)
+    with pytest.raises(BatchTooLargeError):
+        asyncio.run(assess_batch(database, user_ids=["a", "b", "c"]))
+
+
+def test_batch_route(database, monkeypatch):
+    TestClient = pytest.importorskip("fastapi.testclient").TestClient
+    monkeypatch.setattr(server, "database", database)
+    database.db.users.insert_one(dict(PROFILE, user_id="u1"))
+
+    response = TestClient(server.app).post(
+        "/api/risk-assessment/batch",
+        json={"user_ids": ["u1", "nope"], "profiles": [PROFILE]},
+    )
+    assert response.status_code == 200
+    assert response.json()["summary"] == {"assessed": 2, "not_found": 1, "failed": 0}
+
+
+def test_batch_route_errors(database, monkeypatch):
+    TestClient = pytest.importorskip("fastapi.testclient").TestClient
+    monkeypatch.setattr(server, "database", database)
+    monkeypatch.setattr(risk_assessment, "MAX_BATCH_SIZE", 2)
+    client = TestClient(server.app)
+
+    oversized = client.post("/api/risk-assessment/batch", json={"user_ids": ["a", "b", "c"]})
+    assert oversized.status_code == 413
+
+    async def invalid(*args, **kwargs):
+        raise ValueError("invalid literal for int() with base 10: 'thirty'")
+
+    monkeypatch.setattr(server, "assess_batch", invalid)
+    assert client.post("/api/risk-assessment/batch", json={"user_ids": ["a"]}).status_code == 400
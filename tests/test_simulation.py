@@ -0,0 +1,90 @@
+import time
+import tracemalloc
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from market_assumptions import CORRELATIONS, covariance_matrix  # noqa: E402
+import simulation  # noqa: E402
+from simulation import MAX_PATHS, MAX_YEARS, simulate_sip  # noqa: E402
+
+ALLOCATION = {'large_cap': 35, 'mid_cap': 25, 'debt': 20, 'hybrid': 15, 'international': 5}
+
+
+def deterministic_sip_value(monthly_sip, annual_return, years):
+    monthly_return = annual_return / 12 / 100
+    months = years * 12
+    return monthly_sip * (((1 + monthly_return) ** months - 1) / monthly_return)
+
+
+def test_assumptions_are_a_valid_covariance():
+    assert np.allclose(CORRELATIONS, CORRELATIONS.T)
+    np.linalg.cholesky(covariance_matrix())
+
+
+def test_bands_are_ordered_and_reproducible():
+    first = simulate_sip(ALLOCATION, 10000, 10, paths=2000, goal_corpus=2500000, seed=7)
+    second = simulate_sip(ALLOCATION, 10000, 10, paths=2000, goal_corpus=2500000, seed=7)
+    assert first.to_dict() == second.to_dict()
+
+    bands = first.bands
+    assert len(bands["p50"]) == 10
+    for p5, p50, p95 in zip(bands["p5"], bands["p50"], bands["p95"]):
+        assert p5 < p50 < p95
+    assert 0 <= first.goal_probability <= 1
+    assert 0 < first.max_drawdown["p5"] <= first.max_drawdown["p50"] <= first.max_drawdown["p95"] < 1
+    assert first.total_invested[-1] == 10000 * 120
+
+
+def test_chunking_does_not_change_results(monkeypatch):
+    whole = simulate_sip(ALLOCATION, 10000, 10, paths=1000, goal_corpus=2500000, seed=11).to_dict()
+    monkeypatch.setattr(simulation, "CHUNK_CELLS", 120 * 37)
+    assert simulate_sip(ALLOCATION, 10000, 10, paths=1000, goal_corpus=2500000, seed=11).to_dict() == whole
+
+
+def test_largest_request_memory_is_bounded():
+    tracemalloc.start()
+    try:
+        simulate_sip(ALLOCATION, 10000, MAX_YEARS, paths=MAX_PATHS, seed=2)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # Year-end values (paths x years) plus a few chunk-sized arrays
+    assert peak < MAX_PATHS * MAX_YEARS * 8 * 2 + simulation.CHUNK_CELLS * 8 * 6
+
+
+def test_median_tracks_deterministic_projection():
+    result = simulate_sip({'debt': 100}, 10000, 10, paths=5000, seed=3)
+    expected = deterministic_sip_value(10000, result.expected_annual_return, 10)
+    assert result.bands["p50"][-1] == pytest.approx(expected, rel=0.02)
+
+
+def test_rejects_unknown_categories():
+    with pytest.raises(ValueError):
+        simulate_sip({'crypto': 100}, 10000, 10)
+
+
+def test_10k_paths_30_years_under_a_second():
+    start = time.perf_counter()
+    simulate_sip(ALLOCATION, 10000, 30, paths=10000, goal_corpus=3e7, seed=1)
+    elapsed = time.perf_counter() - start
+    assert elapsed < 1.0
+
+
+def test_simulate_route():
+    server = pytest.importorskip("server")
+    TestClient = pytest.importorskip("fastapi.testclient").TestClient
+    client = TestClient(server.app)
+
+    response = client.post("/api/simulate", json={
+        "portfolio_allocation": ALLOCATION, "monthly_sip": 10000, "years": 5,
+        "goal_corpus": 800000, "paths": 1000, "seed": 1,
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body["percentile_bands"]) == {"p5", "p50", "p95"}
+    assert body["goal_probability"] is not None
+
+    bad = client.post("/api/simulate", json={"portfolio_allocation": {"gold": 100}, "monthly_sip": 10000})
+    assert bad.status_code == 400